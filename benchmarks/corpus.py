@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Generate a synthetic source tree for the scanner benchmarks.
+
+Files are built from per-language line templates, with fake credentials
+that the detection rules report planted on a share of the lines, and
+optionally some minified JavaScript bundles. The same seed always gives the
+same corpus, so benchmark runs over it can be compared.
+
+    python benchmarks/corpus.py OUT_DIR [--files 200] [--size-kb 16]
+        [--languages py,js,java,go,yaml,properties] [--secret-density 0.01]
+        [--minified 0.05] [--seed 0]
+"""
+
+import os
+import sys
+import json
+import random
+import string
+import argparse
+from typing import Callable, Dict, Iterator, List, Tuple
+
+LANGUAGES = ('py', 'js', 'java', 'go', 'yaml', 'properties')
+
+_ALNUM = string.ascii_letters + string.digits
+_WORDS = ('user', 'order', 'account', 'item', 'price', 'cache', 'request', 'session', 'config',
+          'handler', 'result', 'buffer', 'client', 'value', 'record', 'index', 'total', 'status')
+
+
+def _token(rng: random.Random, length: int, alphabet: str = _ALNUM) -> str:
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def _name(rng: random.Random, parts: int = 2) -> str:
+    return '_'.join(rng.choice(_WORDS) for _ in range(parts))
+
+
+def _camel(rng: random.Random, parts: int = 2) -> str:
+    words = [rng.choice(_WORDS) for _ in range(parts)]
+    return words[0] + ''.join(word.title() for word in words[1:])
+
+
+# Fake credentials in the shapes the detection rules look for
+SECRET_MAKERS: Dict[str, Callable[[random.Random], str]] = {
+    'aws': lambda rng: f"AKIA{_token(rng, 16, string.ascii_uppercase + string.digits)}",
+    'github': lambda rng: f"ghp_{_token(rng, 36)}",
+    'openai': lambda rng: f"sk-{_token(rng, 48)}",
+    'google': lambda rng: f"AIza{_token(rng, 35)}",
+    'jwt': lambda rng: f"eyJ{_token(rng, 24)}.eyJ{_token(rng, 40)}.{_token(rng, 32)}",
+    'database': lambda rng: f"postgresql://admin:{_token(rng, 12)}@db.internal:5432/app",
+}
+
+
+def secret_line(language: str, rng: random.Random) -> str:
+    """Return a line assigning a fake credential, in the syntax of a language."""
+    kind = rng.choice(sorted(SECRET_MAKERS))
+    value = SECRET_MAKERS[kind](rng)
+    if rng.random() < 0.3:
+        # A password assignment that needs the entropy check
+        name, value = 'password', _token(rng, 14, _ALNUM + '!#%&*')
+    else:
+        name = f"{kind}_token"
+    return {
+        'py': f'{name.upper()} = "{value}"',
+        'js': f"const {name} = '{value}';",
+        'java': f'    private static final String {name.upper()} = "{value}";',
+        'go': f'\t{_camel(rng)} := "{value}" // {name}',
+        'yaml': f'  {name}: {value}',
+        'properties': f'{name.replace("_", ".")}={value}',
+    }[language]
+
+
+def _code_line(language: str, rng: random.Random) -> str:
+    """Return an ordinary line of a language."""
+    name, camel, number = _name(rng), _camel(rng), rng.randint(0, 10000)
+    lines = {
+        'py': [f"def {name}(self, {rng.choice(_WORDS)}):", f"    return self.{name}[{number}]",
+               f"    {name} = {rng.choice(_WORDS)}.get('{camel}', {number})",
+               f"# Update the {rng.choice(_WORDS)} {rng.choice(_WORDS)} before saving",
+               f"import {rng.choice(_WORDS)}", f"    if {name} is None:", "        continue",
+               f"    logger.info(f\"{camel} changed to {{{name}}}\")"],
+        'js': [f"function {camel}({rng.choice(_WORDS)}) {{", f"  return {camel}.map((x) => x * {number});",
+               f"  const {camel} = await fetch('/api/{rng.choice(_WORDS)}/' + id);",
+               f"// Render the {rng.choice(_WORDS)} list", "}", f"export default {camel};",
+               f"  if (!{camel}) {{ throw new Error('{name} missing'); }}"],
+        'java': [f"    public int {camel}(int {rng.choice(_WORDS)}) {{", f"        return {camel} + {number};",
+                 f"        List<String> {camel} = new ArrayList<>();", "    }",
+                 f"    // Keep the {rng.choice(_WORDS)} in sync", f"import java.util.{rng.choice(_WORDS).title()};",
+                 f"        {camel}.put(\"{name}\", {number});"],
+        'go': [f"func {camel}(ctx context.Context) error {{", f"\treturn {camel}(ctx, {number})",
+               f"\t{camel}, err := client.Get(\"{name}\")", "\tif err != nil {", "\t\treturn err", "}",
+               f"// {camel} loads the {rng.choice(_WORDS)} records"],
+        'yaml': [f"{name}:", f"  {camel}: {number}", f"  - name: {rng.choice(_WORDS)}",
+                 f"    enabled: {rng.choice(['true', 'false'])}", f"# {rng.choice(_WORDS)} settings"],
+        'properties': [f"{name.replace('_', '.')}.{rng.choice(_WORDS)}={number}",
+                       f"# {rng.choice(_WORDS)} settings", f"{camel}.enabled={rng.choice(['true', 'false'])}"],
+    }[language]
+    return rng.choice(lines)
+
+
+def generate_file(language: str, size: int, secret_density: float, rng: random.Random) -> Tuple[str, int]:
+    """Return the text of a source file of about ``size`` characters and its secret count."""
+    lines: List[str] = []
+    length = secrets = 0
+    while length < size:
+        if rng.random() < secret_density:
+            line = secret_line(language, rng)
+            secrets += 1
+        else:
+            line = _code_line(language, rng)
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines) + '\n', secrets
+
+
+def generate_minified(size: int, secret_density: float, rng: random.Random) -> Tuple[str, int]:
+    """Return a minified JavaScript bundle of about ``size`` characters and its secret count."""
+    text, secrets = generate_file('js', size, secret_density, rng)
+    # Bundlers join statements into a few very long lines
+    statements = text.replace('\n', '').replace('  ', '')
+    width = max(len(statements) // 4, 1)
+    return '\n'.join(statements[i:i + width] for i in range(0, len(statements), width)) + '\n', secrets
+
+
+def generate_corpus(files: int = 200, size_kb: float = 16, languages: Tuple[str, ...] = LANGUAGES,
+                    secret_density: float = 0.01, minified: float = 0.05,
+                    seed: int = 0) -> Tuple[Dict[str, str], Dict]:
+    """Generate a corpus in memory.
+
+    Returns {relative path: text} and a summary of the corpus with its
+    parameters, size and number of planted secrets.
+    """
+    rng = random.Random(seed)
+    corpus: Dict[str, str] = {}
+    planted = 0
+    for i in range(files):
+        size = max(int(size_kb * 1024 * rng.uniform(0.5, 1.5)), 1)
+        if rng.random() < minified:
+            path = f"static/bundle_{i}.js"
+            text, secrets = generate_minified(size, secret_density, rng)
+        else:
+            language = languages[i % len(languages)]
+            path = f"src/{language}/{_name(rng)}_{i}.{language}"
+            text, secrets = generate_file(language, size, secret_density, rng)
+        corpus[path] = text
+        planted += secrets
+    summary = {
+        'files': files, 'size_kb': size_kb, 'languages': list(languages),
+        'secret_density': secret_density, 'minified': minified, 'seed': seed,
+        'bytes': sum(len(text.encode('utf-8')) for text in corpus.values()),
+        'lines': sum(text.count('\n') for text in corpus.values()),
+        'secrets_planted': planted,
+    }
+    return corpus, summary
+
+
+def iter_patch(corpus: Dict[str, str]) -> Iterator[bytes]:
+    """Yield the lines of a ``git diff -p --unified=0`` patch adding every file."""
+    for path, text in corpus.items():
+        lines = text.splitlines()
+        yield f"diff --git a/{path} b/{path}\n".encode('utf-8')
+        yield b"new file mode 100644\n"
+        yield b"index 0000000..1111111\n"
+        yield b"--- /dev/null\n"
+        yield f"+++ b/{path}\n".encode('utf-8')
+        yield f"@@ -0,0 +1,{len(lines)} @@\n".encode('utf-8')
+        for line in lines:
+            yield b'+' + line.encode('utf-8') + b'\n'
+
+
+def write_corpus(corpus: Dict[str, str], out_dir: str) -> None:
+    """Write a generated corpus under ``out_dir``."""
+    for path, text in corpus.items():
+        full_path = os.path.join(out_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(text)
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the corpus parameters to a command line parser."""
+    parser.add_argument('--files', type=int, default=200, help="Number of files")
+    parser.add_argument('--size-kb', type=float, default=16, help="Average file size in KB")
+    parser.add_argument('--languages', default=','.join(LANGUAGES),
+                        help=f"Comma-separated language mix, from {', '.join(LANGUAGES)}")
+    parser.add_argument('--secret-density', type=float, default=0.01,
+                        help="Share of lines holding a fake credential")
+    parser.add_argument('--minified', type=float, default=0.05,
+                        help="Share of files that are minified JavaScript bundles")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+
+
+def corpus_from_arguments(args: argparse.Namespace) -> Tuple[Dict[str, str], Dict]:
+    """Generate the corpus described by parsed ``add_corpus_arguments`` options."""
+    languages = tuple(language.strip() for language in args.languages.split(',') if language.strip())
+    unknown = [language for language in languages if language not in LANGUAGES]
+    if unknown or not languages:
+        raise SystemExit(f"Unknown languages: {', '.join(unknown) or '(none given)'}")
+    return generate_corpus(args.files, args.size_kb, languages, args.secret_density,
+                           args.minified, args.seed)
+
+
+def main() -> None:
+    """Write a corpus to a directory and print its summary."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic source tree for the scanner benchmarks.")
+    parser.add_argument('out_dir', help="Directory to write the files to")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    corpus, summary = corpus_from_arguments(args)
+    write_corpus(corpus, args.out_dir)
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""Measure what developers wait for: ``git commit`` and ``git scan-repo`` with the hooks installed.
+
+Builds throwaway git repositories of several shapes from the synthetic
+corpus (see corpus.py), installs the hook bundle into a private home
+directory the way the installer does, and times commits and repository
+scans. The hooks run headless: a ``sitecustomize`` module on their
+PYTHONPATH replaces the review window with one that approves every
+finding, BROWSER opens reports with ``true``, and each hook process
+appends its wall time, subprocess and fork counts and peak RSS to a log
+when it exits. Interpreter startup before ``sitecustomize`` runs is not
+part of a hook's time, but is part of the ``git commit`` time.
+
+The first commit and scan of each shape fill the caches and are reported
+as "cold"; p50 and p95 are taken over the rest. Results can be saved as a
+JSON baseline and later runs checked against it.
+
+    python benchmarks/hook_latency.py [--shapes files-1k,huge-diff] [--iterations 5]
+        [--scale 0.2] [--daemon] [--save baseline.json]
+        [--compare baseline.json] [--max-regression 20]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+HOOKS_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'src', 'hooks')
+sys.path.insert(0, HOOKS_DIR)
+
+from corpus import generate_corpus, generate_file, secret_line  # noqa: E402
+from commit_scripts.bundle import sync_bundle  # noqa: E402
+
+# Bump when shapes or stages change meaning
+RESULTS_VERSION = 1
+
+# Installed like the installer does, see main.py
+HOOK_FILES = ['pre-commit', 'post-commit', 'scan-repo', 'pre_commit.py', 'post_commit.py', 'scan_repo.py']
+
+# Repository shapes: files in the tree, commits of history, and what each
+# measured commit changes. Counts are multiplied by --scale.
+SHAPES: Dict[str, Dict] = {
+    'files-1k': {'files': 1000, 'history': 1, 'change': 'edit', 'size': 3},
+    'files-10k': {'files': 10000, 'history': 1, 'change': 'edit', 'size': 3},
+    'files-50k': {'files': 50000, 'history': 1, 'change': 'edit', 'size': 3},
+    'big-commit': {'files': 200, 'history': 1, 'change': 'add-files', 'size': 2000},
+    'many-commits': {'files': 1000, 'history': 2000, 'change': 'edit', 'size': 3},
+    'huge-diff': {'files': 200, 'history': 1, 'change': 'append', 'size': 50000},
+}
+
+# Hook scripts reported as stages, by the name git knows them by
+SCRIPT_STAGES = {'pre_commit.py': 'pre-commit', 'post_commit.py': 'post-commit', 'scan_repo.py': 'scan-repo'}
+
+# Loaded by every Python process the hooks start
+SITECUSTOMIZE = '''"""Headless hooks with per-process accounting, for benchmarks/hook_latency.py."""
+import os
+import sys
+import time
+import types
+import atexit
+import resource
+import subprocess
+
+_start = time.perf_counter()
+_counts = {'subprocesses': 0, 'forks': 0, 'reviewed': 0}
+
+_popen_init = subprocess.Popen.__init__
+
+
+def _counting_init(self, *args, **kwargs):
+    _counts['subprocesses'] += 1
+    _popen_init(self, *args, **kwargs)
+
+
+subprocess.Popen.__init__ = _counting_init
+os.register_at_fork(after_in_parent=lambda: _counts.__setitem__('forks', _counts['forks'] + 1))
+
+
+class ValidationWindow:
+    """Approves every finding without showing a window."""
+
+    def __init__(self):
+        self.results = {}
+
+    def run_validation(self, secrets_data):
+        _counts['reviewed'] += len(secrets_data)
+        self.results = {"secrets": {"proceed": True, "messages": {}, "global_message": ""}}
+        return True
+
+
+_review = types.ModuleType('commit_scripts.review_window')
+_review.ValidationWindow = ValidationWindow
+_review.show_message_box = lambda message: None
+_review.get_user_confirmation = lambda prompt: True
+sys.modules['commit_scripts.review_window'] = _review
+
+
+def _report():
+    log = os.environ.get('GENIE_BENCH_LOG')
+    if not log or os.path.basename(sys.argv[0]) not in %r:
+        return
+    import json
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    record = dict(_counts, script=os.path.basename(sys.argv[0]),
+                  seconds=time.perf_counter() - _start,
+                  rss_kb=usage.ru_maxrss, children_rss_kb=children.ru_maxrss)
+    with open(log, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\\n')
+
+
+atexit.register(_report)
+''' % (sorted(SCRIPT_STAGES),)
+
+
+def _git(args: List[str], cwd: str, env: Dict[str, str], **kwargs) -> subprocess.CompletedProcess:
+    return subprocess.run(['git', *args], cwd=cwd, env=env, check=True,
+                          stdout=subprocess.DEVNULL, **kwargs)
+
+
+class HookEnvironment:
+    """A private home with the hooks installed, and the environment hooks run in."""
+
+    def __init__(self, work_dir: str, daemon: bool = False):
+        self.work_dir = work_dir
+        self.home = os.path.join(work_dir, 'home')
+        self.hooks_dir = os.path.join(self.home, '.genie', 'hooks')
+        self.log = os.path.join(work_dir, 'stages.jsonl')
+        bin_dir = os.path.join(work_dir, 'bin')
+        stub_dir = os.path.join(work_dir, 'stubs')
+        for path in (self.home, bin_dir, stub_dir, os.path.join(work_dir, 'run')):
+            os.makedirs(path, exist_ok=True)
+
+        # The hooks' "#!/usr/bin/env python3" finds this interpreter
+        python = os.path.join(bin_dir, 'python3')
+        os.symlink(sys.executable, python)
+        with open(os.path.join(stub_dir, 'sitecustomize.py'), 'w', encoding='utf-8') as f:
+            f.write(SITECUSTOMIZE)
+        sync_bundle(HOOKS_DIR, self.hooks_dir, HOOK_FILES, python=python)
+
+        gitconfig = os.path.join(self.home, '.gitconfig')
+        self.env = {name: value for name, value in os.environ.items()
+                    if not name.startswith(('GIT_', 'PYTHON', 'XDG_'))}
+        self.env.update({
+            'HOME': self.home,
+            'GIT_CONFIG_GLOBAL': gitconfig,
+            'GIT_CONFIG_NOSYSTEM': '1',
+            'XDG_CONFIG_HOME': os.path.join(self.home, '.config'),
+            'XDG_CACHE_HOME': os.path.join(self.home, '.cache'),
+            'XDG_RUNTIME_DIR': os.path.join(work_dir, 'run'),
+            'PATH': bin_dir + os.pathsep + os.environ.get('PATH', ''),
+            'PYTHONPATH': stub_dir,
+            'BROWSER': 'true',
+            'GENIE_BENCH_LOG': self.log,
+        })
+        for key, value in (('user.name', 'Benchmark'), ('user.email', 'bench@example.com'),
+                           ('init.defaultBranch', 'main'), ('core.hooksPath', self.hooks_dir),
+                           ('alias.scan-repo', f'!sh "{os.path.join(self.hooks_dir, "scan-repo")}"')):
+            _git(['config', '--global', key, value], work_dir, self.env)
+
+        self.daemon: Optional[subprocess.Popen] = None
+        if daemon:
+            self.start_daemon()
+
+    def start_daemon(self) -> None:
+        """Start the scan daemon and wait until it answers."""
+        self.daemon = subprocess.Popen(
+            [sys.executable, '-m', 'commit_scripts.daemon', '--idle-timeout', '3600'],
+            cwd=self.hooks_dir, env=self.env, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            status = subprocess.run([sys.executable, '-m', 'commit_scripts.daemon', '--status'],
+                                    cwd=self.hooks_dir, env=self.env, capture_output=True)
+            if status.returncode == 0:
+                return
+            time.sleep(0.1)
+        raise RuntimeError("scan daemon did not start")
+
+    def close(self) -> None:
+        if self.daemon is not None:
+            subprocess.run([sys.executable, '-m', 'commit_scripts.daemon', '--stop'],
+                           cwd=self.hooks_dir, env=self.env, capture_output=True)
+            self.daemon.wait(timeout=30)
+            self.daemon = None
+
+    def run(self, args: List[str], cwd: str) -> Dict[str, Dict]:
+        """Run a git command with the hooks and return the accounting of each stage.
+
+        The command itself is reported under its own name, e.g. 'git commit'.
+        Raises RuntimeError with git's error output if it fails.
+        """
+        if os.path.exists(self.log):
+            os.unlink(self.log)
+        start = time.perf_counter()
+        result = subprocess.run(['git', *args], cwd=cwd, env=self.env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode:
+            error = result.stderr.decode('utf-8', errors='replace').strip().splitlines()[-5:]
+            raise RuntimeError(f"git {' '.join(args)} failed: " + '\n'.join(error))
+        stages = {f'git {args[0]}': {'seconds': time.perf_counter() - start}}
+        if os.path.exists(self.log):
+            with open(self.log, 'r', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    stages[SCRIPT_STAGES[record.pop('script')]] = record
+        return stages
+
+
+def build_repository(path: str, shape: Dict, scale: float, seed: int, env: Dict[str, str]) -> Dict[str, int]:
+    """Create a repository of a shape with ``git fast-import``, hooks bypassed."""
+    files = max(int(shape['files'] * scale), 1)
+    history = max(int(shape['history'] * scale), 1) if shape['history'] > 1 else 1
+    corpus, summary = generate_corpus(files=files, size_kb=0.5, secret_density=0.002,
+                                      minified=0.01, seed=seed)
+    rng = random.Random(seed)
+    paths = list(corpus)
+    stream = bytearray()
+
+    def data(payload: bytes) -> None:
+        stream.extend(b'data %d\n' % len(payload))
+        stream.extend(payload)
+        stream.extend(b'\n')
+
+    for i in range(history):
+        stream.extend(b'commit refs/heads/main\n')
+        stream.extend(b'committer Benchmark <bench@example.com> %d +0000\n' % (1700000000 + i))
+        data(b'Commit %d' % i)
+        if i == 0:
+            changed = paths
+        else:
+            changed = [rng.choice(paths)]
+            corpus[changed[0]] += f"# revision {i}\n"
+        for file_path in changed:
+            stream.extend(b'M 100644 inline ' + file_path.encode('utf-8') + b'\n')
+            data(corpus[file_path].encode('utf-8'))
+
+    subprocess.run(['git', 'init', '-q', path], env=env, check=True)
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=path, env=env, input=bytes(stream), check=True)
+    _git(['checkout', '-q', '-f', 'main'], path, env)
+    return {'files': files, 'commits': history, 'bytes': summary['bytes']}
+
+
+def make_change(repo: str, shape: Dict, scale: float, iteration: int, secrets: bool) -> None:
+    """Change the work tree for one measured commit and stage the change."""
+    rng = random.Random(iteration)
+    size = max(int(shape['size'] * scale), 1) if shape['change'] != 'edit' else shape['size']
+    tracked = subprocess.run(['git', 'ls-files', '-z'], cwd=repo, capture_output=True,
+                             check=True).stdout.decode('utf-8').split('\0')[:-1]
+    written = []
+    if shape['change'] == 'add-files':
+        corpus, _ = generate_corpus(files=size, size_kb=0.5, secret_density=0.002,
+                                    minified=0.0, seed=1000 + iteration)
+        for file_path, text in corpus.items():
+            target = os.path.join(repo, f'added-{iteration}', file_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(text)
+            written.append(target)
+    else:
+        targets = [rng.choice(tracked) for _ in range(size if shape['change'] == 'edit' else 1)]
+        for file_path in targets:
+            if shape['change'] == 'append':
+                text, _ = generate_file('py', size * 40, 0.001, rng)
+            else:
+                text = f"# change {iteration} {rng.random()}\n"
+            with open(os.path.join(repo, file_path), 'a', encoding='utf-8', newline='\n') as f:
+                f.write(text)
+            written.append(os.path.join(repo, file_path))
+    if secrets:
+        with open(written[0], 'a', encoding='utf-8', newline='\n') as f:
+            f.write(secret_line('py', rng) + '\n')
+    subprocess.run(['git', 'add', '-A'], cwd=repo, check=True)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Return the p-th percentile of values, interpolating between ranks."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(runs: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """Reduce the stage accounting of several runs to latency percentiles and peaks."""
+    summary = {}
+    for stage in dict.fromkeys(stage for run in runs for stage in run):
+        records = [run[stage] for run in runs if stage in run]
+        seconds = [record['seconds'] for record in records]
+        entry = {
+            'runs': len(records),
+            'p50_ms': round(percentile(seconds, 50) * 1000, 1),
+            'p95_ms': round(percentile(seconds, 95) * 1000, 1),
+            'max_ms': round(max(seconds) * 1000, 1),
+        }
+        if 'rss_kb' in records[0]:
+            entry.update({
+                'subprocesses': max(record['subprocesses'] for record in records),
+                'forks': max(record['forks'] for record in records),
+                'reviewed': max(record['reviewed'] for record in records),
+                'peak_rss_mb': round(max(record['rss_kb'] for record in records) / 1024, 1),
+                'children_peak_rss_mb': round(max(record['children_rss_kb'] for record in records) / 1024, 1),
+            })
+        summary[stage] = entry
+    return summary
+
+
+def measure_shape(env: HookEnvironment, name: str, args: argparse.Namespace) -> Dict:
+    """Build a repository of a shape and time its commits and scans."""
+    shape = SHAPES[name]
+    repo = os.path.join(env.work_dir, name)
+    print(f"{name}: building repository", file=sys.stderr)
+    info = build_repository(repo, shape, args.scale, args.seed, env.env)
+    commits = []
+    for i in range(args.iterations + 1):
+        make_change(repo, shape, args.scale, i, args.secrets)
+        commits.append(env.run(['commit', '-q', '-m', f'Measured change {i}'], repo))
+        print(f"{name}: commit {i} took {commits[-1]['git commit']['seconds'] * 1000:.0f} ms", file=sys.stderr)
+    scans = []
+    for i in range(args.scan_iterations + 1):
+        scans.append(env.run(['scan-repo'], repo))
+        print(f"{name}: scan {i} took {scans[-1]['git scan-repo']['seconds'] * 1000:.0f} ms", file=sys.stderr)
+    if not args.keep:
+        shutil.rmtree(repo, ignore_errors=True)
+    return {
+        'repository': info,
+        'cold': summarize([commits[0], scans[0]]),
+        'stages': summarize(commits[1:] + scans[1:]),
+    }
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float, min_delta_ms: float) -> List[str]:
+    """Describe every stage whose p50 or p95 regressed past the threshold against a baseline."""
+    regressions = []
+    for shape, result in results['shapes'].items():
+        before_shape = baseline.get('shapes', {}).get(shape)
+        if not before_shape:
+            continue
+        for stage, entry in result['stages'].items():
+            before = before_shape.get('stages', {}).get(stage)
+            if not before:
+                continue
+            for key in ('p50_ms', 'p95_ms'):
+                old, new = before[key], entry[key]
+                if new - old > min_delta_ms and new > old * (1 + max_regression / 100):
+                    regressions.append(f"{shape} {stage} {key[:3]}: {old:.0f} ms -> {new:.0f} ms")
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HOOKS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    """Run the harness and exit with status 1 if a stage regressed."""
+    parser = argparse.ArgumentParser(description="Time git commit and git scan-repo with the hooks installed.")
+    parser.add_argument('--shapes', default=','.join(SHAPES),
+                        help=f"Comma-separated repository shapes, from {', '.join(SHAPES)}")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply file, commit and change counts")
+    parser.add_argument('--iterations', type=int, default=5, help="Measured commits per shape, after a cold one")
+    parser.add_argument('--scan-iterations', type=int, default=3, help="Measured scans per shape, after a cold one")
+    parser.add_argument('--secrets', action='store_true',
+                        help="Add a fake credential to every measured commit, so it is reviewed")
+    parser.add_argument('--daemon', action='store_true', help="Run the scan daemon during the measurements")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generated repositories")
+    parser.add_argument('--work-dir', help="Directory for the repositories; a temporary one by default")
+    parser.add_argument('--keep', action='store_true', help="Keep the repositories after measuring")
+    parser.add_argument('--save', help="Write the results to this JSON baseline")
+    parser.add_argument('--compare', help="Check the results against a saved baseline")
+    parser.add_argument('--max-regression', type=float, default=20.0,
+                        help="Percent a stage's p50 or p95 may grow over the baseline")
+    parser.add_argument('--min-delta-ms', type=float, default=25.0,
+                        help="Ignore regressions smaller than this, which are noise")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.shapes.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SHAPES]
+    if unknown:
+        parser.error(f"unknown shapes: {', '.join(unknown)}")
+    if os.name != 'posix':
+        parser.error("the harness needs a POSIX system")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='genie-latency-')
+    os.makedirs(work_dir, exist_ok=True)
+    env = HookEnvironment(work_dir, daemon=args.daemon)
+    try:
+        shapes = {name: measure_shape(env, name, args) for name in names}
+    finally:
+        env.close()
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'version': RESULTS_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': args.scale,
+        'iterations': args.iterations,
+        'scan_iterations': args.scan_iterations,
+        'secrets': args.secrets,
+        'daemon': args.daemon,
+        'shapes': shapes,
+    }
+    regressions: List[str] = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if (baseline.get('version'), baseline.get('scale'), baseline.get('daemon')) != (
+                RESULTS_VERSION, args.scale, args.daemon):
+            print(f"{args.compare} was measured with other settings", file=sys.stderr)
+        regressions = compare(results, baseline, args.max_regression, args.min_delta_ms)
+        results['regressions'] = regressions
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in shapes.items():
+            info = result['repository']
+            print(f"{name}: {info['files']} files, {info['commits']} commits, "
+                  f"{info['bytes'] / (1024 * 1024):.1f} MB")
+            for label, stages in (('cold', result['cold']), ('warm', result['stages'])):
+                for stage, entry in stages.items():
+                    extra = ''
+                    if 'peak_rss_mb' in entry:
+                        extra = (f"  {entry['subprocesses']:3d} subprocesses  {entry['forks']:3d} forks"
+                                 f"  {entry['peak_rss_mb']:6.1f} MB RSS  {entry['children_peak_rss_mb']:6.1f} MB children")
+                    print(f"  {label:<4} {stage:<14} p50 {entry['p50_ms']:8.1f} ms  "
+                          f"p95 {entry['p95_ms']:8.1f} ms{extra}")
+        if regressions:
+            print(f"Regressions over {args.max_regression:g}% against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
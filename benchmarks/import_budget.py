@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Check the import cost of the pre-commit hook against a budget.
+
+Imports ``pre_commit`` under ``python -X importtime`` several times and fails
+when the fastest run exceeds the time budget, or when a module that only
+commits with findings need (Tkinter, the scanner, NumPy) is imported up front.
+
+    python benchmarks/import_budget.py [--budget-ms 100] [--runs 5]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+HOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'hooks')
+
+# Modules a clean commit must not import
+DEFERRED_MODULES = [
+    'tkinter',
+    'numpy',
+    'commit_scripts.review_window',
+    'commit_scripts.secretscan',
+    'commit_scripts.rules',
+    'commit_scripts.staged',
+]
+
+DEFAULT_BUDGET_MS = 100.0
+
+
+def measure(module: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """Import ``module`` in a fresh interpreter.
+
+    Returns its cumulative import time in milliseconds and the
+    (self, cumulative) microseconds of every module imported.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=HOOKS_DIR, capture_output=True, text=True, check=True
+    )
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # Header line
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules[module][1] / 1000.0, modules
+
+
+def main() -> None:
+    """Run the check and exit with status 1 if it fails."""
+    parser = argparse.ArgumentParser(description="Check the pre-commit hook's import time.")
+    parser.add_argument('--module', default='pre_commit', help="Hook module to import")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help="Largest allowed cumulative import time")
+    parser.add_argument('--runs', type=int, default=5, help="Imports to time; the fastest counts")
+    parser.add_argument('--top', type=int, default=10, help="Slowest modules to list")
+    parser.add_argument('--json', action='store_true', help="Print the result as JSON")
+    args = parser.parse_args()
+
+    timings: List[float] = []
+    modules: Dict[str, Tuple[int, int]] = {}
+    for _ in range(max(args.runs, 1)):
+        elapsed, imported = measure(args.module)
+        if not timings or elapsed < min(timings):
+            modules = imported
+        timings.append(elapsed)
+
+    best = min(timings)
+    deferred = [name for name in DEFERRED_MODULES if name in modules]
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+    passed = best <= args.budget_ms and not deferred
+
+    if args.json:
+        print(json.dumps({
+            'module': args.module,
+            'import_ms': round(best, 2),
+            'runs_ms': [round(t, 2) for t in timings],
+            'budget_ms': args.budget_ms,
+            'deferred_modules_imported': deferred,
+            'slowest': [{'module': name, 'self_us': self_us, 'cumulative_us': cumulative_us}
+                        for name, (self_us, cumulative_us) in slowest],
+            'passed': passed,
+        }, indent=2))
+    else:
+        print(f"{args.module}: {best:.1f} ms (budget {args.budget_ms:.0f} ms, best of {len(timings)})")
+        for name, (self_us, cumulative_us) in slowest:
+            print(f"  {self_us / 1000:7.2f} ms self  {cumulative_us / 1000:7.2f} ms total  {name}")
+        if deferred:
+            print(f"Imported modules that should load on demand: {', '.join(deferred)}")
+        if best > args.budget_ms:
+            print("Import time is over budget")
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Time every detection rule against adversarial inputs.
+
+For each rule the corpus holds inputs built from the rule's own pattern:
+near-misses with every unbounded repeat pumped and the last character
+changed so the match fails after maximal backtracking, runs of each
+repeated character class, required literals repeated without the rest of
+the pattern, and random text over the pattern's alphabet. Each input is
+matched at two sizes, so the growth of the matching time shows whether a
+rule is linear, quadratic or worse.
+
+The check fails when a rule is quarantined by the static audit, or when
+matching any input of the largest size takes longer than the time budget a
+rule gets at scan time.
+
+    python benchmarks/rule_fuzz.py [--size 4096] [--runs 3] [--corpus DIR]
+    python benchmarks/rule_fuzz.py --pattern 'candidate regex'
+"""
+
+import os
+import sys
+import math
+import json
+import time
+import random
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+HOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'hooks')
+sys.path.insert(0, HOOKS_DIR)
+
+from commit_scripts.config import LONG_LINE_CHARS  # noqa: E402
+from commit_scripts.rules import RuleSet  # noqa: E402
+from commit_scripts.rulesafety import (  # noqa: E402
+    EXPONENTIAL, audit_pattern, char_set, guarded_finditer, sre_parse, time_budget
+)
+
+# Preferred characters when a character class allows several
+_PREFERRED = 'aA0_-=:. "\'/+xZ9'
+
+
+def _pick(chars, rng: random.Random) -> str:
+    """Pick a printable character from a set of ASCII codes."""
+    printable = sorted(c for c in chars if 32 <= c < 127)
+    for c in _PREFERRED:
+        if ord(c) in printable:
+            return c
+    return chr(rng.choice(printable)) if printable else ''
+
+
+def _sample(items, pump: int, rng: random.Random, classes: List[str]) -> str:
+    """Build a string the parsed pattern matches, with unbounded repeats pumped.
+
+    Appends a representative character of every repeated class to ``classes``.
+    """
+    out = []
+    for op, av in items:
+        chars = char_set(op, av)
+        if chars is not None:
+            out.append(_pick(chars, rng))
+        elif op is sre_parse.SUBPATTERN:
+            out.append(_sample(av[-1], pump, rng, classes))
+        elif op is sre_parse.BRANCH:
+            out.append(_sample(av[1][0], pump, rng, classes))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) or op is getattr(sre_parse, 'POSSESSIVE_REPEAT', None):
+            low, high, body = av
+            body_sample = _sample(body, pump, rng, classes)
+            if body_sample and len(body_sample) == 1:
+                classes.append(body_sample)
+            count = pump if high == sre_parse.MAXREPEAT else max(low, min(high, 1))
+            out.append(body_sample * max(count // max(len(body_sample), 1), low))
+    return ''.join(out)
+
+
+def _fill(piece: str, size: int) -> str:
+    """Repeat a piece to ``size`` characters."""
+    return (piece * (size // max(len(piece), 1) + 1))[:size] if piece else ''
+
+
+def adversarial_inputs(pattern: str, literals: List[str], size: int, seed: int = 0) -> Dict[str, str]:
+    """Return the adversarial inputs of about ``size`` characters for a pattern, by name."""
+    rng = random.Random(seed)
+    items = list(sre_parse.parse(pattern))
+    classes: List[str] = []
+    pumped = _sample(items, size, rng, classes)[:size]
+    prefix = ' '.join(literals)
+    inputs = {
+        # Changing the last character makes the attempt fail at the very end
+        'near-miss': pumped[:-1] + ('\n' if pumped[-1:] != '\n' else '#'),
+        'repeated-literals': _fill(prefix + ' ', size),
+    }
+    for i, c in enumerate(dict.fromkeys(classes)):
+        inputs[f'run-{i}'] = (prefix + ' ' + c * size)[:size]
+    alphabet = sorted(set(pumped + prefix + ''.join(classes)) - {'\n'}) or ['a']
+    inputs['random'] = ''.join(rng.choice(alphabet) for _ in range(size))
+    return inputs
+
+
+def time_rule(rule, text: str, runs: int) -> Tuple[float, bool]:
+    """Return the best matching time of a rule over ``text`` and whether it timed out."""
+    budget = time_budget(len(text))
+    best = math.inf
+    for _ in range(max(runs, 1)):
+        rule.quarantined = None
+        start = time.perf_counter()
+        # Hopeless inputs are stopped at four times the scan budget
+        guarded_finditer(rule, text, budget=budget * 4)
+        best = min(best, time.perf_counter() - start)
+        if rule.quarantined:
+            rule.quarantined = None
+            return best, True
+    return best, False
+
+
+def growth(small: float, large: float, ratio: float) -> Optional[float]:
+    """Estimate the exponent k of a matching time growing like size ** k."""
+    if small < 1e-5 or large <= 0:
+        return None
+    return math.log(large / small) / math.log(ratio)
+
+
+def main() -> None:
+    """Run the fuzz corpus and exit with status 1 if a rule is over budget."""
+    parser = argparse.ArgumentParser(description="Time detection rules against adversarial inputs.")
+    parser.add_argument('--size', type=int, default=LONG_LINE_CHARS,
+                        help="Length of the largest inputs; lines up to LONG_LINE_CHARS are matched whole")
+    parser.add_argument('--runs', type=int, default=3, help="Runs per input; the fastest counts")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for random inputs")
+    parser.add_argument('--corpus', help="Directory to write the inputs to, one file per rule and input")
+    parser.add_argument('--pattern', action='append',
+                        help="Fuzz this pattern instead of the configured rules; may be repeated")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    if args.pattern:
+        ruleset = RuleSet([(pattern, 'Candidate pattern', {}) for pattern in args.pattern], [])
+    else:
+        ruleset = RuleSet()
+    results = []
+    for rule in (*ruleset.rules, *ruleset.variable_rules):
+        problems = audit_pattern(rule.pattern)
+        literals = sorted(min(factor, key=len) for factor in rule.literals)
+        small_inputs = adversarial_inputs(rule.pattern, literals, args.size // 4, args.seed)
+        large_inputs = adversarial_inputs(rule.pattern, literals, args.size, args.seed)
+        audited = rule.quarantined
+        worst = None
+        for name, text in large_inputs.items():
+            if audited:
+                break
+            small, _ = time_rule(rule, small_inputs.get(name, ''), args.runs)
+            large, timed_out = time_rule(rule, text, args.runs)
+            entry = {'input': name, 'length': len(text), 'seconds': large,
+                     'growth': growth(small, large, len(text) / max(len(small_inputs.get(name, '')), 1)),
+                     'timed_out': timed_out}
+            if worst is None or large > worst['seconds']:
+                worst = entry
+            if args.corpus:
+                os.makedirs(args.corpus, exist_ok=True)
+                path = os.path.join(args.corpus, f"{rule.id.replace(':', '-')}-{name}.txt")
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+        budget = time_budget(args.size)
+        over = bool(audited) or (worst is not None and worst['seconds'] > budget)
+        results.append({
+            'rule': rule.id,
+            'type': getattr(rule, 'secret_type', 'variable assignment'),
+            'problems': [{'severity': severity, 'problem': text} for severity, text in problems],
+            'worst': worst,
+            'budget_seconds': budget,
+            'passed': not over,
+        })
+
+    passed = all(result['passed'] for result in results)
+    if args.json:
+        print(json.dumps({'size': args.size, 'results': results, 'passed': passed}, indent=2))
+    else:
+        for result in results:
+            worst = result['worst']
+            status = 'ok' if result['passed'] else 'OVER BUDGET'
+            if worst is None:
+                timing = 'not run, quarantined by the audit'
+            else:
+                k = worst['growth']
+                timing = (f"{worst['seconds'] * 1000:8.2f} ms on {worst['input']:<17}"
+                          f" growth {'n/a' if k is None else f'n^{k:.1f}':>6}"
+                          f"{' (timed out)' if worst['timed_out'] else ''}")
+            print(f"{result['rule']:<12} {status:<11} {timing}  {result['type']}")
+            for problem in result['problems']:
+                print(f"             {problem['severity']}: {problem['problem']}")
+        if not passed:
+            print(f"Rules over the budget of {time_budget(args.size) * 1000:.0f} ms at {args.size} characters, "
+                  f"or with {EXPONENTIAL} backtracking, would be quarantined at scan time")
+
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
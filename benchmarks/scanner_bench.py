@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the scanner hot paths.
+
+Times content scanning, line scanning, entropy scoring, staged diff parsing
+and scanning, the HTML report and secret masking over a synthetic corpus
+(see corpus.py), and reports throughput in MB/s and lines/s. Results can be
+saved as JSON and compared with an earlier run, to see whether a change to
+the detection patterns or the scanner made commits slower.
+
+    python benchmarks/scanner_bench.py [--files 200] [--size-kb 16] [--repeat 3]
+        [--save results.json] [--compare baseline.json] [--max-regression 10]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import tempfile
+import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
+
+HOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'hooks')
+sys.path.insert(0, HOOKS_DIR)
+
+from corpus import add_corpus_arguments, corpus_from_arguments, iter_patch  # noqa: E402
+from commit_scripts import entropy  # noqa: E402
+from commit_scripts.finding import Finding  # noqa: E402
+from commit_scripts.report import write_html_report  # noqa: E402
+from commit_scripts.rules import get_default_ruleset  # noqa: E402
+from commit_scripts.secretscan import SecretScanner  # noqa: E402
+from commit_scripts.staged import StagedChanges  # noqa: E402
+from commit_scripts.utils import mask_secret, parse_added_lines  # noqa: E402
+
+# Bump when benchmarks are added, removed or measure something else
+RESULTS_VERSION = 1
+
+# Work a benchmark did: bytes and lines of input, and items such as findings
+Work = Tuple[int, int, int]
+
+REPORT_METADATA = {
+    'author': 'Benchmark', 'repo_name': 'corpus', 'branch': 'main',
+    'commit_hash': '0' * 40, 'timestamp': '1970-01-01 00:00:00',
+}
+
+
+class Benchmarks:
+    """The benchmarks over one corpus, by name."""
+
+    def __init__(self, corpus: Dict[str, str], report_findings: int):
+        self.corpus = corpus
+        self.bytes = sum(len(text.encode('utf-8')) for text in corpus.values())
+        self.lines = sum(text.count('\n') for text in corpus.values())
+        self.patch: List[bytes] = list(iter_patch(corpus))
+        self.patch_bytes = sum(map(len, self.patch))
+        self.findings = self._sample_findings(report_findings)
+        words = {word.strip('"\';,') for text in corpus.values() for word in text.split()}
+        self.values = sorted(word for word in words if len(word) >= 8)
+
+    def _sample_findings(self, count: int) -> List[Finding]:
+        """Scan the corpus once and repeat its findings at new lines up to ``count``."""
+        scanner = SecretScanner()
+        found: List[Finding] = []
+        for path, text in self.corpus.items():
+            found.extend(scanner.scan_content(text, path))
+        if not found:
+            return []
+        findings = []
+        for i in range(count):
+            row = found[i % len(found)].to_row()
+            row[1] += (i // len(found)) * 100000
+            findings.append(Finding.from_row(row))
+        return findings
+
+    def scan_content(self) -> Work:
+        scanner = SecretScanner()
+        found = 0
+        for path, text in self.corpus.items():
+            found += len(scanner.scan_content(text, path))
+        return self.bytes, self.lines, found
+
+    def scan_line(self) -> Work:
+        scanner = SecretScanner()
+        for path, text in self.corpus.items():
+            for line_number, line in enumerate(text.splitlines(), 1):
+                scanner.scan_line(path, line_number, line)
+        return self.bytes, self.lines, len(scanner.found_secrets)
+
+    def calculate_entropy(self) -> Work:
+        # Score every value afresh rather than from the memo
+        entropy._memo.clear()
+        scanner = SecretScanner()
+        for value in self.values:
+            scanner.calculate_entropy(value)
+        return sum(len(value) for value in self.values), 0, len(self.values)
+
+    def parse_diff(self) -> Work:
+        added = sum(1 for _ in parse_added_lines(iter(self.patch)))
+        return self.patch_bytes, added, added
+
+    def scan_staged_changes(self) -> Work:
+        staged = StagedChanges({path: 'A' for path in self.corpus}, iter(self.patch))
+        found = SecretScanner().scan_staged_changes(staged)
+        return self.patch_bytes, self.lines, len(found)
+
+    def html_report(self) -> Work:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.html')
+            diff = self.findings[:len(self.findings) // 10]
+            counts = write_html_report(path, diff, self.findings, REPORT_METADATA)
+            size = os.path.getsize(path)
+        return size, 0, counts.get('repo_data', 0)
+
+    def mask_secret(self) -> Work:
+        values = [finding.matched_content for finding in self.findings]
+        for value in values:
+            mask_secret(value)
+        return sum(len(value) for value in values), 0, len(values)
+
+    def all(self) -> Dict[str, Callable[[], Work]]:
+        return {
+            'scan_content': self.scan_content,
+            'scan_line': self.scan_line,
+            'calculate_entropy': self.calculate_entropy,
+            'parse_diff': self.parse_diff,
+            'scan_staged_changes': self.scan_staged_changes,
+            'html_report': self.html_report,
+            'mask_secret': self.mask_secret,
+        }
+
+
+def run(benchmark: Callable[[], Work], repeat: int) -> Dict:
+    """Run a benchmark ``repeat`` times and describe its fastest run."""
+    best = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        size, lines, items = benchmark()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, size, lines, items)
+    elapsed, size, lines, items = best
+    seconds = max(elapsed, 1e-9)
+    return {
+        'seconds': round(elapsed, 6), 'bytes': size, 'lines': lines, 'items': items,
+        'mb_per_s': round(size / seconds / (1024 * 1024), 3),
+        'lines_per_s': round(lines / seconds, 1),
+        'items_per_s': round(items / seconds, 1),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HOOKS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, baseline: Dict) -> Dict[str, float]:
+    """Return the change in throughput of each benchmark against a baseline, in percent."""
+    changes = {}
+    for name, result in results['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before or before.get('seconds', 0) <= 0:
+            continue
+        # Work differs when the corpus or the rules do; compare time per unit of input
+        work, before_work = result['bytes'] or result['items'], before['bytes'] or before['items']
+        if not work or not before_work:
+            continue
+        rate = work / max(result['seconds'], 1e-9)
+        before_rate = before_work / before['seconds']
+        changes[name] = round((rate / before_rate - 1) * 100, 1)
+    return changes
+
+
+def main() -> None:
+    """Run the benchmarks and exit with status 1 if one regressed too far."""
+    parser = argparse.ArgumentParser(description="Benchmark the scanner hot paths.")
+    add_corpus_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per benchmark; the fastest counts")
+    parser.add_argument('--only', help="Comma-separated benchmarks to run")
+    parser.add_argument('--report-findings', type=int, default=20000,
+                        help="Findings in the benchmarked report")
+    parser.add_argument('--save', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Compare with results saved by an earlier run")
+    parser.add_argument('--max-regression', type=float,
+                        help="Fail if a benchmark is this many percent slower than the compared run")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    # Findings are logged at INFO; keep the logging cost out of the timings
+    logging.getLogger('commit_scripts').setLevel(logging.WARNING)
+    corpus, summary = corpus_from_arguments(args)
+    benchmarks = Benchmarks(corpus, args.report_findings).all()
+    if args.only:
+        names = [name.strip() for name in args.only.split(',')]
+        unknown = [name for name in names if name not in benchmarks]
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(unknown)}; choose from {', '.join(benchmarks)}")
+        benchmarks = {name: benchmarks[name] for name in names}
+
+    ruleset = get_default_ruleset()
+    results = {
+        'version': RESULTS_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': entropy._load_numpy(),
+        'ruleset': ruleset.version,
+        'rules': len(ruleset.rules) + len(ruleset.variable_rules),
+        'corpus': summary,
+        'repeat': args.repeat,
+        'results': {name: run(benchmark, args.repeat) for name, benchmark in benchmarks.items()},
+    }
+
+    changes: Dict[str, float] = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('version') != RESULTS_VERSION:
+            print(f"{args.compare} was written by another version of the benchmarks", file=sys.stderr)
+        changes = compare(results, baseline)
+        results['compared_with'] = {'path': args.compare, 'revision': baseline.get('revision'),
+                                    'ruleset': baseline.get('ruleset'), 'change_percent': changes}
+    regressed = [name for name, change in changes.items()
+                 if args.max_regression is not None and change < -args.max_regression]
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Corpus: {summary['files']} files, {summary['bytes'] / (1024 * 1024):.1f} MB, "
+              f"{summary['lines']} lines, {summary['secrets_planted']} planted secrets; "
+              f"rule set {ruleset.version}, best of {args.repeat}")
+        for name, result in results['results'].items():
+            change = f"  {changes[name]:+6.1f}%" if name in changes else ''
+            print(f"  {name:<20} {result['seconds'] * 1000:9.1f} ms  {result['mb_per_s']:8.2f} MB/s  "
+                  f"{result['lines_per_s']:11.0f} lines/s  {result['items_per_s']:11.0f} items/s{change}")
+        if args.compare and baseline.get('ruleset') != ruleset.version:
+            print("The detection rules changed since the compared run")
+        if args.compare and baseline.get('corpus', {}).get('bytes') != summary['bytes']:
+            print("The compared run used another corpus, so its timings may not be comparable")
+        if regressed:
+            print(f"Slower than the compared run by over {args.max_regression:g}%: {', '.join(regressed)}")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Single-pass tokenizer for assignments of string literals to names.
+
+One pattern finds every ``name <operator> "literal"`` pair on a line, in the
+syntaxes secrets are usually assigned in:
+
+- Python, JavaScript/TypeScript, Java and Go: ``api_key = "..."``,
+  ``const apiKey = '...'``, ``token := "..."``, ``password: str = "..."``,
+  keyword arguments, template literals and Go raw strings in backquotes,
+  and Python triple-quoted strings closed on the same line
+- YAML, ``.env`` and ``.properties`` files: ``key: '...'``, ``KEY="..."``,
+  ``db.password="..."``
+- JSON and object or dict literals, whose keys are quoted themselves:
+  ``"apiKey": "..."``, ``{'token': '...'}``
+
+String literals end at the first unescaped closing quote of their own kind,
+so ``"it's"`` and ``"a \\"quoted\\" word"`` are read whole. Values are
+returned as written, escapes included, so they can be found in the line
+again.
+
+The regex engine scans each line once for all of these forms; it replaces
+four overlapping patterns that were each matched against the line. A name
+only starts at a word boundary, so the engine does not retry every suffix
+of long words. Unquoted values, as in most ``.env`` and ``.properties``
+files, are left to the detection patterns.
+"""
+
+import re
+from typing import List, Match, Pattern, Tuple
+
+# The assigned name: a word, quoted as a key in JSON and object literals
+NAME = r'''["']?\b(\w+)["']?'''
+
+# =, := (Go and Python), : (YAML, JSON and object literals) or a type
+# annotation between the name and = (Python and TypeScript)
+OPERATOR = r'''\s*(?::=|=|:(?:\s*[\w.]+(?:\[[\w.\[\], |]*\])?\s*=)?)\s*'''
+
+# Quoted literals, each capturing its contents. Triple quotes are tried
+# before the empty string they start with.
+VALUE = '|'.join([
+    r'"""((?:[^"\\\n]|\\.|"(?!""))*)"""',
+    r"'''((?:[^'\\\n]|\\.|'(?!''))*)'''",
+    r'"((?:[^"\\\n]|\\.)*)"',
+    r"'((?:[^'\\\n]|\\.)*)'",
+    r'`((?:[^`\\\n]|\\.)*)`',
+])
+
+# Captures the name in its first group and the value in whichever later
+# group matched, which is always the last one to match
+ASSIGNMENT_PATTERN = f'{NAME}{OPERATOR}(?:{VALUE})'
+
+ASSIGNMENT_RE: Pattern[str] = re.compile(ASSIGNMENT_PATTERN)
+
+
+def split_assignment(match: Match[str]) -> Tuple[str, str]:
+    """Return the (name, value) of a match of an assignment pattern.
+
+    The name is the first group and the value the last group that matched,
+    which also splits patterns with exactly these two groups.
+    """
+    return match.group(1), match.group(match.lastindex)
+
+
+def find_assignments(text: str) -> List[Tuple[str, str]]:
+    """Return the (name, value) of every assignment of a string literal in ``text``."""
+    return [split_assignment(match) for match in ASSIGNMENT_RE.finditer(text)]
@@ -0,0 +1,179 @@
+"""Installed hook bundle: incremental sync, precompilation and integrity check.
+
+The installer copies the hook scripts and this package into the hooks
+directory and records every installed file in a manifest with its SHA-256,
+size and mtime. Reinstalling only copies files whose content changed and
+removes files no longer shipped. The package is then byte-compiled by the
+interpreter the hooks run with, so hooks never compile or write
+``__pycache__`` on first use. At hook startup ``verify_bundle`` compares the
+manifest against one ``stat`` per file, which is cheap enough for every run.
+"""
+
+import os
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+MANIFEST_NAME = '.genie-bundle.json'
+MANIFEST_FORMAT_VERSION = 1
+
+PACKAGE_NAME = 'commit_scripts'
+
+# Files in the package that are never installed
+_SKIPPED_DIRS = {'__pycache__'}
+_SKIPPED_SUFFIXES = ('.pyc', '.log')
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    # Only the installer hashes files; hooks verifying the bundle do not
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(hooks_dir: Union[str, Path]) -> Optional[Dict]:
+    """Return the manifest of an installed bundle, or None if there is none."""
+    try:
+        with open(os.path.join(hooks_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('format') != MANIFEST_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def verify_bundle(hooks_dir: Union[str, Path]) -> List[str]:
+    """Check installed files against the manifest by size and mtime.
+
+    Returns a description of every missing or modified file. A hooks
+    directory without a manifest, such as a source checkout, is not checked.
+    """
+    manifest = load_manifest(hooks_dir)
+    if manifest is None:
+        return []
+    problems = []
+    for name, entry in manifest.get('files', {}).items():
+        try:
+            stat = os.stat(os.path.join(hooks_dir, name))
+        except OSError:
+            problems.append(f"{name} is missing")
+            continue
+        if stat.st_size != entry.get('size') or stat.st_mtime_ns != entry.get('mtime_ns'):
+            problems.append(f"{name} was modified after installation")
+    return problems
+
+
+def bundle_files(source_dir: Path, hook_files: List[str]) -> Dict[str, Path]:
+    """Map each file to install, relative to the hooks directory, to its source.
+
+    Raises FileNotFoundError if one of ``hook_files`` does not exist.
+    """
+    files = {}
+    for name in hook_files:
+        path = source_dir / name
+        if not path.is_file():
+            raise FileNotFoundError(f"Hook file not found: {path}")
+        files[name] = path
+    package_dir = source_dir / PACKAGE_NAME
+    for root, dirs, names in os.walk(package_dir):
+        dirs[:] = sorted(d for d in dirs if d not in _SKIPPED_DIRS)
+        for name in sorted(names):
+            if name.endswith(_SKIPPED_SUFFIXES):
+                continue
+            path = Path(root) / name
+            files[path.relative_to(source_dir).as_posix()] = path
+    return files
+
+
+def find_hook_python() -> Optional[str]:
+    """Return the interpreter the hook scripts' ``python3`` shebang resolves to."""
+    return shutil.which('python3') or shutil.which('python')
+
+
+def compile_bundle(hooks_dir: Path, python: str) -> bool:
+    """Byte-compile the installed package with the hooks' interpreter.
+
+    compileall skips modules whose bytecode is current, so only files copied
+    by this install, or missing bytecode for a new interpreter, are compiled.
+    """
+    cmd = [python, '-m', 'compileall', '-q', str(hooks_dir / PACKAGE_NAME)]
+    result = subprocess.run(cmd, capture_output=True,
+                            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+    return result.returncode == 0
+
+
+def _install_file(source: Path, target: Path, executable: bool) -> os.stat_result:
+    """Copy a file into place atomically, so hooks never see it half written.
+
+    The copy gets a new mtime, which also invalidates its old bytecode.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(target.name + '.tmp')
+    shutil.copyfile(source, tmp)
+    os.chmod(tmp, 0o755 if executable else 0o644)
+    os.replace(tmp, target)
+    return os.stat(target)
+
+
+def sync_bundle(source_dir: Union[str, Path], hooks_dir: Union[str, Path],
+                hook_files: List[str], python: Optional[str] = None) -> Dict[str, int]:
+    """Install the hook bundle into ``hooks_dir``, copying only what changed.
+
+    ``hook_files`` are the top-level scripts, installed as executables; the
+    whole package directory is installed next to them. Bytecode is compiled
+    with ``python``, by default the interpreter found on PATH, and skipped if
+    there is none. Returns counts of copied, unchanged and removed files.
+    """
+    source_dir, hooks_dir = Path(source_dir), Path(hooks_dir)
+    hooks_dir.mkdir(parents=True, exist_ok=True)
+    old_files = (load_manifest(hooks_dir) or {}).get('files', {})
+    stats = {'copied': 0, 'unchanged': 0, 'removed': 0, 'compiled': 0}
+
+    files = {}
+    for name, source in bundle_files(source_dir, hook_files).items():
+        target = hooks_dir / name
+        digest = file_digest(source)
+        entry = old_files.get(name)
+        try:
+            stat = os.stat(target)
+        except OSError:
+            stat = None
+
+        if stat is not None and entry is not None and entry.get('sha256') == digest and (
+                (stat.st_size, stat.st_mtime_ns) == (entry.get('size'), entry.get('mtime_ns'))
+                or file_digest(target) == digest):
+            # Only hash the installed copy when its size or mtime changed
+            stats['unchanged'] += 1
+        else:
+            stat = _install_file(source, target, executable=name in hook_files)
+            stats['copied'] += 1
+        files[name] = {'sha256': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    for name in old_files.keys() - files.keys():
+        try:
+            os.unlink(hooks_dir / name)
+            stats['removed'] += 1
+        except OSError:
+            pass
+
+    python = python or find_hook_python()
+    if python and compile_bundle(hooks_dir, python):
+        stats['compiled'] = 1
+
+    manifest = {
+        'format': MANIFEST_FORMAT_VERSION,
+        'python': python,
+        'files': files,
+    }
+    tmp = hooks_dir / (MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, hooks_dir / MANIFEST_NAME)
+    return stats
@@ -0,0 +1,139 @@
+"""Persistent cache of scan results keyed by git blob SHA."""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import subprocess
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config import SCAN_CACHE_MAX_BYTES, SCAN_CACHE_DIR
+from .utils import get_git_dir
+
+# Bump when the layout of cached candidates changes
+CACHE_FORMAT_VERSION = 4
+
+# Approximate per-row overhead counted against the size bound
+ROW_OVERHEAD = 64
+
+
+class ScanCache:
+    """Map git blob SHAs to the candidates found in that blob.
+
+    Entries are only valid for one rule-set version; opening the cache with a
+    different version discards everything. The total size of stored entries is
+    bounded, and the least recently used entries are evicted first.
+    """
+
+    def __init__(self, path: str, version: str, max_bytes: int = SCAN_CACHE_MAX_BYTES,
+                 logger: Optional[logging.Logger] = None):
+        self.path = path
+        self.version = f"{CACHE_FORMAT_VERSION}:{version}"
+        self.max_bytes = max_bytes
+        self.logger = logger or logging.getLogger(__name__)
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "sha TEXT PRIMARY KEY, candidates TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != self.version:
+            if row is not None:
+                self.logger.info("Scan rules changed, discarding scan cache")
+            with self._conn:
+                self._conn.execute("DELETE FROM blobs")
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+
+    @classmethod
+    def for_repository(cls, version: str, logger: Optional[logging.Logger] = None) -> Optional['ScanCache']:
+        """Open the cache of the current repository, or None if it is unavailable."""
+        logger = logger or logging.getLogger(__name__)
+        try:
+            git_dir = get_git_dir()
+            path = os.path.join(git_dir, 'genie', 'scan-cache.sqlite3')
+            if not os.access(git_dir, os.W_OK):
+                # Fall back to a per-repository cache in the user's home
+                repo_key = hashlib.sha1(git_dir.encode('utf-8')).hexdigest()[:16]
+                path = os.path.join(os.path.expanduser(SCAN_CACHE_DIR), f'{repo_key}.sqlite3')
+            return cls(path, version, logger=logger)
+        except (subprocess.CalledProcessError, OSError, sqlite3.Error) as e:
+            logger.warning(f"Scan cache unavailable: {e}")
+            return None
+
+    def get_many(self, shas: Iterable[str]) -> Dict[str, List[Any]]:
+        """Return the cached candidates for every known SHA and mark them as used."""
+        shas = list(shas)
+        found: Dict[str, List[Any]] = {}
+        try:
+            # Stay well below SQLite's limit on bound parameters
+            for i in range(0, len(shas), 500):
+                batch = shas[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT sha, candidates FROM blobs WHERE sha IN ({placeholders})", batch
+                )
+                for sha, candidates in rows:
+                    found[sha] = json.loads(candidates)
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE blobs SET last_used = ? WHERE sha = ?",
+                    ((now, sha) for sha in found)
+                )
+        except (sqlite3.Error, ValueError) as e:
+            self.logger.warning(f"Error reading scan cache: {e}")
+            found = {}
+        self.stats['hits'] += len(found)
+        self.stats['misses'] += len(shas) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, List[Any]]) -> None:
+        """Store candidates for blobs and evict old entries beyond the size bound."""
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for sha, candidates in entries.items():
+            data = json.dumps(candidates, separators=(',', ':'))
+            rows.append((sha, data, len(data) + ROW_OVERHEAD, now))
+        try:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)", rows)
+            self.stats['stored'] += len(rows)
+            self._evict()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error writing scan cache: {e}")
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits its size bound."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evict = []
+        for sha, size in self._conn.execute("SELECT sha, size FROM blobs ORDER BY last_used ASC"):
+            if total <= self.max_bytes:
+                break
+            evict.append((sha,))
+            total -= size
+        with self._conn:
+            self._conn.executemany("DELETE FROM blobs WHERE sha = ?", evict)
+        self.stats['evicted'] += len(evict)
+
+    def log_stats(self) -> None:
+        """Log cache hit and miss counts."""
+        stats = self.stats
+        self.logger.info(
+            f"Scan cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['stored']} stored, {stats['evicted']} evicted"
+        )
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        self._conn.close()
@@ -11,14 +11,19 @@ ENTROPY_THRESHOLDS = {
     'default': 4.0        # Default threshold
 }
 
+# Number of recent values whose entropy is remembered
+ENTROPY_MEMO_SIZE = 8192
+# Smallest batch of new values scored with NumPy when it is installed
+ENTROPY_NUMPY_MIN_BATCH = 64
+
 # Patterns for detecting secrets with their specific requirements
 PATTERNS: List[Tuple[str, str, Dict]] = [
     # AWS - High entropy requirement
     (r'(?i)aws[_\-\.]*(access|secret|key)[_\-\.]*\s*[=:]\s*[A-Za-z0-9/\+=]{16,}', 'AWS Credential', {'min_length': 16, 'require_entropy': True, 'threshold': 4.5}),
     (r'AKIA[0-9A-Z]{16}', 'AWS Access Key ID', {'min_length': 20, 'require_entropy': True, 'threshold': 4.5}),
     
-    # Private Keys - No entropy check needed, pattern is sufficient
-    (r'(?i)-----BEGIN\s+(?:RSA|OPENSSH|DSA|EC|PGP)\s+PRIVATE\s+KEY-----[A-Za-z0-9/\+=\s]+-----END', 'Private Key', {'require_entropy': False}),
+    # Private Keys - No entropy check needed, pattern is sufficient; PEM blocks span lines
+    (r'(?i)-----BEGIN\s+(?:RSA|OPENSSH|DSA|EC|PGP)\s+PRIVATE\s+KEY-----[A-Za-z0-9/\+=\s]+-----END', 'Private Key', {'require_entropy': False, 'multiline': True}),
     (r'(?i)ssh-rsa\s+[A-Za-z0-9/\+=]{32,}', 'SSH Key', {'require_entropy': False}),
     
     # API Keys & Tokens - Medium entropy requirement
@@ -47,6 +52,116 @@ PATTERNS: List[Tuple[str, str, Dict]] = [
     (r'(?i)export\s+(\w+)\s*=\s*[^\s]{6,}', 'Environment Variable', {'min_length': 6, 'check_name': True}),
 ]
 
+# Terms in a variable name that suggest it holds a secret
+SUSPICIOUS_NAME_TERMS = {
+    'token', 'secret', 'password', 'pwd', 'pass', 'key', 'auth',
+    'credential', 'api', 'private', 'cert', 'ssh'
+}
+
+# Configuration files read by a walker for their format, by file name. Their
+# key/value pairs are checked like variable assignments, in place of the
+# assignment pattern; see structured.py. Generated files are not walked.
+STRUCTURED_FILE_PATTERNS: Dict[str, List[str]] = {
+    'json': ['*.json', '*.jsonc'],
+    'yaml': ['*.yaml', '*.yml'],
+    'env': ['.env', '.env.*', '*.env'],
+    'properties': ['*.properties', '*.ini', '*.cfg'],
+    'xml': ['*.xml', '*.config'],
+}
+
+# Repository scans with fewer files than this run serially, since starting
+# a process pool costs more than it saves
+PARALLEL_SCAN_MIN_FILES = 200
+# Largest number of files handed to a worker process at once
+PARALLEL_SCAN_CHUNK_SIZE = 256
+
+# Size bound of the per-repository scan result cache
+SCAN_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Cache location used when the repository's .git directory is not writable
+SCAN_CACHE_DIR = '~/.genie/cache'
+
+# File in SCAN_CACHE_DIR remembering a successful git installation and
+# identity check, until git or the global git config changes
+GIT_HEALTH_CACHE_FILE = 'git-health.json'
+
+# Directory holding the per-user scan daemon's socket, lock and log, used
+# when $XDG_RUNTIME_DIR is not set
+SCAN_DAEMON_DIR = '~/.genie/run'
+# Environment variable that, when set to 1, lets the hooks start the scan
+# daemon on first use
+SCAN_DAEMON_ENV = 'GENIE_SCAN_DAEMON'
+# Seconds without a request after which the scan daemon exits
+SCAN_DAEMON_IDLE_TIMEOUT = 30 * 60
+# Seconds a hook waits to connect to the daemon, and for a scan result,
+# before scanning in-process instead
+SCAN_DAEMON_CONNECT_TIMEOUT = 0.5
+SCAN_DAEMON_REQUEST_TIMEOUT = 300
+
+# Lines longer than LONG_LINE_CHARS characters are matched in windows of
+# LONG_LINE_WINDOW_CHARS characters. Each window reaches as far past its end
+# as the longest match of any rule, capped at LONG_LINE_MAX_MATCH characters,
+# so a match crossing into the next window is still found whole; longer
+# matches on such lines are cut there.
+LONG_LINE_CHARS = 4096
+LONG_LINE_WINDOW_CHARS = 1024
+LONG_LINE_MAX_MATCH = 512
+
+# Minified and generated files are only scanned with the rules that need no
+# entropy check. A file counts as minified when its first MINIFIED_SAMPLE_BYTES
+# bytes are at least MINIFIED_MIN_BYTES long and their lines average more
+# than MINIFIED_AVG_LINE_CHARS characters. It counts as generated when its
+# name matches one of GENERATED_FILE_PATTERNS, or when one of
+# GENERATED_MARKERS occurs in its first GENERATED_MARKER_BYTES bytes.
+MINIFIED_SAMPLE_BYTES = 64 * 1024
+MINIFIED_MIN_BYTES = 4096
+MINIFIED_AVG_LINE_CHARS = 300
+GENERATED_FILE_PATTERNS = [
+    '*.min.js', '*.min.css', '*.map', '*.bundle.js', '*-bundle.js',
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml',
+    'composer.lock', 'Cargo.lock', 'Gemfile.lock', 'poetry.lock', 'go.sum',
+    '*.pb.go', '*_pb2.py', '*_pb2_grpc.py',
+]
+GENERATED_MARKERS = ['@generated', 'DO NOT EDIT']
+GENERATED_MARKER_BYTES = 1024
+
+# Number of slowest files listed in the log after a scan
+SLOW_FILES_LOGGED = 5
+
+# Seconds of CPU time a single rule may spend matching one line, plus this
+# many seconds per MB when it is matched against a whole file. Rules over
+# budget are skipped for the rest of the process, or of the daemon request,
+# and the hooks list them. The slowest built-in pattern takes a
+# few milliseconds on the worst LONG_LINE_CHARS line benchmarks/rule_fuzz.py
+# finds.
+RULE_TIME_BUDGET = 1.0
+RULE_TIME_BUDGET_PER_MB = 1.0
+
+# Findings keep lines up to FINDING_MAX_LINE_CHARS characters whole; of longer
+# lines they keep FINDING_CONTEXT_CHARS characters on each side of the match.
+# Matched values are kept up to FINDING_MATCH_CHARS characters.
+FINDING_MAX_LINE_CHARS = 400
+FINDING_CONTEXT_CHARS = 80
+FINDING_MATCH_CHARS = 200
+
+# Scans sample the memory use (PSS) of the process and its worker processes
+# every MEMORY_SAMPLE_INTERVAL seconds and log the peak of each phase. Past a
+# soft limit of MEMORY_SOFT_LIMIT_MB, or MEMORY_CONTAINER_SHARE of the memory
+# limit of the container when that is lower, the scanner stops its worker
+# processes and scans the remaining files serially, keeping the results of
+# only a few files in memory at once. $GENIE_MEMORY_LIMIT_MB overrides the
+# limit, 0 turning it off; $GENIE_TRACE_MEMORY=N logs the N call sites that
+# allocated most in each phase, which makes scans several times slower.
+MEMORY_SAMPLE_INTERVAL = 0.1
+MEMORY_SOFT_LIMIT_MB = 1024
+MEMORY_CONTAINER_SHARE = 0.75
+MEMORY_LIMIT_ENV = 'GENIE_MEMORY_LIMIT_MB'
+MEMORY_TRACE_ENV = 'GENIE_TRACE_MEMORY'
+
+# Incremental post-commit scans fall back to a full scan after this many
+# commits, or when more files than this changed since the last scan
+FULL_SCAN_INTERVAL = 50
+INCREMENTAL_SCAN_MAX_FILES = 2000
+
 # File extensions to exclude from scanning
 EXCLUDED_EXTENSIONS = {
     'zip', 'gz', 'tar', 'rar', '7z', 'exe', 'dll', 'so', 'dylib',
@@ -57,6 +172,14 @@ EXCLUDED_EXTENSIONS = {
     'tif', 'tiff', 'ico', 'webp'
 }
 
+# Files at least this large are memory-mapped instead of read for scanning
+MMAP_MIN_BYTES = 1024 * 1024
+
+# Files without a git 'text' attribute are sniffed: the first bytes are read
+# and a NUL byte or this share of invalid UTF-8 marks the file as binary
+BINARY_SNIFF_BYTES = 8000
+BINARY_INVALID_UTF8_RATIO = 0.3
+
 # Directories to exclude from scanning
 EXCLUDED_DIRECTORIES = {
     'distribution', 'node_modules', 'vendor', 'build', 'dist',
@@ -0,0 +1,292 @@
+"""Optional per-user scan daemon.
+
+One long-lived process keeps the compiled rules, the entropy memo and the
+scan caches warm between hook runs. Each connection on the user's Unix socket
+carries one JSON request line and gets one JSON response line back. Requests
+are scanned one at a time, because each runs in the requesting hook's working
+directory and git environment. A staged scan that would have to wait for
+another request, such as another repository's full post-commit scan, is
+answered as busy at once, and the pre-commit hook scans in-process instead of
+blocking the commit. The daemon exits after SCAN_DAEMON_IDLE_TIMEOUT seconds
+without a request, or when a hook runs different scanner code than it loaded.
+
+Start it with ``python3 -m commit_scripts.daemon`` from the hooks directory,
+or set GENIE_SCAN_DAEMON=1 to have the hooks start it on first use.
+"""
+
+import os
+import sys
+import json
+import queue
+import fcntl
+import socket
+import struct
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, IO, Iterator, Optional, Tuple
+
+from .config import SCAN_DAEMON_IDLE_TIMEOUT
+from .daemon_client import (
+    PROTOCOL_VERSION, FORWARDED_ENV_PREFIX, code_fingerprint, socket_path,
+    send
+)
+from .finding import dump_findings
+from .rules import get_default_ruleset
+from .secretscan import SecretScanner, start_fork_server
+from .staged import StagedChanges
+
+# Seconds a client gets to send its request line
+REQUEST_READ_TIMEOUT = 5
+
+# Requests that are answered as busy rather than queued behind another one
+BUSY_REPLY_OPS = ('staged',)
+
+
+def _replace_git_env(env: Dict[str, str]) -> None:
+    """Make ``env`` the only git environment variables of this process."""
+    for name in [name for name in os.environ if name.startswith(FORWARDED_ENV_PREFIX)]:
+        del os.environ[name]
+    os.environ.update({name: value for name, value in env.items()
+                       if name.startswith(FORWARDED_ENV_PREFIX)})
+
+
+@contextmanager
+def _request_context(cwd: str, env: Dict[str, str]) -> Iterator[None]:
+    """Run in a client's working directory and git environment."""
+    saved_cwd = os.getcwd()
+    _replace_git_env(env)
+    try:
+        os.chdir(cwd)
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        _replace_git_env({})
+
+
+class ScanDaemon:
+    """Serve scan requests from the current user's hooks."""
+
+    def __init__(self, path: str, idle_timeout: float = SCAN_DAEMON_IDLE_TIMEOUT,
+                 logger: Optional[logging.Logger] = None):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.code = code_fingerprint()
+        # Compiled once here and shared by every request's scanner
+        self.ruleset = get_default_ruleset()
+        self.requests = 0
+        # Requests accepted and not yet answered, counted by the accepting
+        # thread and the serving thread
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    def serve(self) -> None:
+        """Listen until idle for too long, told to stop, or found stale.
+
+        Returns at once if another daemon already holds the lock.
+        """
+        lock = self._acquire_lock()
+        if lock is None:
+            self.logger.info("Scan daemon already running")
+            return
+        with lock:
+            _replace_git_env({})
+            # Scan workers are forked from a server started here, before the
+            # accepting thread and in no client's git environment
+            start_fork_server()
+            server = self._bind()
+            self.logger.info(f"Scan daemon {os.getpid()} listening on {self.path}")
+            # Requests are read on their own thread, so staged scans can be
+            # turned away while a scan runs; scans run on this thread
+            requests: 'queue.Queue[Tuple[socket.socket, Dict[str, Any]]]' = queue.Queue()
+            acceptor = threading.Thread(target=self._accept, args=(server, requests),
+                                        name='scan-daemon-accept', daemon=True)
+            acceptor.start()
+            try:
+                while True:
+                    try:
+                        conn, message = requests.get(timeout=self.idle_timeout)
+                    except queue.Empty:
+                        self.logger.info("Scan daemon idle, exiting")
+                        return
+                    with conn:
+                        try:
+                            keep_running = self._handle(conn, message)
+                        finally:
+                            with self._pending_lock:
+                                self._pending -= 1
+                    if not keep_running:
+                        return
+            finally:
+                try:
+                    # Wakes the accepting thread, which close alone does not
+                    server.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                server.close()
+                acceptor.join(REQUEST_READ_TIMEOUT)
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+
+    def _accept(self, server: socket.socket,
+                requests: 'queue.Queue[Tuple[socket.socket, Dict[str, Any]]]') -> None:
+        """Accepting thread: read requests and queue them, or answer staged ones as busy."""
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return  # The daemon is exiting
+            message = self._read(conn)
+            if message is None:
+                conn.close()
+                continue
+            with self._pending_lock:
+                busy = self._pending > 0 and message.get('op') in BUSY_REPLY_OPS
+                if not busy:
+                    self._pending += 1
+            if busy:
+                with conn:
+                    self._reply(conn, {'error': 'busy'})
+                continue
+            requests.put((conn, message))
+
+    def _acquire_lock(self) -> Optional[IO[str]]:
+        """Take the per-user daemon lock, or return None if it is held."""
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        lock = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return None
+        return lock
+
+    def _bind(self) -> socket.socket:
+        """Listen on the socket path, replacing a socket left by a dead daemon."""
+        os.chmod(os.path.dirname(self.path), 0o700)
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen(16)
+        return server
+
+    def _same_user(self, conn: socket.socket) -> bool:
+        """Check that the peer runs as this user, where the platform tells."""
+        if not hasattr(socket, 'SO_PEERCRED'):
+            # The socket directory is only accessible to this user
+            return True
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', creds)
+        return uid == os.getuid()
+
+    def _read(self, conn: socket.socket) -> Optional[Dict[str, Any]]:
+        """Read the request of a connection, or return None if it is rejected or invalid."""
+        if not self._same_user(conn):
+            self.logger.warning("Rejected scan request from another user")
+            return None
+        try:
+            conn.settimeout(REQUEST_READ_TIMEOUT)
+            with conn.makefile('rb') as stream:
+                message = json.loads(stream.readline())
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Invalid scan request: {e}")
+            return None
+        if not isinstance(message, dict):
+            self.logger.warning("Invalid scan request: not an object")
+            return None
+        return message
+
+    def _reply(self, conn: socket.socket, response: Dict[str, Any]) -> None:
+        """Send a response line to the client."""
+        try:
+            conn.settimeout(None)
+            conn.sendall(json.dumps(response).encode('utf-8') + b'\n')
+        except OSError as e:
+            self.logger.warning(f"Could not send scan result: {e}")
+
+    def _handle(self, conn: socket.socket, message: Dict[str, Any]) -> bool:
+        """Answer one request; return False if the daemon should exit."""
+        keep_running = True
+        op = message.get('op')
+        if message.get('version') != PROTOCOL_VERSION or message.get('code') != self.code:
+            # The hooks were updated since this daemon started
+            self.logger.info("Scanner code changed, exiting")
+            response: Dict[str, Any] = {'error': 'stale daemon'}
+            keep_running = False
+        elif op == 'shutdown':
+            response = {'result': {}}
+            keep_running = False
+        else:
+            try:
+                response = {'result': self._run(op, message)}
+            except Exception as e:
+                self.logger.error(f"Scan request {op!r} failed: {e}", exc_info=True)
+                response = {'error': str(e)}
+        self.requests += 1
+        self._reply(conn, response)
+        return keep_running
+
+    def _run(self, op: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a request and return its result."""
+        if op == 'ping':
+            return {'pid': os.getpid(), 'requests': self.requests}
+        args = message.get('args') or {}
+        # A rule that ran over its budget on another request's files is
+        # tried again, and the hook is told about the rules this one skipped
+        self.ruleset.reset_quarantine()
+        with _request_context(message['cwd'], message.get('env') or {}):
+            scanner = SecretScanner(self.logger, self.ruleset)
+            if op == 'staged':
+                staged = StagedChanges.open()
+                files = dict(staged.files)
+                findings = scanner.scan_staged_changes(staged)
+                return {'files': files, 'findings': dump_findings(findings),
+                        'skipped_rules': self.ruleset.describe_quarantined()}
+            if op == 'repository':
+                findings = scanner.scan_repository(
+                    jobs=args.get('jobs'),
+                    use_cache=args.get('use_cache', True),
+                    incremental=args.get('incremental', False)
+                )
+                return {'findings': dump_findings(findings),
+                        'skipped_rules': self.ruleset.describe_quarantined()}
+        raise ValueError(f"unknown request {op!r}")
+
+
+def main(argv=None) -> None:
+    """Run the daemon in the foreground, or query or stop a running one."""
+    parser = argparse.ArgumentParser(description="Genie scan daemon for the current user.")
+    parser.add_argument('--idle-timeout', type=float, default=SCAN_DAEMON_IDLE_TIMEOUT,
+                        help="Seconds without a request before exiting")
+    parser.add_argument('--status', action='store_true', help="Report whether a daemon is running")
+    parser.add_argument('--stop', action='store_true', help="Stop the running daemon")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    if args.status or args.stop:
+        response = send('shutdown' if args.stop else 'ping')
+        if response is None:
+            print("Scan daemon is not running")
+            sys.exit(1)
+        if args.stop:
+            print("Scan daemon stopped")
+        else:
+            print(json.dumps(response.get('result', response)))
+        return
+
+    ScanDaemon(socket_path(), args.idle_timeout).serve()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Client side of the optional per-user scan daemon.
+
+Hooks send their scan request to a running daemon and scan in-process when
+``request`` returns None. Only the standard library is imported here, so
+asking the daemon does not load the scanner itself.
+"""
+
+import os
+import sys
+import json
+import socket
+import logging
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    SCAN_DAEMON_DIR, SCAN_DAEMON_ENV, SCAN_DAEMON_CONNECT_TIMEOUT,
+    SCAN_DAEMON_REQUEST_TIMEOUT
+)
+
+# Bump when requests or responses change shape
+PROTOCOL_VERSION = 3
+
+# Environment variables forwarded with every request, since git sets them to
+# tell a hook which repository and index to use
+FORWARDED_ENV_PREFIX = 'GIT_'
+
+
+def is_supported() -> bool:
+    """Whether this platform has Unix domain sockets for the daemon."""
+    return os.name == 'posix' and hasattr(socket, 'AF_UNIX')
+
+
+def runtime_dir() -> str:
+    """Directory holding the daemon's socket, lock file and log."""
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, 'genie')
+    return os.path.expanduser(SCAN_DAEMON_DIR)
+
+
+def socket_path() -> str:
+    """Path of the current user's daemon socket."""
+    return os.path.join(runtime_dir(), f"scan-{os.getuid()}.sock")
+
+
+def code_fingerprint() -> List[List]:
+    """Identify the installed scanner code by file name, mtime and size.
+
+    The daemon refuses requests from hooks whose fingerprint differs from the
+    code it loaded, so updated hooks never get results from stale rules.
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    key = []
+    for entry in sorted(os.scandir(package_dir), key=lambda entry: entry.name):
+        if entry.name.endswith('.py'):
+            stat = entry.stat()
+            key.append([entry.name, stat.st_mtime_ns, stat.st_size])
+    return key
+
+
+def forwarded_env() -> Dict[str, str]:
+    """Return the git environment variables of this process."""
+    return {name: value for name, value in os.environ.items()
+            if name.startswith(FORWARDED_ENV_PREFIX)}
+
+
+def autostart_enabled() -> bool:
+    """Whether hooks may start the daemon when it is not running."""
+    return os.environ.get(SCAN_DAEMON_ENV) == '1'
+
+
+def start_daemon() -> None:
+    """Start the daemon in the background, detached from the calling hook."""
+    hooks_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directory = runtime_dir()
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # The daemon drops the git environment of the hook that started it
+    with open(os.path.join(directory, 'daemon.log'), 'ab') as log:
+        subprocess.Popen(
+            [sys.executable, '-m', 'commit_scripts.daemon'],
+            cwd=hooks_dir, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+            start_new_session=True
+        )
+
+
+def send(op: str, **args: Any) -> Optional[Dict[str, Any]]:
+    """Send one request to the daemon and return its response.
+
+    Returns None if no daemon is listening or the exchange fails.
+    """
+    if not is_supported():
+        return None
+    message = {
+        'version': PROTOCOL_VERSION,
+        'code': code_fingerprint(),
+        'op': op,
+        'args': args,
+        'cwd': os.getcwd(),
+        'env': forwarded_env(),
+    }
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(SCAN_DAEMON_CONNECT_TIMEOUT)
+        try:
+            sock.connect(socket_path())
+        except OSError:
+            return None
+        sock.settimeout(SCAN_DAEMON_REQUEST_TIMEOUT)
+        sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as stream:
+            line = stream.readline()
+        return json.loads(line)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Scan daemon request failed: {e}")
+        return None
+    finally:
+        sock.close()
+
+
+def request(op: str, **args: Any) -> Optional[Dict[str, Any]]:
+    """Have the daemon run a scan and return its result.
+
+    Returns None when the daemon is not running, runs different code or
+    fails, and the caller then scans in-process. If no daemon is running and
+    SCAN_DAEMON_ENV is set to 1, one is started for later requests.
+    """
+    response = send(op, **args)
+    if response is None:
+        if is_supported() and autostart_enabled():
+            try:
+                start_daemon()
+            except OSError as e:
+                logging.warning(f"Could not start scan daemon: {e}")
+        return None
+    if 'error' in response:
+        logging.info(f"Scan daemon did not scan ({response['error']}), scanning in-process")
+        return None
+    return response.get('result')
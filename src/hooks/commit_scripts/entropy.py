@@ -0,0 +1,119 @@
+"""Shannon entropy of candidate secrets."""
+
+import math
+from collections import Counter, OrderedDict
+from typing import List, Optional, Sequence
+
+from .config import ENTROPY_MEMO_SIZE, ENTROPY_NUMPY_MIN_BATCH
+
+# NumPy is optional, and only imported once a batch is large enough to use
+# it, so hooks that score a few values do not pay for loading it
+np = None
+_numpy_checked = False
+
+
+def _load_numpy() -> bool:
+    """Import NumPy on first use; return whether it is available."""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+    return np is not None
+
+
+class EntropyMemo:
+    """Least recently used cache of entropies by value."""
+
+    def __init__(self, max_size: int = ENTROPY_MEMO_SIZE):
+        self.max_size = max_size
+        self._values: 'OrderedDict[str, float]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, value: str) -> Optional[float]:
+        """Return the cached entropy of a value, or None."""
+        entropy = self._values.get(value)
+        if entropy is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._values.move_to_end(value)
+        return entropy
+
+    def put(self, value: str, entropy: float) -> None:
+        """Cache the entropy of a value, evicting the oldest entry if full."""
+        self._values[value] = entropy
+        self._values.move_to_end(value)
+        if len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached values."""
+        self._values.clear()
+
+
+_memo = EntropyMemo()
+
+
+def _entropy(value: str) -> float:
+    """Compute the Shannon entropy of a string from its character counts."""
+    if not value:
+        return 0.0
+    # Counter keeps first-occurrence order, so the sum matches a dict count
+    length = float(len(value))
+    return -sum(f/length * math.log2(f/length) for f in Counter(value).values())
+
+
+def _entropies_numpy(values: List[str]) -> List[float]:
+    """Compute the entropies of ASCII strings from one histogram per string."""
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    codes = np.frombuffer(''.join(values).encode('ascii'), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(values), dtype=np.int64), lengths)
+    counts = np.bincount(rows * 128 + codes, minlength=len(values) * 128).reshape(len(values), 128)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = counts / lengths[:, None]
+        terms = np.where(counts > 0, p * np.log2(p), 0.0)
+    return (-terms.sum(axis=1) + 0.0).tolist()
+
+
+def shannon_entropy(value: str) -> float:
+    """Return the Shannon entropy of a string in bits per character."""
+    entropy = _memo.get(value)
+    if entropy is None:
+        entropy = _entropy(value)
+        _memo.put(value, entropy)
+    return entropy
+
+
+def batch_entropy(values: Sequence[str]) -> List[float]:
+    """Return the Shannon entropy of each value, scoring all new values at once.
+
+    Values seen recently come from the memo. With NumPy installed, large
+    batches of ASCII values are scored together from byte histograms;
+    otherwise each value is counted with ``collections.Counter``.
+    """
+    scores = {}
+    missing = []
+    for value in dict.fromkeys(values):
+        entropy = _memo.get(value)
+        if entropy is None:
+            missing.append(value)
+        else:
+            scores[value] = entropy
+
+    if len(missing) >= ENTROPY_NUMPY_MIN_BATCH and _load_numpy():
+        ascii_values = [value for value in missing if value and value.isascii()]
+        missing = [value for value in missing if not value or not value.isascii()]
+        if ascii_values:
+            scores.update(zip(ascii_values, _entropies_numpy(ascii_values)))
+            for value in ascii_values:
+                _memo.put(value, scores[value])
+    for value in missing:
+        scores[value] = _entropy(value)
+        _memo.put(value, scores[value])
+
+    return [scores[value] for value in values]
@@ -0,0 +1,78 @@
+"""Batched text/binary classification of repository files."""
+
+import os
+import subprocess
+from typing import Dict, List
+
+from .config import EXCLUDED_EXTENSIONS, BINARY_SNIFF_BYTES, BINARY_INVALID_UTF8_RATIO
+
+TEXT = 'text'
+BINARY = 'binary'
+SKIP = 'skip'
+
+
+def get_text_attributes(files: List[str]) -> Dict[str, str]:
+    """Return the git 'text' attribute of every file from one check-attr call.
+
+    Values are 'set', 'unset', 'unspecified' or the attribute's value (such
+    as 'auto'). Returns an empty dict if git cannot be run.
+    """
+    if not files:
+        return {}
+    stdin = ''.join(f"{path.replace(os.sep, '/')}\0" for path in files)
+    try:
+        output = subprocess.run(
+            ['git', 'check-attr', '--stdin', '-z', 'text'],
+            input=stdin.encode('utf-8', errors='surrogateescape'),
+            capture_output=True, check=True
+        ).stdout.decode('utf-8', errors='surrogateescape')
+    except (subprocess.CalledProcessError, OSError):
+        return {}
+
+    # Format: "<path>\0<attribute>\0<value>\0" per file
+    fields = output.split('\0')
+    return {fields[i]: fields[i + 2] for i in range(0, len(fields) - 2, 3)}
+
+
+def sniff_binary(file_path: str) -> bool:
+    """Check the start of a file for NUL bytes or mostly invalid UTF-8."""
+    with open(file_path, 'rb') as f:
+        head = f.read(BINARY_SNIFF_BYTES)
+    if b'\0' in head:
+        return True
+    if not head:
+        return False
+    # Ignore a multi-byte character cut off at the end of the sample
+    invalid = head[:-3].decode('utf-8', errors='replace').count('\ufffd')
+    return invalid > len(head) * BINARY_INVALID_UTF8_RATIO
+
+
+def classify_files(files: List[str]) -> Dict[str, str]:
+    """Classify files as TEXT, BINARY or SKIP with a single git call.
+
+    Files with an excluded extension or that are not regular files are
+    skipped. The git 'text' attribute decides where it is set or unset;
+    otherwise the file's first bytes are sniffed in-process.
+    """
+    classes: Dict[str, str] = {}
+    candidates = []
+    for path in files:
+        extension = os.path.splitext(path)[1][1:].lower()
+        if extension in EXCLUDED_EXTENSIONS or not os.path.isfile(path):
+            classes[path] = SKIP
+        else:
+            candidates.append(path)
+
+    attributes = get_text_attributes(candidates)
+    for path in candidates:
+        text_attribute = attributes.get(path.replace(os.sep, '/'), 'unspecified')
+        if text_attribute == 'unset':
+            classes[path] = BINARY
+        elif text_attribute == 'set':
+            classes[path] = TEXT
+        else:
+            try:
+                classes[path] = BINARY if sniff_binary(path) else TEXT
+            except OSError:
+                classes[path] = SKIP
+    return classes
@@ -0,0 +1,190 @@
+"""Compact record of a potential secret found by the scanner.
+
+A finding keeps a bounded excerpt of its line around the match, with the
+match's column, instead of the whole line, so a match on a long minified
+line does not keep the line alive in the scan results, the commit metadata
+or the report. Scan candidates keep the same excerpt, so neither do the scan
+cache, the scan snapshot or the results of worker processes. File paths and
+secret types repeat across findings and are interned.
+
+``Finding`` reads like the dictionaries findings used to be, so code using
+``finding['line']`` or ``finding.get('file_path')`` works unchanged, and it
+is written to JSON as a row of its fields in ``FINDING_FIELDS`` order.
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import FINDING_MAX_LINE_CHARS, FINDING_CONTEXT_CHARS, FINDING_MATCH_CHARS
+
+# Bump when FINDING_FIELDS changes
+FINDING_FORMAT_VERSION = 1
+
+# Field order of a serialized finding. 'line' is the excerpt of the line,
+# starting at column 'context_start' of a line 'line_length' characters long.
+# 'column' and 'byte_offset' locate the match in the line in characters and
+# UTF-8 bytes; 'matched_content' is cut to FINDING_MATCH_CHARS characters of
+# a match 'match_length' characters long.
+FINDING_FIELDS = (
+    'file_path', 'line_number', 'line', 'matched_content', 'type', 'variable_name',
+    'entropy', 'detection_method', 'column', 'byte_offset', 'context_start',
+    'line_length', 'match_length',
+)
+
+# Detection method of values read by the walker of a structured file format,
+# which reports every qualifying value on a line rather than the first
+STRUCTURED_METHOD = 'structured_scan'
+
+# (column, byte offset, excerpt start, excerpt, line length) of a match: what
+# a finding keeps of the line it was found on
+LineExcerpt = Tuple[int, int, int, str, int]
+
+_intern = sys.intern
+
+
+def excerpt_line(line: str, value: str, column: Optional[int] = None) -> LineExcerpt:
+    """Locate a match in its line and cut long lines to an excerpt around it.
+
+    Without a ``column``, the match is located at the first occurrence of
+    its value, or of its first line for matches spanning lines.
+    """
+    if column is None:
+        column = line.find(value.split('\n', 1)[0])
+    if column < 0:
+        column = 0
+    # Columns are byte offsets in ASCII lines, which str knows without a scan
+    byte_offset = column if line.isascii() else len(line[:column].encode('utf-8', 'surrogatepass'))
+    if len(line) <= FINDING_MAX_LINE_CHARS:
+        return column, byte_offset, 0, line, len(line)
+    start = max(column - FINDING_CONTEXT_CHARS, 0)
+    end = column + min(len(value), FINDING_MATCH_CHARS) + FINDING_CONTEXT_CHARS
+    return column, byte_offset, start, line[start:end], len(line)
+
+
+def location_key(file_path: str, line_number: int, method: str, column: Optional[int]) -> tuple:
+    """Return where a finding is reported, for telling repeated findings apart.
+
+    A line holds at most one finding, except in structured files, where a
+    minified file keeps many values on one line and each value is its own
+    finding at its column.
+    """
+    if method == STRUCTURED_METHOD:
+        return file_path, line_number, column
+    return file_path, line_number
+
+
+class Finding(Mapping):
+    """A potential secret at a line of a file."""
+
+    __slots__ = FINDING_FIELDS
+
+    def __init__(self, file_path: str, line_number: int, line: str, matched_content: str,
+                 type: str, variable_name: Optional[str], entropy: Optional[float],
+                 detection_method: str, column: int = 0, byte_offset: int = 0,
+                 context_start: int = 0, line_length: Optional[int] = None,
+                 match_length: Optional[int] = None):
+        self.file_path = _intern(file_path)
+        self.line_number = line_number
+        self.line = line
+        self.matched_content = matched_content
+        self.type = _intern(type)
+        self.variable_name = variable_name
+        self.entropy = entropy
+        self.detection_method = _intern(detection_method)
+        self.column = column
+        self.byte_offset = byte_offset
+        self.context_start = context_start
+        self.line_length = len(line) if line_length is None else line_length
+        self.match_length = len(matched_content) if match_length is None else match_length
+
+    @classmethod
+    def from_match(cls, file_path: str, line_number: int, line: str, value: str,
+                   secret_type: str, variable_name: Optional[str], entropy: Optional[float],
+                   method: str, column: Optional[int] = None) -> 'Finding':
+        """Record a match in a line, keeping an excerpt of long lines (see ``excerpt_line``)."""
+        return cls.from_excerpt(file_path, line_number, excerpt_line(line, value, column), value,
+                                secret_type, variable_name, entropy, method)
+
+    @classmethod
+    def from_excerpt(cls, file_path: str, line_number: int, excerpt: LineExcerpt, value: str,
+                     secret_type: str, variable_name: Optional[str], entropy: Optional[float],
+                     method: str) -> 'Finding':
+        """Record a match located in its line by ``excerpt_line``."""
+        column, byte_offset, start, text, line_length = excerpt
+        return cls(file_path, line_number, text, value[:FINDING_MATCH_CHARS], secret_type, variable_name,
+                   entropy, method, column, byte_offset, start, line_length, len(value))
+
+    @property
+    def truncated(self) -> bool:
+        """Whether the line was longer than its excerpt."""
+        return self.context_start > 0 or self.context_start + len(self.line) < self.line_length
+
+    def excerpt(self) -> str:
+        """The line excerpt, with an ellipsis where the line was cut."""
+        prefix = '…' if self.context_start > 0 else ''
+        suffix = '…' if self.context_start + len(self.line) < self.line_length else ''
+        return prefix + self.line + suffix
+
+    def location(self) -> tuple:
+        """Where the finding is reported, as by ``location_key``."""
+        return location_key(self.file_path, self.line_number, self.detection_method, self.column)
+
+    def to_row(self) -> List[Any]:
+        """Serialize the finding as a list of its fields in FINDING_FIELDS order."""
+        return [getattr(self, name) for name in FINDING_FIELDS]
+
+    @classmethod
+    def from_row(cls, row: List[Any]) -> 'Finding':
+        """Rebuild a finding serialized by ``to_row``.
+
+        Raises ValueError if the row does not have one value per field.
+        """
+        if len(row) != len(FINDING_FIELDS):
+            raise ValueError(f"finding row has {len(row)} fields, expected {len(FINDING_FIELDS)}")
+        return cls(*row)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Finding':
+        """Build a finding from a dictionary, as written before findings were rows."""
+        return cls(
+            data.get('file_path', ''), data.get('line_number', 0), data.get('line', ''),
+            data.get('matched_content', ''), data.get('type', ''), data.get('variable_name'),
+            data.get('entropy'), data.get('detection_method', ''), data.get('column', 0),
+            data.get('byte_offset', 0), data.get('context_start', 0), data.get('line_length'),
+            data.get('match_length')
+        )
+
+    # Mapping interface, with the keys of the dictionaries findings used to be
+    def _keys(self) -> Iterator[str]:
+        for name in FINDING_FIELDS:
+            if name != 'variable_name' or self.variable_name is not None:
+                yield name
+
+    def __getitem__(self, key: str) -> Any:
+        if key in FINDING_FIELDS and (key != 'variable_name' or self.variable_name is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return self._keys()
+
+    def __len__(self) -> int:
+        return len(FINDING_FIELDS) - (self.variable_name is None)
+
+    def __repr__(self) -> str:
+        return f"Finding({self.file_path!r}, {self.line_number}, {self.type!r})"
+
+
+def dump_findings(findings: List[Finding]) -> List[List[Any]]:
+    """Serialize findings for JSON as rows of their fields."""
+    return [finding.to_row() for finding in findings]
+
+
+def load_findings(rows: List[Any]) -> List[Finding]:
+    """Rebuild findings from ``dump_findings`` rows, or from dictionaries.
+
+    Raises ValueError if a row is malformed.
+    """
+    return [Finding.from_dict(row) if isinstance(row, dict) else Finding.from_row(row)
+            for row in rows]
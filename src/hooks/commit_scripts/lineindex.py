@@ -0,0 +1,58 @@
+"""Line lookups for offsets in a text buffer."""
+
+import re
+import mmap
+import itertools
+from bisect import bisect_right
+from typing import List, Optional, Union
+
+# Line breaks of memory-mapped buffers, which are only scanned as bytes when
+# they have none of the other separators str.splitlines knows about
+_BYTES_LINE_BREAK = re.compile(rb'\r\n|\r|\n')
+
+
+class LineIndex:
+    """Map buffer offsets to line numbers the way ``str.splitlines`` counts lines.
+
+    The buffer is a string, or bytes or a memory map of plain ASCII text. The start
+    offset of every line is computed on first use, so buffers that are never
+    queried do not pay for the index.
+    """
+
+    def __init__(self, text: Union[str, bytes, mmap.mmap]):
+        self.text = text
+        self._starts: Optional[List[int]] = None
+
+    @property
+    def starts(self) -> List[int]:
+        """Start offset of each line, followed by the length of the buffer."""
+        if self._starts is None:
+            if isinstance(self.text, (str, bytes)):
+                self._starts = list(itertools.accumulate(
+                    map(len, self.text.splitlines(True)), initial=0
+                ))
+            else:
+                starts = [0]
+                starts.extend(match.end() for match in _BYTES_LINE_BREAK.finditer(self.text))
+                if starts[-1] != len(self.text):
+                    starts.append(len(self.text))
+                self._starts = starts
+        return self._starts
+
+    @property
+    def line_count(self) -> int:
+        """Number of lines in the buffer."""
+        return len(self.starts) - 1
+
+    def line_number(self, offset: int) -> int:
+        """Return the 1-based number of the line containing ``offset``."""
+        return min(bisect_right(self.starts, offset), self.line_count)
+
+    def line(self, line_number: int) -> str:
+        """Return a line without its line break, decoding ASCII buffers."""
+        starts = self.starts
+        segment = self.text[starts[line_number - 1]:starts[line_number]]
+        if not isinstance(segment, str):
+            segment = segment.decode('ascii')
+        lines = segment.splitlines()
+        return lines[0] if lines else ''
@@ -0,0 +1,113 @@
+"""Long-line scanning and detection of minified and generated files.
+
+Regexes without a literal anchor, such as the variable assignment patterns,
+can take time quadratic in the length of a line. Lines longer than
+LONG_LINE_CHARS are therefore matched in overlapping windows, which bounds
+the cost of each match attempt. Minified and generated files are rarely
+hand-edited and produce many false positives, so they are only checked for
+secrets that their pattern identifies on its own.
+"""
+
+import os
+import re
+import mmap
+import time
+import fnmatch
+from typing import Dict, List, Match, Optional, Tuple, Union
+
+from .config import (
+    LONG_LINE_CHARS, LONG_LINE_WINDOW_CHARS, LONG_LINE_MAX_MATCH,
+    MINIFIED_SAMPLE_BYTES, MINIFIED_MIN_BYTES, MINIFIED_AVG_LINE_CHARS,
+    GENERATED_FILE_PATTERNS, GENERATED_MARKERS, GENERATED_MARKER_BYTES
+)
+from .rules import Prefilter, Rule, VariableRule
+from .rulesafety import guarded_finditer, time_budget
+
+# Reasons a file is not scanned the usual way. Only files with long lines
+# keep every rule.
+GENERATED_NAME = 'generated file name'
+GENERATED_MARKER = 'generated file marker'
+MINIFIED = 'minified'
+LONG_LINES = 'long lines'
+
+# A line of at least LONG_LINE_CHARS characters; the lookbehind only lets
+# matches start at the beginning of a line
+_LONG_LINE = re.compile(r'(?<![^\r\n])[^\r\n]{%d}' % LONG_LINE_CHARS)
+_LONG_LINE_BYTES = re.compile(_LONG_LINE.pattern.encode('ascii'))
+
+
+def is_generated_name(file_path: str) -> bool:
+    """Check whether a file name is one of GENERATED_FILE_PATTERNS."""
+    name = os.path.basename(file_path)
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in GENERATED_FILE_PATTERNS)
+
+
+def downgrade_reason(file_path: str, data: Union[str, bytes, mmap.mmap]) -> Optional[str]:
+    """Return why a file should not be scanned the usual way, or None.
+
+    Generated files are recognized by name or by a marker near the start,
+    minified files by the average line length of their first
+    MINIFIED_SAMPLE_BYTES bytes. Any other file with a line longer than
+    LONG_LINE_CHARS is scanned with every rule, but in windows.
+    """
+    if is_generated_name(file_path):
+        return GENERATED_NAME
+    sample = data[:MINIFIED_SAMPLE_BYTES]
+    if not isinstance(sample, str):
+        sample = sample.decode('latin-1')
+    head = sample[:GENERATED_MARKER_BYTES]
+    if any(marker in head for marker in GENERATED_MARKERS):
+        return GENERATED_MARKER
+    if len(sample) >= MINIFIED_MIN_BYTES and len(sample) > MINIFIED_AVG_LINE_CHARS * (sample.count('\n') + 1):
+        return MINIFIED
+    if len(data) > LONG_LINE_CHARS:
+        long_line = _LONG_LINE if isinstance(data, str) else _LONG_LINE_BYTES
+        if long_line.search(data):
+            return LONG_LINES
+    return None
+
+
+def window_overlap(line_filter: Prefilter) -> int:
+    """How far each window reaches into the next: the longest possible match.
+
+    Rules without a bound on their matches count as LONG_LINE_MAX_MATCH.
+    """
+    widths = [rule.max_width or LONG_LINE_MAX_MATCH
+              for rule in (*line_filter.rules, *line_filter.variable_rules)]
+    return min(max(widths, default=0), LONG_LINE_MAX_MATCH)
+
+
+def window_matches(line: str, line_filter: Prefilter, finditer=guarded_finditer) -> Tuple[
+        Dict[Rule, List[Match[str]]], Dict[VariableRule, List[Match[str]]]]:
+    """Match the prefilter's rules against a long line in overlapping windows.
+
+    Returns the matches of each rule that matched, in line order. A match
+    belongs to the window it starts in, and matches starting inside an
+    earlier match of the same rule are dropped, as ``re.finditer`` over the
+    whole line would. Match offsets are relative to their window. Each rule
+    gets one time budget for the whole line, shared by its windows.
+    ``finditer`` runs a rule, as ``guarded_finditer`` does.
+    """
+    overlap = window_overlap(line_filter)
+    budget = time_budget(len(line))
+    rule_matches: Dict[Rule, List[Match[str]]] = {}
+    variable_matches: Dict[VariableRule, List[Match[str]]] = {}
+    ends: Dict[Union[Rule, VariableRule], int] = {}
+    spent: Dict[Union[Rule, VariableRule], float] = {}
+    for start in range(0, len(line), LONG_LINE_WINDOW_CHARS):
+        window = line[start:start + LONG_LINE_WINDOW_CHARS + overlap]
+        last = start + LONG_LINE_WINDOW_CHARS >= len(line)
+        rules, variable_rules = line_filter.apply(window)
+        for rule, found in [*((rule, rule_matches) for rule in rules),
+                            *((rule, variable_matches) for rule in variable_rules)]:
+            started = time.perf_counter()
+            matches = finditer(rule, window, budget=budget - spent.get(rule, 0.0))
+            spent[rule] = spent.get(rule, 0.0) + time.perf_counter() - started
+            for match in matches:
+                if match.start() >= LONG_LINE_WINDOW_CHARS and not last:
+                    break
+                if start + match.start() < ends.get(rule, 0):
+                    continue
+                ends[rule] = start + match.end()
+                found.setdefault(rule, []).append(match)
+    return rule_matches, variable_matches
@@ -0,0 +1,306 @@
+"""Memory accounting for scans.
+
+A ``MemoryMonitor`` samples the memory use of the process, and of its worker
+processes, on a background thread while a phase of a scan runs, such as the
+repository scan or writing the report, and logs the peak of each phase. With
+tracing it also logs the call sites that allocated the most memory during a
+phase, from ``tracemalloc`` snapshots. Once memory use passes the soft limit
+the monitor marks the limit as exceeded, and the scanner switches to a
+lower-memory mode instead of growing until the process is killed.
+
+Worker processes are forked from a fork server where one is available, so
+they share most of their pages with it and each other copy-on-write. Memory
+use is therefore the proportional set size (PSS) of each process, which
+charges a page shared by N processes 1/N to each, so the sum counts every
+page once. Summing resident set sizes would count the shared pages once per
+worker and pass the soft limit long before memory runs short. On Linux PSS
+is read from /proc/<pid>/smaps_rollup, which is cheaper than importing
+psutil, and RSS from /proc/<pid>/statm on kernels older than 4.14 that lack
+it. Elsewhere psutil is used, imported when the first phase starts, counting
+the RSS of this process and the memory unique to each worker. Without either
+nothing is recorded.
+"""
+
+import os
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import (
+    MEMORY_SAMPLE_INTERVAL, MEMORY_SOFT_LIMIT_MB, MEMORY_CONTAINER_SHARE,
+    MEMORY_LIMIT_ENV, MEMORY_TRACE_ENV
+)
+
+MB = 1024 * 1024
+
+# Memory limit of the container, for cgroup v2 and v1
+CGROUP_LIMIT_FILES = ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+
+psutil = None
+_psutil_checked = False
+
+
+def _load_psutil() -> bool:
+    """Import psutil on first use; return whether it is available."""
+    global psutil, _psutil_checked
+    if not _psutil_checked:
+        _psutil_checked = True
+        try:
+            import psutil as module
+            psutil = module
+        except ImportError:
+            pass
+    return psutil is not None
+
+
+def _proc_pss(pid: str) -> int:
+    """Return the PSS of a process in bytes, or its RSS where the kernel does not report PSS."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'rb') as f:
+            for line in f:
+                if line.startswith(b'Pss:'):
+                    return int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    with open(f'/proc/{pid}/statm', 'rb') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _proc_usage() -> Optional[int]:
+    """Return the PSS of this process and its descendants from /proc, or None without /proc."""
+    try:
+        total = _proc_pss('self')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+    # Children are listed per thread, since any thread may start a process
+    pending = ['self']
+    while pending:
+        pid = pending.pop()
+        try:
+            for task in os.listdir(f'/proc/{pid}/task'):
+                with open(f'/proc/{pid}/task/{task}/children', 'rb') as f:
+                    children = f.read().split()
+                for child in children:
+                    total += _proc_pss(str(int(child)))
+                    pending.append(str(int(child)))
+        except (OSError, ValueError, IndexError):
+            pass  # Exited since it was listed
+    return total
+
+
+def container_limit() -> Optional[int]:
+    """Return the memory limit of the container in bytes, or None if it has none."""
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path, 'r', encoding='ascii') as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # No limit reads as 'max' in cgroup v2 and as a huge number in v1
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+def _env_number(name: str) -> Optional[float]:
+    """Return the number in an environment variable, or None if it is unset or invalid."""
+    value = os.environ.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        logging.getLogger(__name__).warning(f"Ignoring {name}={value!r}, which is not a number")
+        return None
+
+
+def default_soft_limit() -> Optional[int]:
+    """Return the soft memory limit in bytes, or None if it is turned off.
+
+    $GENIE_MEMORY_LIMIT_MB wins when set; otherwise the limit is
+    MEMORY_SOFT_LIMIT_MB, lowered to MEMORY_CONTAINER_SHARE of the container's
+    memory limit.
+    """
+    limit_mb = _env_number(MEMORY_LIMIT_ENV)
+    if limit_mb is not None:
+        return int(limit_mb * MB) or None
+    limit = MEMORY_SOFT_LIMIT_MB * MB
+    container = container_limit()
+    if container:
+        limit = min(limit, int(container * MEMORY_CONTAINER_SHARE))
+    return limit or None
+
+
+class MemoryMonitor:
+    """Peak memory use of the phases of a scan, and whether it passed a soft limit."""
+
+    def __init__(self, soft_limit: Optional[int] = None, trace: int = 0,
+                 interval: float = MEMORY_SAMPLE_INTERVAL, logger: Optional[logging.Logger] = None):
+        self.soft_limit = soft_limit
+        # Number of allocating call sites logged per phase, 0 to not trace
+        self.trace = trace
+        self.interval = interval
+        self.logger = logger or logging.getLogger(__name__)
+        # Start, peak and end memory use in bytes of the phases run, by name, whether
+        # they passed the soft limit and, with tracing, the peak of the Python
+        # heap and the top allocating call sites
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        # Set once memory use passed the soft limit during the current phases
+        self.exceeded = False
+        self._active: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._use_proc = True
+        self._process = None
+
+    def usage(self) -> Optional[int]:
+        """Return the memory use of this process and its children in bytes, or None if unknown."""
+        if self._use_proc:
+            usage = _proc_usage()
+            if usage is not None:
+                return usage
+            self._use_proc = False
+        if self._process is None:
+            if not _load_psutil():
+                return None
+            self._process = psutil.Process()
+        try:
+            usage = self._process.memory_info().rss
+            for child in self._process.children(recursive=True):
+                try:
+                    # Only the pages a worker does not share with other processes
+                    info = child.memory_full_info()
+                    usage += getattr(info, 'uss', info.rss)
+                except psutil.Error:
+                    pass  # Exited since it was listed
+            return usage
+        except psutil.Error:
+            return None
+
+    def _record(self, usage: int) -> None:
+        """Raise the peaks of the running phases to ``usage``; hold the lock."""
+        for record in self._active:
+            record['peak'] = max(record['peak'], usage)
+        if not self.soft_limit or usage <= self.soft_limit:
+            return
+        for record in self._active:
+            record['over_limit'] = True
+        if not self.exceeded:
+            self.exceeded = True
+            self.logger.warning(f"Memory use of {usage / MB:.0f} MB passed the soft limit of "
+                                f"{self.soft_limit / MB:.0f} MB")
+
+    def _sample(self) -> None:
+        """Sampling thread: record memory use every ``interval`` seconds until stopped."""
+        while not self._stop.wait(self.interval):
+            usage = self.usage()
+            if usage is None:
+                return
+            with self._lock:
+                self._record(usage)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Record the peak memory of the ``with`` block as phase ``name`` and log it."""
+        usage = self.usage()
+        if usage is None:
+            yield
+            return
+        record: Dict[str, Any] = {'start': usage, 'peak': usage, 'end': usage, 'over_limit': False}
+        started_tracing = False
+        before = None
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        with self._lock:
+            if not self._active:
+                self.exceeded = False
+            self._active.append(record)
+            self._record(usage)
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._sample, name='memory-monitor', daemon=True)
+                self._thread.start()
+        try:
+            yield
+        finally:
+            usage = self.usage()
+            with self._lock:
+                if usage is not None:
+                    record['end'] = usage
+                    self._record(usage)
+                self._active.remove(record)
+                thread = self._thread if not self._active else None
+                if thread is not None:
+                    self._thread = None
+                    self._stop.set()
+            if thread is not None:
+                thread.join()
+            if before is not None:
+                self._trace(record, before)
+                if started_tracing:
+                    tracemalloc.stop()
+            self.phases[name] = record
+            self._log(name, record)
+
+    def _trace(self, record: Dict[str, Any], before: tracemalloc.Snapshot) -> None:
+        """Add the Python heap peak and the call sites that allocated most since ``before``."""
+        record['python_peak'] = tracemalloc.get_traced_memory()[1]
+        ignored = (tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'))
+        after = tracemalloc.take_snapshot().filter_traces(ignored)
+        growth = [stat for stat in after.compare_to(before.filter_traces(ignored), 'lineno')
+                  if stat.size_diff > 0]
+        growth.sort(key=lambda stat: stat.size_diff, reverse=True)
+        record['top_allocations'] = [
+            {'site': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             'bytes': stat.size_diff, 'blocks': stat.count_diff}
+            for stat in growth[:self.trace]
+        ]
+
+    def _log(self, name: str, record: Dict[str, Any]) -> None:
+        """Log the memory use of a phase."""
+        self.logger.info(f"Peak memory during {name}: {record['peak'] / MB:.1f} MB "
+                         f"(started at {record['start'] / MB:.1f} MB, ended at {record['end'] / MB:.1f} MB)")
+        if 'python_peak' in record:
+            self.logger.info(f"Python heap peak during {name}: {record['python_peak'] / MB:.1f} MB; "
+                             f"largest allocations still held at its end:")
+            for site in record['top_allocations']:
+                self.logger.info(f"  {site['bytes'] / 1024:10.1f} KB in {site['blocks']:7d} blocks at {site['site']}")
+
+    def summary(self) -> str:
+        """Describe the peak memory of every phase in one line, or return '' if none ran."""
+        if not self.phases:
+            return ''
+        return "Peak memory: " + ', '.join(
+            f"{name} {record['peak'] / MB:.0f} MB{' (over the soft limit)' if record['over_limit'] else ''}"
+            for name, record in self.phases.items()
+        )
+
+
+_monitor: Optional[MemoryMonitor] = None
+
+
+def get_monitor() -> MemoryMonitor:
+    """Return the memory monitor of this process, set up from the configuration."""
+    global _monitor
+    if _monitor is None:
+        trace = _env_number(MEMORY_TRACE_ENV)
+        _monitor = MemoryMonitor(default_soft_limit(), int(trace or 0))
+    return _monitor
+
+
+def configure(soft_limit_mb: Optional[float] = None, trace: Optional[int] = None) -> MemoryMonitor:
+    """Override the soft limit of this process's monitor in MB, 0 turning it off, and its tracing."""
+    monitor = get_monitor()
+    if soft_limit_mb is not None:
+        monitor.soft_limit = int(soft_limit_mb * MB) or None
+    if trace is not None:
+        monitor.trace = trace
+    return monitor
@@ -0,0 +1,150 @@
+"""Per-rule and per-file profile of a scan.
+
+Enabled with ``--profile`` on the scan entry points. The profile counts, for
+every detection rule, how often the literal prefilter rejected it, how many
+times its regex ran and for how long, how many matches it produced, why
+matches were dropped and how many qualified as findings, counting the
+walkers of configuration file formats as rules; and for every file, the time
+spent reading and scanning it. Scanners without a profile
+skip all of this, so profiling costs nothing when it is off.
+
+Files whose results came from the scan cache are not scanned, and so not
+profiled; profile with ``--no-cache`` to cover every file.
+"""
+
+import json
+import time
+from typing import Any, Dict, Iterable, List, Match, Optional, Union
+
+from .rules import Rule, RuleSet, VariableRule
+from .rulesafety import guarded_finditer
+from .structured import FORMATS, StructuredFormat
+
+# Bump when the layout of the profile changes
+PROFILE_FORMAT_VERSION = 1
+
+# Where ``--profile`` writes the profile when given no path
+DEFAULT_PROFILE_PATH = 'scan-profile.json'
+
+# Per-rule counters. Matches are dropped as common non-secret values, for
+# being shorter than the rule's minimum length, for a name without a
+# suspicious term, or for too low an entropy.
+RULE_COUNTERS = (
+    'prefilter_rejections', 'evaluations', 'matches',
+    'dropped_common_value', 'dropped_min_length', 'dropped_name', 'dropped_entropy',
+    'qualified',
+)
+
+AnyRule = Union[Rule, VariableRule, StructuredFormat]
+
+
+class ScanProfile:
+    """Counters and timings of the rules and files of one or more scans."""
+
+    def __init__(self, ruleset: RuleSet):
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        for rule in (*ruleset.rules, *ruleset.variable_rules, *FORMATS.values()):
+            entry = dict.fromkeys(RULE_COUNTERS, 0)
+            entry['regex_seconds'] = 0.0
+            entry['type'] = getattr(rule, 'secret_type', 'Variable Assignment')
+            entry['pattern'] = rule.pattern
+            self.rules[rule.id] = entry
+        # [read seconds, scan seconds] by file
+        self.files: Dict[str, List[float]] = {}
+
+    def finditer(self, rule: AnyRule, text, regex=None, budget: Optional[float] = None) -> List[Match]:
+        """``guarded_finditer``, timed and counted for the rule."""
+        start = time.perf_counter()
+        matches = guarded_finditer(rule, text, regex, budget)
+        self.add_time(rule, time.perf_counter() - start)
+        return matches
+
+    def add_time(self, rule: AnyRule, seconds: float) -> None:
+        """Count one evaluation of a rule, or one walk of a file of a format, taking ``seconds``."""
+        entry = self.rules[rule.id]
+        entry['regex_seconds'] += seconds
+        entry['evaluations'] += 1
+
+    def count(self, rule: AnyRule, counter: str) -> None:
+        """Add one to a counter of a rule."""
+        self.rules[rule.id][counter] += 1
+
+    def rejected(self, candidates: Iterable[AnyRule], admitted: Iterable[AnyRule]) -> None:
+        """Count the prefilter rejections of the rules not admitted among the candidates."""
+        admitted = set(admitted)
+        for rule in candidates:
+            if rule not in admitted:
+                self.rules[rule.id]['prefilter_rejections'] += 1
+
+    def file_time(self, file_path: str, read: float, scan: float) -> None:
+        """Add time spent reading and scanning a file."""
+        times = self.files.setdefault(file_path, [0.0, 0.0])
+        times[0] += read
+        times[1] += scan
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the profile as JSON-serializable data."""
+        return {'format': PROFILE_FORMAT_VERSION, 'rules': self.rules, 'files': self.files}
+
+    def merge(self, data: Dict[str, Any]) -> None:
+        """Add a profile returned by ``to_dict``, such as a worker's."""
+        for rule_id, entry in data.get('rules', {}).items():
+            mine = self.rules.get(rule_id)
+            if mine is None:
+                continue
+            for counter in (*RULE_COUNTERS, 'regex_seconds'):
+                mine[counter] += entry.get(counter, 0)
+        for file_path, (read, scan) in data.get('files', {}).items():
+            self.file_time(file_path, read, scan)
+
+    def report(self, elapsed: Optional[float] = None, findings: Optional[int] = None) -> Dict[str, Any]:
+        """Return the profile with totals, for writing as JSON."""
+        data = self.to_dict()
+        data['totals'] = {
+            'elapsed_seconds': elapsed,
+            'findings': findings,
+            'files': len(self.files),
+            'read_seconds': sum(read for read, _ in self.files.values()),
+            'scan_seconds': sum(scan for _, scan in self.files.values()),
+            'regex_seconds': sum(entry['regex_seconds'] for entry in self.rules.values()),
+        }
+        return data
+
+    def write(self, path: str, elapsed: Optional[float] = None, findings: Optional[int] = None) -> None:
+        """Write the profile as JSON to ``path``.
+
+        Raises OSError if it cannot be written.
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(elapsed, findings), f, indent=2)
+
+    def summary(self, top: int = 10) -> str:
+        """Summarize the costliest and most productive rules and the slowest files."""
+        lines = []
+        by_time = sorted(self.rules.items(), key=lambda item: item[1]['regex_seconds'], reverse=True)
+        lines.append(f"Rules by regex time (top {top}):")
+        lines.append(f"  {'rule':<12} {'ms':>9} {'evals':>8} {'rejected':>9} {'matches':>8} "
+                     f"{'dropped':>8} {'qualified':>9}  type")
+        for rule_id, entry in by_time[:top]:
+            dropped = sum(entry[counter] for counter in RULE_COUNTERS if counter.startswith('dropped_'))
+            lines.append(f"  {rule_id:<12} {entry['regex_seconds'] * 1000:9.1f} {entry['evaluations']:8d} "
+                         f"{entry['prefilter_rejections']:9d} {entry['matches']:8d} {dropped:8d} "
+                         f"{entry['qualified']:9d}  {entry['type']}")
+
+        productive = [item for item in self.rules.items() if item[1]['matches']]
+        productive.sort(key=lambda item: item[1]['qualified'], reverse=True)
+        if productive:
+            lines.append(f"Rules by qualified matches (top {top}):")
+            for rule_id, entry in productive[:top]:
+                drops = ', '.join(f"{counter[len('dropped_'):]} {entry[counter]}"
+                                  for counter in RULE_COUNTERS
+                                  if counter.startswith('dropped_') and entry[counter])
+                lines.append(f"  {rule_id:<12} {entry['qualified']:6d} of {entry['matches']:6d} matches"
+                             f"{' (dropped: ' + drops + ')' if drops else ''}  {entry['type']}")
+
+        slowest = sorted(self.files.items(), key=lambda item: sum(item[1]), reverse=True)[:top]
+        if slowest:
+            lines.append(f"Slowest files (top {top}):")
+            for file_path, (read, scan) in slowest:
+                lines.append(f"  {read * 1000:8.1f} ms read  {scan * 1000:8.1f} ms scan  {file_path}")
+        return '\n'.join(lines)
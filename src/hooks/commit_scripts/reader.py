@@ -0,0 +1,43 @@
+"""Reading files as bytes for scanning."""
+
+import os
+import re
+import mmap
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+from .config import MMAP_MIN_BYTES
+
+
+@contextmanager
+def open_buffer(file_path: str) -> Iterator[Union[bytes, mmap.mmap]]:
+    """Yield the raw contents of a file, memory-mapped if it is large."""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_BYTES:
+            yield f.read()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def decode_text(data: Union[bytes, mmap.mmap]) -> str:
+    """Decode file contents as UTF-8, or as CP1252 if they are not valid UTF-8.
+
+    CP1252 covers Latin-1 text as well; the few undefined bytes are replaced
+    rather than failing, so every file can be scanned.
+    """
+    data = bytes(data)
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+
+# Non-ASCII bytes, and the ASCII separators that str regexes treat as
+# whitespace and str.splitlines as line breaks but bytes ones do not
+_NOT_PLAIN_ASCII = re.compile(rb'[\x0b\x0c\x1c-\x1f\x80-\xff]')
+
+
+def is_plain_ascii(data: Union[bytes, mmap.mmap]) -> bool:
+    """Check whether file contents scan the same as bytes and as decoded text."""
+    return _NOT_PLAIN_ASCII.search(data) is None
@@ -0,0 +1,155 @@
+"""Streaming HTML report writer.
+
+The report page is a static template. Findings are embedded in it as
+compact JSON data blocks, and the page renders them with virtual
+scrolling, pagination, filtering and sorting. The writer streams each
+finding straight to the file, so its memory use does not grow with the
+number of findings, apart from the set of (file, line) keys used to
+drop duplicates.
+"""
+
+import os
+import re
+import html
+import json
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Sequence
+
+from .config import HTML_CONFIG
+from .finding import Finding
+from .utils import mask_secret
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'report.html')
+
+# {{name}} placeholders in the template
+_PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+
+# Findings encoded and written at once
+_WRITE_BATCH = 512
+
+
+def unique_findings(*groups: Iterable[Finding]) -> Iterator[Finding]:
+    """Yield the findings of all groups, skipping repeated locations."""
+    seen = set()
+    for group in groups:
+        for finding in group:
+            key = finding.location()
+            if key not in seen:
+                seen.add(key)
+                yield finding
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _json(value: Any) -> str:
+    """Serialize a value for a <script> block, which must not contain '</'."""
+    return _ENCODER.encode(value).replace('<', '\\u003c')
+
+
+def write_findings_json(out: IO[str], findings: Iterable[Finding]) -> int:
+    """Stream findings as {"rows": [...], "files": [...]} and return the row count.
+
+    Each row is [file index, line number, masked line excerpt, type]. File paths
+    are written once in "files", after the rows, since a path is often
+    shared by many findings.
+    """
+    file_index: Dict[str, int] = {}
+    count = 0
+    batch: List[List[Any]] = []
+    separator = ''
+    out.write('{"rows":[')
+    for finding in findings:
+        path = finding.file_path
+        index = file_index.setdefault(path, len(file_index))
+        batch.append([index, finding.line_number, mask_secret(finding.excerpt()), finding.type])
+        count += 1
+        if len(batch) >= _WRITE_BATCH:
+            # Encode a batch as one list and drop its brackets
+            out.write(separator + _json(batch)[1:-1])
+            separator = ','
+            batch = []
+    if batch:
+        out.write(separator + _json(batch)[1:-1])
+    out.write('],"files":')
+    out.write(_json(list(file_index)))
+    out.write('}')
+    return count
+
+
+def _disallowed_files_section(disallowed_files: Iterable[str]) -> str:
+    """Render the list of files with disallowed extensions, if there are any."""
+    items = ''.join(f'<li class="disallowed-file">{html.escape(path)}</li>' for path in disallowed_files)
+    if not items:
+        return ''
+    return f'<div class="header-info"><p><strong>Disallowed files:</strong></p><ul>{items}</ul></div>'
+
+
+def _skipped_rules_section(skipped_rules: Iterable[str]) -> str:
+    """Render the detection rules the scans skipped, if there are any."""
+    items = ''.join(f'<li class="skipped-rule">{html.escape(rule)}</li>' for rule in skipped_rules)
+    if not items:
+        return ''
+    return ('<div class="header-info"><p><strong>Skipped detection rules:</strong> '
+            'these rules ran over their time budget, so the secrets they detect were not '
+            f'looked for everywhere.</p><ul>{items}</ul></div>')
+
+
+def write_html_report(output_path: str, diff_secrets: Sequence[Finding],
+                      repo_secrets: Iterable[Finding], git_metadata: Dict[str, str],
+                      disallowed_files: Optional[Iterable[str]] = None,
+                      template_path: str = TEMPLATE_PATH, footer: str = '',
+                      skipped_rules: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Write the report for diff and repository findings to ``output_path``.
+
+    The diff tab lists each staged finding once; the repository tab lists
+    the staged findings followed by the repository findings at other
+    locations. ``skipped_rules`` describes the rules the scans quarantined.
+    ``footer`` is a line of text shown below them, such as the peak memory
+    of the scan. The report is written to a temporary file and
+    renamed into place, so a browser never opens a partial report. Returns
+    the number of findings in each tab.
+
+    Raises OSError if the template cannot be read or the report written.
+    """
+    with open(template_path, 'r', encoding='utf-8') as f:
+        template = f.read()
+
+    values = {
+        'title': HTML_CONFIG['title'],
+        'disallowed_files_section': _disallowed_files_section(disallowed_files or []),
+        'skipped_rules_section': _skipped_rules_section(skipped_rules or []),
+        'footer': f'<p class="report-footer">{html.escape(footer)}</p>' if footer else '',
+        **HTML_CONFIG['styles'],
+    }
+    for key in ('author', 'repo_name', 'branch', 'commit_hash', 'timestamp'):
+        values[key] = html.escape(str(git_metadata.get(key, 'Unknown')))
+    streams = {
+        'diff_data': lambda: unique_findings(diff_secrets),
+        'repo_data': lambda: unique_findings(diff_secrets, repo_secrets),
+    }
+    counts = {}
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', errors='replace') as out:
+            position = 0
+            for match in _PLACEHOLDER.finditer(template):
+                out.write(template[position:match.start()])
+                name = match.group(1)
+                if name in streams:
+                    counts[name] = write_findings_json(out, streams[name]())
+                else:
+                    out.write(str(values.get(name, match.group(0))))
+                position = match.end()
+            out.write(template[position:])
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return counts
@@ -0,0 +1,320 @@
+"""Compiled detection rules for secret scanning."""
+
+import re
+import hashlib
+import logging
+from typing import AbstractSet, Dict, FrozenSet, List, Match, Optional, Pattern, Sequence, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from .config import (
+    PATTERNS, ENTROPY_THRESHOLDS, SUSPICIOUS_NAME_TERMS,
+    LONG_LINE_CHARS, LONG_LINE_WINDOW_CHARS, LONG_LINE_MAX_MATCH,
+    MINIFIED_MIN_BYTES, MINIFIED_AVG_LINE_CHARS, GENERATED_FILE_PATTERNS, GENERATED_MARKERS,
+    STRUCTURED_FILE_PATTERNS
+)
+from .assignments import ASSIGNMENT_PATTERN, split_assignment
+from .rulesafety import EXPONENTIAL, audit_pattern, quarantine
+from .structured import WALKER_VERSION
+
+# Shorter literals are too common to be worth a substring search
+MIN_LITERAL_LENGTH = 2
+
+# Find the suspicious name terms in case-folded text, in lowercase ASCII bytes
+# and in ASCII bytes of any case
+SUSPICIOUS_NAME_RE: Pattern[str] = re.compile(
+    '|'.join(re.escape(term) for term in sorted(SUSPICIOUS_NAME_TERMS))
+)
+SUSPICIOUS_NAME_BYTES_RE: Pattern[bytes] = re.compile(SUSPICIOUS_NAME_RE.pattern.encode('ascii'))
+SUSPICIOUS_NAME_BYTES_IGNORECASE_RE: Pattern[bytes] = re.compile(
+    SUSPICIOUS_NAME_BYTES_RE.pattern, re.IGNORECASE
+)
+
+_REPEATS = tuple(
+    getattr(sre_parse, name)
+    for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+    if hasattr(sre_parse, name)
+)
+_ATOMIC_GROUP = getattr(sre_parse, 'ATOMIC_GROUP', None)
+
+logger = logging.getLogger(__name__)
+
+
+def fold_case(text: str) -> str:
+    """Case-fold text so it can be searched for the literals of any rule.
+
+    ``re.IGNORECASE`` also matches the dotless i against ``i``, which
+    ``str.casefold`` leaves alone, so it is folded explicitly.
+    """
+    folded = text.casefold()
+    if '\u0131' in folded:
+        folded = folded.replace('\u0131', 'i')
+    return folded
+
+
+def _best_factor(factors: List[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """Pick the most selective factor, the one whose shortest literal is longest."""
+    if not factors:
+        return None
+    return max(factors, key=lambda factor: min(len(literal) for literal in factor))
+
+
+def _literal_factors(items) -> List[FrozenSet[str]]:
+    """Collect the literal factors a parsed pattern requires.
+
+    Each factor is a set of case-folded literals, at least one of which
+    appears in every string the pattern can match.
+    """
+    factors: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def flush() -> None:
+        if run:
+            factors.append(frozenset([fold_case(''.join(run))]))
+            run.clear()
+
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is sre_parse.SUBPATTERN:
+            factors.extend(_literal_factors(av[-1]))
+        elif op is _ATOMIC_GROUP:
+            factors.extend(_literal_factors(av))
+        elif op in _REPEATS:
+            if av[0] >= 1:
+                factors.extend(_literal_factors(av[2]))
+        elif op is sre_parse.BRANCH:
+            alternatives = [_best_factor(_literal_factors(branch)) for branch in av[1]]
+            if alternatives and all(alternatives):
+                factors.append(frozenset().union(*alternatives))
+        # Character classes, wildcards and assertions require no literal
+    flush()
+    return factors
+
+
+def max_match_width(pattern: str) -> Optional[int]:
+    """Return the longest match ``pattern`` can produce, or None if it is unbounded."""
+    try:
+        width = sre_parse.parse(pattern).getwidth()[1]
+    except re.error:
+        return None
+    return width if width < sre_parse.MAXREPEAT else None
+
+
+def required_literals(pattern: str) -> List[FrozenSet[str]]:
+    """Derive the literal factors every match of ``pattern`` must contain."""
+    try:
+        tree = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    factors = [
+        factor for factor in _literal_factors(list(tree))
+        if min(len(literal) for literal in factor) >= MIN_LITERAL_LENGTH
+    ]
+    return list(dict.fromkeys(factors))
+
+
+class Rule:
+    """A detection pattern compiled once with its options resolved."""
+
+    def __init__(self, index: int, pattern: str, secret_type: str, options: Dict):
+        self.index = index
+        self.id = f'pattern:{index}'
+        self.pattern = pattern
+        self.regex: Pattern[str] = re.compile(pattern)
+        self.secret_type = secret_type
+        self.min_length: int = options.get('min_length', 0)
+        self.require_entropy: bool = options.get('require_entropy', True)
+        self.threshold: float = options.get('threshold', ENTROPY_THRESHOLDS['default'])
+        self.check_name: bool = options.get('check_name', False)
+        # Multiline rules are matched against whole buffers rather than lines
+        self.multiline: bool = options.get('multiline', False)
+        self._bytes_regex: Optional[Pattern[bytes]] = None
+        self.max_width: Optional[int] = max_match_width(pattern)
+        # Why the rule is no longer used, see rulesafety.quarantine
+        self.quarantined: Optional[str] = None
+        self.literals: List[FrozenSet[str]] = required_literals(pattern)
+        if self.check_name:
+            # The captured name must contain a suspicious term
+            self.literals.append(frozenset(SUSPICIOUS_NAME_TERMS))
+
+    @property
+    def bytes_regex(self) -> Pattern[bytes]:
+        """The pattern compiled for bytes.
+
+        On ASCII text without the \\x0b, \\x0c and \\x1c-\\x1f separators it
+        matches exactly like ``regex``.
+        """
+        if self._bytes_regex is None:
+            self._bytes_regex = re.compile(self.pattern.encode('ascii'))
+        return self._bytes_regex
+
+    def admits(self, present: AbstractSet[str]) -> bool:
+        """Check whether the literals found in some text allow this rule to match."""
+        return not self.quarantined and all(not factor.isdisjoint(present) for factor in self.literals)
+
+    def __repr__(self) -> str:
+        return f"Rule({self.index}, {self.secret_type!r})"
+
+
+class VariableRule:
+    """A compiled variable assignment pattern.
+
+    The pattern captures the assigned name in its first group and the value
+    in the last group that matches, as ``assignments.ASSIGNMENT_PATTERN``
+    does.
+    """
+
+    def __init__(self, index: int, pattern: str):
+        self.index = index
+        self.id = f'variable:{index}'
+        self.pattern = pattern
+        self.regex: Pattern[str] = re.compile(pattern)
+        self.max_width: Optional[int] = max_match_width(pattern)
+        self.quarantined: Optional[str] = None
+        # Only names containing a suspicious term are reported
+        self.literals: List[FrozenSet[str]] = required_literals(pattern)
+        self.literals.append(frozenset(SUSPICIOUS_NAME_TERMS))
+
+    def admits(self, present: AbstractSet[str]) -> bool:
+        """Check whether the literals found in some text allow this rule to match."""
+        return not self.quarantined and all(not factor.isdisjoint(present) for factor in self.literals)
+
+    def assignment(self, match: Match[str]) -> Tuple[str, str]:
+        """Return the (name, value) of a match."""
+        return split_assignment(match)
+
+    def __repr__(self) -> str:
+        return f"VariableRule({self.index})"
+
+
+class Prefilter:
+    """Literal prefilter that drops rules whose required literals are absent.
+
+    One case-folded substring search per literal tells which rules can match
+    a buffer or line at all, before any regex runs.
+    """
+
+    def __init__(self, rules: Sequence[Rule], variable_rules: Sequence[VariableRule]):
+        self.rules = list(rules)
+        self.variable_rules = list(variable_rules)
+        self.literals: FrozenSet[str] = frozenset(
+            literal
+            for rule in (*self.rules, *self.variable_rules)
+            for factor in rule.literals
+            for literal in factor
+        )
+        # Rules without literals can match any text
+        self._unfiltered = (
+            [rule for rule in self.rules if not rule.literals],
+            [rule for rule in self.variable_rules if not rule.literals],
+        )
+        # Literals with other characters cannot occur in ASCII text
+        self._ascii_literals: List[Tuple[str, bytes]] = [
+            (literal, literal.encode('ascii')) for literal in self.literals if literal.isascii()
+        ]
+
+    def apply(self, text: str) -> Tuple[List[Rule], List[VariableRule]]:
+        """Return the rules whose required literals all occur in ``text``."""
+        return self.apply_folded(fold_case(text))
+
+    def apply_folded(self, folded: str) -> Tuple[List[Rule], List[VariableRule]]:
+        """Like apply, for text that has already been passed through fold_case."""
+        present = {literal for literal in self.literals if literal in folded}
+        return self._admitted(present)
+
+    def apply_ascii(self, lowered: bytes) -> Tuple[List[Rule], List[VariableRule]]:
+        """Like apply, for ASCII-only bytes converted to lowercase.
+
+        Case folding ASCII text only lowercases it.
+        """
+        present = {literal for literal, encoded in self._ascii_literals if encoded in lowered}
+        return self._admitted(present)
+
+    def _admitted(self, present: AbstractSet[str]) -> Tuple[List[Rule], List[VariableRule]]:
+        """Return the rules the given literals allow to match."""
+        if not present:
+            return (
+                [rule for rule in self._unfiltered[0] if not rule.quarantined],
+                [rule for rule in self._unfiltered[1] if not rule.quarantined],
+            )
+        return (
+            [rule for rule in self.rules if rule.admits(present)],
+            [rule for rule in self.variable_rules if rule.admits(present)],
+        )
+
+
+class RuleSet:
+    """All detection rules, compiled once and kept in the order of ``config.PATTERNS``."""
+
+    def __init__(self,
+                 patterns: Optional[Sequence[Tuple[str, str, Dict]]] = None,
+                 variable_patterns: Optional[Sequence[str]] = None):
+        patterns = PATTERNS if patterns is None else patterns
+        variable_patterns = [ASSIGNMENT_PATTERN] if variable_patterns is None else variable_patterns
+        self.rules: List[Rule] = [
+            Rule(i, pattern, secret_type, options)
+            for i, (pattern, secret_type, options) in enumerate(patterns)
+        ]
+        self.variable_rules: List[VariableRule] = [
+            VariableRule(i, pattern) for i, pattern in enumerate(variable_patterns)
+        ]
+        for rule in (*self.rules, *self.variable_rules):
+            problems = audit_pattern(rule.pattern)
+            if problems:
+                logger.debug(f"{rule!r} may backtrack: {', '.join(text for _, text in problems)}")
+            exponential = [text for severity, text in problems if severity == EXPONENTIAL]
+            if exponential:
+                quarantine(rule, ', '.join(exponential))
+        # Quarantined by the audit, for good; rules are also quarantined
+        # while scanning, until reset_quarantine
+        self._audited = self.quarantined()
+        self.prefilter = Prefilter(self.rules, self.variable_rules)
+        # Minified and generated files are only checked for secrets whose
+        # pattern identifies them without an entropy check
+        self.reduced_prefilter = Prefilter([rule for rule in self.rules if not rule.require_entropy], [])
+        # Identifies the rule set, so cached results from other rules are ignored
+        self.version = hashlib.sha256(repr((
+            list(patterns), list(variable_patterns),
+            ENTROPY_THRESHOLDS, sorted(SUSPICIOUS_NAME_TERMS),
+            LONG_LINE_CHARS, LONG_LINE_WINDOW_CHARS, LONG_LINE_MAX_MATCH,
+            MINIFIED_MIN_BYTES, MINIFIED_AVG_LINE_CHARS, GENERATED_FILE_PATTERNS, GENERATED_MARKERS,
+            STRUCTURED_FILE_PATTERNS, WALKER_VERSION,
+        )).encode('utf-8')).hexdigest()[:16]
+
+    def quarantined(self) -> Dict[str, str]:
+        """Return why each quarantined rule was quarantined, by rule id."""
+        return {rule.id: rule.quarantined
+                for rule in (*self.rules, *self.variable_rules) if rule.quarantined}
+
+    def describe_quarantined(self) -> List[str]:
+        """Describe each quarantined rule with its secret type and why, for the hooks to show."""
+        return [f"{getattr(rule, 'secret_type', 'Variable Assignment')} ({rule.id}): {rule.quarantined}"
+                for rule in (*self.rules, *self.variable_rules) if rule.quarantined]
+
+    def reset_quarantine(self) -> None:
+        """Use the rules quarantined while scanning again, such as before a daemon request."""
+        for rule in (*self.rules, *self.variable_rules):
+            rule.quarantined = self._audited.get(rule.id)
+
+    def apply_quarantine(self, quarantined: Dict[str, str]) -> None:
+        """Quarantine rules by id, such as those quarantined by a worker process."""
+        for rule in (*self.rules, *self.variable_rules):
+            if rule.id in quarantined:
+                quarantine(rule, quarantined[rule.id])
+
+
+_default_ruleset: Optional[RuleSet] = None
+
+
+def get_default_ruleset() -> RuleSet:
+    """Return the shared rule set built from the configured patterns."""
+    global _default_ruleset
+    if _default_ruleset is None:
+        _default_ruleset = RuleSet()
+    return _default_ruleset
@@ -0,0 +1,280 @@
+"""Protection of the commit hooks against slow detection patterns.
+
+Patterns are audited when the rules are compiled. Nested or ambiguous
+unbounded quantifiers can backtrack exponentially, so rules with them are
+quarantined up front. Leading or adjacent unbounded quantifiers and ``.*``
+followed by more pattern are quadratic at worst, and are only reported.
+
+At scan time every regex evaluation runs under a budget of CPU time, so a
+rule is not charged for the time its process waits on a busy machine, for
+example with more worker processes than CPUs. On POSIX main threads a
+virtual-time timer interrupts the regex engine once the budget is spent;
+elsewhere the thread's CPU time is measured and the budget checked
+afterwards. A rule that exceeds its budget is quarantined for the rest of
+the process, or of the daemon request, so one pathological line cannot hang
+``git commit``. Scans report the rules they skipped, and the hooks show them.
+"""
+
+import re
+import time
+import signal
+import logging
+import threading
+from typing import FrozenSet, List, Match, Optional, Pattern, Tuple, Union
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+from .config import RULE_TIME_BUDGET, RULE_TIME_BUDGET_PER_MB
+
+logger = logging.getLogger(__name__)
+
+# Severity of audit findings
+EXPONENTIAL = 'exponential'
+QUADRATIC = 'quadratic'
+
+_REPEATS = tuple(
+    getattr(sre_parse, name)
+    for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+    if hasattr(sre_parse, name)
+)
+_ZERO_WIDTH = {sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT}
+
+# Characters are compared on ASCII, which all built-in patterns work on
+_ALL = frozenset(range(128))
+_DIGITS = frozenset(range(ord('0'), ord('9') + 1))
+_SPACES = frozenset(map(ord, ' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'))
+_WORD = frozenset(c for c in range(128) if chr(c).isalnum() or c == ord('_'))
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: _DIGITS,
+    sre_constants.CATEGORY_NOT_DIGIT: _ALL - _DIGITS,
+    sre_constants.CATEGORY_SPACE: _SPACES,
+    sre_constants.CATEGORY_NOT_SPACE: _ALL - _SPACES,
+    sre_constants.CATEGORY_WORD: _WORD,
+    sre_constants.CATEGORY_NOT_WORD: _ALL - _WORD,
+}
+
+
+def _fold(chars: FrozenSet[int]) -> FrozenSet[int]:
+    """Add the other case of every ASCII letter."""
+    return chars | frozenset(ord(chr(c).swapcase()) for c in chars if chr(c).isalpha())
+
+
+def char_set(op, av) -> Optional[FrozenSet[int]]:
+    """Return the ASCII characters a single-character node matches, or None."""
+    if op is sre_parse.LITERAL:
+        return frozenset([av]) if av < 128 else frozenset()
+    if op is sre_parse.NOT_LITERAL:
+        return _ALL - {av}
+    if op is sre_parse.ANY:
+        return _ALL - {ord('\n')}
+    if op is sre_parse.IN:
+        chars: FrozenSet[int] = frozenset()
+        negate = False
+        for item_op, item_av in av:
+            if item_op is sre_parse.NEGATE:
+                negate = True
+            elif item_op is sre_parse.LITERAL:
+                chars |= {item_av}
+            elif item_op is sre_parse.RANGE:
+                chars |= frozenset(range(item_av[0], min(item_av[1], 127) + 1))
+            elif item_op is sre_parse.CATEGORY:
+                chars |= _CATEGORIES.get(item_av, _ALL)
+            else:
+                chars = _ALL
+        return _ALL - chars if negate else chars & _ALL
+    return None
+
+
+def _is_unbounded(op, av) -> bool:
+    return op in _REPEATS and av[1] == sre_parse.MAXREPEAT
+
+
+def _first(items) -> Tuple[FrozenSet[int], bool]:
+    """Return the characters a sequence can start with, and whether it can be empty."""
+    first: FrozenSet[int] = frozenset()
+    for op, av in items:
+        chars = char_set(op, av)
+        if chars is not None:
+            return first | chars, False
+        if op in _ZERO_WIDTH:
+            continue
+        if op is sre_parse.SUBPATTERN:
+            chars, nullable = _first(av[-1])
+        elif op in _REPEATS:
+            chars, nullable = _first(av[2])
+            nullable = nullable or av[0] == 0
+        elif op is sre_parse.BRANCH:
+            results = [_first(branch) for branch in av[1]]
+            chars = frozenset().union(*(chars for chars, _ in results))
+            nullable = any(nullable for _, nullable in results)
+        else:
+            chars, nullable = _ALL, False
+        first |= chars
+        if not nullable:
+            return first, False
+    return first, True
+
+
+def _contains_unbounded(items) -> bool:
+    """Check whether a sequence contains an unbounded repeat at any depth."""
+    for op, av in items:
+        if _is_unbounded(op, av):
+            return True
+        if op is sre_parse.SUBPATTERN and _contains_unbounded(av[-1]):
+            return True
+        if op in _REPEATS and _contains_unbounded(av[2]):
+            return True
+        if op is sre_parse.BRANCH and any(_contains_unbounded(branch) for branch in av[1]):
+            return True
+    return False
+
+
+def _branches(items) -> List[list]:
+    """Return the alternatives of every alternation in a sequence, outside repeats."""
+    found = []
+    for op, av in items:
+        if op is sre_parse.BRANCH:
+            found.append(av[1])
+            for branch in av[1]:
+                found.extend(_branches(branch))
+        elif op is sre_parse.SUBPATTERN:
+            found.extend(_branches(av[-1]))
+    return found
+
+
+def _audit_items(items, problems: List[Tuple[str, str]], fold: bool) -> None:
+    """Collect the problems of a parsed sequence and everything nested in it."""
+    items = list(items)
+    for i, (op, av) in enumerate(items):
+        if op is sre_parse.SUBPATTERN:
+            _audit_items(av[-1], problems, fold)
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                _audit_items(branch, problems, fold)
+        elif op in _REPEATS:
+            body = list(av[2])
+            _audit_items(body, problems, fold)
+            if av[1] == sre_parse.MAXREPEAT:
+                if _contains_unbounded(body):
+                    problems.append((EXPONENTIAL, "nested unbounded quantifiers"))
+                for branches in _branches(body):
+                    firsts = [_first(branch)[0] for branch in branches]
+                    if fold:
+                        firsts = [_fold(chars) for chars in firsts]
+                    if any(a & b for j, a in enumerate(firsts) for b in firsts[j + 1:]):
+                        problems.append((EXPONENTIAL, "overlapping alternatives under an unbounded quantifier"))
+                # An unbounded repeat directly followed, past optional items,
+                # by another unbounded repeat that can match the same characters
+                chars = _first(body)[0]
+                for next_op, next_av in items[i + 1:]:
+                    next_chars, nullable = _first([(next_op, next_av)])
+                    if _is_unbounded(next_op, next_av) and chars & next_chars:
+                        problems.append((QUADRATIC, "adjacent unbounded quantifiers over the same characters"))
+                        break
+                    if not nullable:
+                        break
+                if len(body) == 1 and body[0][0] is sre_parse.ANY and i + 1 < len(items):
+                    problems.append((QUADRATIC, "'.*' followed by more pattern scans to the end of the line"))
+
+
+def audit_pattern(pattern: str) -> List[Tuple[str, str]]:
+    """Statically check a pattern for catastrophic backtracking.
+
+    Returns (severity, description) pairs, with severity EXPONENTIAL or
+    QUADRATIC. A pattern that does not compile is reported as exponential,
+    so it is never used.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error as e:
+        return [(EXPONENTIAL, f"invalid pattern: {e}")]
+    items = list(parsed)
+    fold = bool(parsed.state.flags & re.IGNORECASE)
+    problems: List[Tuple[str, str]] = []
+    _audit_items(items, problems, fold)
+    # A leading unbounded repeat is retried from every offset of a run it
+    # matches, unless a word boundary lets it start only at the first word
+    # character of the run
+    skipped = 0
+    boundary = False
+    while skipped < len(items) and (items[skipped][0] in _ZERO_WIDTH or
+                                    (items[skipped][0] in _REPEATS and items[skipped][1][0] == 0
+                                     and not _is_unbounded(*items[skipped]))):
+        boundary = items[skipped] == (sre_parse.AT, sre_constants.AT_BOUNDARY)
+        skipped += 1
+    leading = items[skipped:skipped + 1]
+    if leading and leading[0][0] is sre_parse.SUBPATTERN:
+        leading = list(leading[0][1][-1])[:1]
+    if leading and _is_unbounded(*leading[0]) and not (boundary and _first(leading)[0] <= _WORD):
+        problems.append((QUADRATIC, "leading unbounded quantifier"))
+    return list(dict.fromkeys(problems))
+
+
+class RuleTimeout(Exception):
+    """Raised inside a regex evaluation whose CPU time budget ran out."""
+
+
+def _on_timer(signum, frame) -> None:
+    raise RuleTimeout()
+
+
+_timer_installed = False
+
+
+def _can_interrupt() -> bool:
+    """Whether regex evaluations in this thread can be interrupted by a timer."""
+    global _timer_installed
+    if not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        return False
+    if not _timer_installed:
+        signal.signal(signal.SIGVTALRM, _on_timer)
+        _timer_installed = True
+    return True
+
+
+def time_budget(size: int) -> float:
+    """Seconds of CPU time one rule may spend matching ``size`` characters."""
+    return RULE_TIME_BUDGET + RULE_TIME_BUDGET_PER_MB * size / (1024 * 1024)
+
+
+def quarantine(rule, reason: str) -> None:
+    """Stop using a rule for the rest of the process."""
+    if not rule.quarantined:
+        rule.quarantined = reason
+        logger.warning(f"Quarantined {rule!r} ({getattr(rule, 'secret_type', 'variable assignment')}): "
+                       f"{reason}; it is skipped for the rest of this scan")
+
+
+def guarded_finditer(rule, text: Union[str, bytes], regex: Optional[Pattern] = None,
+                     budget: Optional[float] = None) -> List[Match]:
+    """Return all matches of a rule in ``text``, within a CPU time budget.
+
+    ``regex`` defaults to the rule's text regex, and ``budget`` to the
+    rule's budget for the length of ``text``. Returns no matches, and
+    quarantines the rule, if the budget runs out.
+    """
+    regex = regex or rule.regex
+    if budget is None:
+        budget = time_budget(len(text))
+    budget = max(budget, 0.001)
+    if _can_interrupt():
+        try:
+            signal.setitimer(signal.ITIMER_VIRTUAL, budget)
+            try:
+                return list(regex.finditer(text))
+            finally:
+                signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+        except RuleTimeout:
+            quarantine(rule, f"matching {len(text)} characters took over {budget:.2f}s of CPU time")
+            return []
+    start = time.thread_time()
+    matches = list(regex.finditer(text))
+    elapsed = time.thread_time() - start
+    if elapsed > budget:
+        quarantine(rule, f"matching {len(text)} characters took {elapsed:.2f}s of CPU time")
+    return matches
@@ -3,59 +3,112 @@
 
 import sys
 import os
-import re
+import argparse
 import json
 import logging
 import subprocess
-import math
-from typing import List, Dict, Union, Set, Tuple, Optional, Any
+import mmap
+import time
+import itertools
+import multiprocessing
+from typing import List, Dict, Union, Set, Tuple, Optional, Any, Iterator, Iterable, Match
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.context import BaseContext
 from datetime import datetime
 import html
 from .config import (
-    PATTERNS, HTML_CONFIG,
-    EXCLUDED_EXTENSIONS, EXCLUDED_DIRECTORIES, ENTROPY_THRESHOLDS
+    EXCLUDED_EXTENSIONS, EXCLUDED_DIRECTORIES, ENTROPY_THRESHOLDS,
+    SUSPICIOUS_NAME_TERMS, PARALLEL_SCAN_MIN_FILES, PARALLEL_SCAN_CHUNK_SIZE,
+    FULL_SCAN_INTERVAL, INCREMENTAL_SCAN_MAX_FILES, LONG_LINE_CHARS, SLOW_FILES_LOGGED
 )
 from .utils import (
     setup_logging, get_git_metadata,
     is_git_repo, has_unstaged_changes, get_git_diff,
-    mask_secret
+    mask_secret, get_index_blobs, get_tracked_files, get_head_commit,
+    get_changed_paths, get_dirty_paths, git_path_key, warn_skipped_rules
 )
+from .cache import ScanCache
+from .snapshot import ScanSnapshot
+from .staged import StagedChanges
+from .rules import (
+    Rule, VariableRule, Prefilter, RuleSet, SUSPICIOUS_NAME_RE,
+    SUSPICIOUS_NAME_BYTES_RE, SUSPICIOUS_NAME_BYTES_IGNORECASE_RE, fold_case,
+    get_default_ruleset
+)
+from .lineindex import LineIndex
+from .rulesafety import guarded_finditer
+from .longlines import (
+    LONG_LINES, GENERATED_NAME, GENERATED_MARKER, downgrade_reason, is_generated_name, window_matches
+)
+from .structured import StructuredFormat, is_placeholder, key_name, structured_format
+from .reader import open_buffer, decode_text, is_plain_ascii
+from .entropy import shannon_entropy, batch_entropy
+from .finding import STRUCTURED_METHOD, Finding, LineExcerpt, excerpt_line, location_key
+from .profiling import DEFAULT_PROFILE_PATH, ScanProfile
+from .memory import configure as configure_memory, get_monitor
+from .report import TEMPLATE_PATH, unique_findings, write_html_report
 import webbrowser
-from pathlib import Path
+
+# (value, type, entropy, detection method, variable name, column) of a
+# qualifying match; a column of None means the value is located in its line
+Candidate = Tuple[str, str, Optional[float], str, Optional[str], Optional[int]]
+# A candidate with its column and the excerpt of its line a finding keeps, in
+# place of the column; only these are cached, kept in snapshots and returned
+# by worker processes, so none of them grows with the length of lines
+LocatedCandidate = Tuple[str, str, Optional[float], str, Optional[str], LineExcerpt]
+# (line number, candidates in rule order) for a line with at least one match
+LineCandidates = Tuple[int, List[LocatedCandidate]]
+# (value, type, entropy threshold or None, detection method, variable name,
+# rule, column) of a match that passed every check but the entropy one
+PendingCandidate = Tuple[str, str, Optional[float], str, Optional[str],
+                         Union[Rule, VariableRule, StructuredFormat], Optional[int]]
 
 class SecretScanner:
     """Scanner for detecting potential secrets in code."""
     
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self, logger: Optional[logging.Logger] = None, ruleset: Optional[RuleSet] = None):
         """Initialize the secret scanner."""
         self.logger = logger or logging.getLogger(__name__)
-        self.found_secrets: List[Dict[str, Any]] = []
+        # Detection rules are compiled once and shared between scanners
+        self.ruleset = ruleset or get_default_ruleset()
+        self.found_secrets: List[Finding] = []
         self._seen_secrets: Set[str] = set()
-        # Track file_path:line_number combinations to avoid duplicates
-        self._seen_file_lines: Set[Tuple[str, int]] = set()
+        # Track the locations of findings to avoid duplicates, see location_key
+        self._seen_locations: Set[tuple] = set()
+        # Work saved by the literal prefilter, for files and individual lines
+        self.prefilter_stats: Dict[str, int] = {
+            'files_scanned': 0, 'files_skipped': 0,
+            'lines_scanned': 0, 'lines_skipped': 0,
+            'rules_skipped': 0,
+        }
+        # Seconds spent reading and matching each scanned file, and why files
+        # were scanned in windows or with fewer rules
+        self.scan_times: Dict[str, float] = {}
+        self.downgrades: Dict[str, str] = {}
+        # Per-rule and per-file profile, only kept when profiling is enabled
+        self.profile: Optional[ScanProfile] = None
+        self._finditer = guarded_finditer
+        # Peak memory of the scan phases; past its soft limit the scanner
+        # switches to low-memory mode for the rest of the scan
+        self.memory = get_monitor()
+        self.low_memory = False
+    
+    def enable_profiling(self) -> ScanProfile:
+        """Start profiling rules and files, and return the profile."""
+        if self.profile is None:
+            self.profile = ScanProfile(self.ruleset)
+            self._finditer = self.profile.finditer
+        return self.profile
     
     def calculate_entropy(self, value: str) -> float:
         """Calculate Shannon entropy of a string."""
-        if not value:
-            return 0.0
-        
-        # Count character frequencies
-        freq = {}
-        for c in value:
-            freq[c] = freq.get(c, 0) + 1
-            
-        # Calculate entropy
-        length = float(len(value))
-        return -sum(f/length * math.log2(f/length) for f in freq.values())
+        return shannon_entropy(value)
     
     def is_suspicious_env_var(self, name: str) -> bool:
         """Check if an environment variable name suggests it contains a secret."""
-        suspicious_terms = {
-            'token', 'secret', 'password', 'pwd', 'pass', 'key', 'auth',
-            'credential', 'api', 'private', 'cert', 'ssh'
-        }
         name = name.lower()
-        return any(term in name for term in suspicious_terms)
+        return any(term in name for term in SUSPICIOUS_NAME_TERMS)
     
     def should_skip_value(self, value: str) -> bool:
         """Check if a value should be skipped (common non-secrets)."""
@@ -70,475 +123,943 @@ class SecretScanner:
         }
         return value.lower() in common_values
     
-    def scan_content(self, content: str, file_path: str) -> List[Dict[str, Any]]:
+    def scan_content(self, content: str, file_path: str) -> List[Finding]:
         """Scan content for potential secrets."""
         self.found_secrets = []
-        lines = content.splitlines()
+        self._record_candidates(file_path, self._find_routed_candidates(file_path, content))
+        return self.found_secrets
+    
+    def find_candidates(self, content: str) -> List[LineCandidates]:
+        """Find every qualifying match in content.
+        
+        The result does not depend on secrets seen in other files, so it can be
+        computed in a worker process and recorded later in file order.
+        """
+        folded = fold_case(content)
+        rules, variable_rules = self.ruleset.prefilter.apply_folded(folded)
+        # Case folding can change the length of text, and then name term
+        # offsets do not map back to lines
+        name_terms = SUSPICIOUS_NAME_RE.finditer(folded) if len(folded) == len(content) else None
+        return self._find_buffer_candidates(content, rules, variable_rules, name_terms)
+    
+    def find_buffer_candidates(self, data: Union[bytes, mmap.mmap]) -> List[LineCandidates]:
+        """Find every qualifying match in the raw contents of a file.
+        
+        Plain ASCII contents are scanned as bytes, and only lines with matches
+        are decoded. Anything else is decoded as a whole, lossily if it is not
+        valid UTF-8, and scanned as text.
+        """
+        ruleset = self.ruleset
+        if not is_plain_ascii(data) or not all(rule.pattern.isascii() for rule in ruleset.rules):
+            return self.find_candidates(decode_text(data))
+        if isinstance(data, bytes):
+            lowered = data.lower()
+            rules, variable_rules = ruleset.prefilter.apply_ascii(lowered)
+            name_terms = SUSPICIOUS_NAME_BYTES_RE.finditer(lowered)
+        else:
+            # Memory-mapped files are not copied just for the prefilter
+            rules = [rule for rule in ruleset.rules if not rule.quarantined]
+            variable_rules = [rule for rule in ruleset.variable_rules if not rule.quarantined]
+            name_terms = SUSPICIOUS_NAME_BYTES_IGNORECASE_RE.finditer(data)
+        return self._find_buffer_candidates(data, rules, variable_rules, name_terms)
+    
+    def _find_buffer_candidates(self, buffer: Union[str, bytes, mmap.mmap],
+                                rules: List[Rule], variable_rules: List[VariableRule],
+                                name_terms: Optional[Iterator[Match]]) -> List[LineCandidates]:
+        """Find every qualifying match of the given rules in a text or ASCII buffer.
+        
+        Each pattern rule runs once over the whole buffer, and match offsets
+        are mapped to line numbers. Only lines touched by a match are checked
+        again, one line at a time, so the candidates equal those of a
+        line-by-line scan. Rules marked ``multiline`` report their buffer
+        matches directly, which lets them match blocks such as PEM keys that
+        span lines. Variable assignments are only looked for on lines with one
+        of the ``name_terms`` matches, or on every line if that is None.
+        """
+        stats = self.prefilter_stats
+        stats['rules_skipped'] += (
+            len(self.ruleset.rules) + len(self.ruleset.variable_rules)
+            - len(rules) - len(variable_rules)
+        )
+        profile = self.profile
+        if profile is not None:
+            profile.rejected((*self.ruleset.rules, *self.ruleset.variable_rules), (*rules, *variable_rules))
+        
+        is_text = isinstance(buffer, str)
+        index = LineIndex(buffer)
+        # Rules with a buffer match touching each line, in rule order; multiline
+        # rules map to the matches starting on the line
+        line_rules: Dict[int, Dict[Rule, Optional[List[Match[str]]]]] = {}
+        for rule in rules:
+            for match in self._finditer(rule, buffer, rule.regex if is_text else rule.bytes_regex):
+                first = index.line_number(match.start())
+                if rule.multiline:
+                    if not is_text:
+                        match = rule.regex.fullmatch(match.group(0).decode('ascii'))
+                        if match is None:
+                            continue
+                    line_rules.setdefault(first, {}).setdefault(rule, []).append(match)
+                    continue
+                last = index.line_number(max(match.start(), match.end() - 1))
+                for line_num in range(first, last + 1):
+                    line_rules.setdefault(line_num, {})[rule] = None
+        
+        name_lines: Set[int] = set()
+        if variable_rules:
+            if name_terms is not None:
+                name_lines = {index.line_number(match.start()) for match in name_terms}
+            else:
+                name_lines = set(range(1, index.line_count + 1))
+        
+        hit_lines = sorted(line_rules.keys() | name_lines)
+        if not hit_lines:
+            stats['files_skipped'] += 1
+            return []
+        stats['files_scanned'] += 1
         
-        for line_num, line in enumerate(lines, 1):
+        variable_filter = Prefilter([], variable_rules)
+        pending = []
+        for line_num in hit_lines:
+            line = index.line(line_num)
             # Skip empty lines and comments
             if not line.strip() or line.strip().startswith(('#', '//', '/*', '*')):
                 continue
             
-            # Check if we've already found a secret at this file:line
-            file_line_key = (file_path, line_num)
-            if file_line_key in self._seen_file_lines:
+            buffer_matches = line_rules.get(line_num, {})
+            line_variable_rules = variable_filter.apply(line)[1] if line_num in name_lines else []
+            if profile is not None and line_num in name_lines:
+                profile.rejected(variable_rules, line_variable_rules)
+            if buffer_matches or line_variable_rules:
+                matches = list(self._iter_line_matches(
+                    line, list(buffer_matches), line_variable_rules, buffer_matches
+                ))
+                if matches:
+                    pending.append((line_num, line, matches))
+        
+        stats['lines_scanned'] += len(hit_lines)
+        stats['lines_skipped'] += index.line_count - len(hit_lines)
+        return self._score_candidates(pending)
+    
+    def _find_routed_candidates(self, file_path: str,
+                                data: Union[str, bytes, mmap.mmap]) -> List[LineCandidates]:
+        """Find the candidates of a file, downgrading minified, generated and long-lined files.
+        
+        Configuration files of a known format that are not generated are
+        walked for their key/value pairs (see ``find_structured_candidates``).
+        """
+        reason = downgrade_reason(file_path, data)
+        file_format = structured_format(file_path)
+        if file_format is not None and reason not in (GENERATED_NAME, GENERATED_MARKER):
+            if reason is not None:
+                self.downgrades[file_path] = reason
+            text = data if isinstance(data, str) else decode_text(data)
+            return self.find_structured_candidates(text, file_format, reason)
+        if reason is None:
+            if isinstance(data, str):
+                return self.find_candidates(data)
+            return self.find_buffer_candidates(data)
+        self.downgrades[file_path] = reason
+        self.logger.info(f"Scanning {file_path} in long-line mode ({reason})")
+        text = data if isinstance(data, str) else decode_text(data)
+        return self.find_windowed_candidates(text, reduced=reason != LONG_LINES)
+    
+    def find_windowed_candidates(self, text: str, reduced: bool = False,
+                                 variables: bool = True) -> List[LineCandidates]:
+        """Find every qualifying match in content, matching long lines in windows.
+        
+        Lines up to LONG_LINE_CHARS characters are scanned one by one as
+        usual; longer lines are matched in overlapping windows (see
+        ``longlines.window_matches``). Multiline rules still run over the
+        whole text. With ``reduced``, only the rules that need no entropy
+        check are used, and without ``variables`` no variable assignments
+        are looked for.
+        """
+        line_filter = self.ruleset.reduced_prefilter if reduced else self.ruleset.prefilter
+        if not variables:
+            line_filter = Prefilter(line_filter.rules, [])
+        rules = [rule for rule in line_filter.rules if not rule.multiline]
+        window_filter = Prefilter(rules, line_filter.variable_rules)
+        self.prefilter_stats['files_scanned'] += 1
+        
+        index = LineIndex(text)
+        multiline_matches: Dict[int, Dict[Rule, Optional[List[Match[str]]]]] = {}
+        for rule in line_filter.rules:
+            if rule.multiline:
+                for match in self._finditer(rule, text):
+                    line_matches = multiline_matches.setdefault(index.line_number(match.start()), {})
+                    line_matches.setdefault(rule, []).append(match)
+        
+        pending = []
+        for line_num, line in enumerate(text.splitlines(), 1):
+            # Skip empty lines and comments
+            if not line.strip() or line.strip().startswith(('#', '//', '/*', '*')):
                 continue
             
-            # Flag to track if we found a secret in this line
-            found_secret_in_line = False
-            
-            # First pass: Check against defined patterns
-            for pattern, secret_type, config in PATTERNS:
-                if found_secret_in_line:
-                    break
-                
-                matches = re.finditer(pattern, line)
-                for match in matches:
-                    value = match.group(0)
-                    
-                    # Skip if we've seen this exact secret before
-                    if value in self._seen_secrets:
-                        continue
-                        
-                    # Skip common non-secrets
-                    if self.should_skip_value(value):
-                        continue
-                    
-                    # Check minimum length if specified
-                    min_length = config.get('min_length', 0)
-                    if len(value) < min_length:
-                        continue
-                    
-                    # Calculate entropy if required
-                    entropy = None
-                    if config.get('require_entropy', True):
-                        entropy = self.calculate_entropy(value)
-                        threshold = config.get('threshold', ENTROPY_THRESHOLDS['default'])
-                        if entropy < threshold:
-                            continue
-                    
-                    # For environment variables, check if the name suggests a secret
-                    if config.get('check_name', False) and not self.is_suspicious_env_var(match.group(1)):
-                        continue
-                    
-                    # Record the found secret
-                    secret = {
-                        'file_path': file_path,
-                        'line_number': line_num,
-                        'line': line,
-                        'matched_content': value,
-                        'type': secret_type,
-                        'entropy': entropy,
-                        'detection_method': 'pattern_match'
-                    }
-                    self.found_secrets.append(secret)
-                    self._seen_secrets.add(value)
-                    self._seen_file_lines.add(file_line_key)
-                    
-                    self.logger.info(f"Found potential {secret_type} in {file_path}:{line_num}")
-                    found_secret_in_line = True
-                    break  # Once we find a secret in this line, no need to check other matches
-            
-            # If we already found a secret in this line, skip the variable name scanning
-            if found_secret_in_line:
+            buffer_matches = dict(multiline_matches.get(line_num, {}))
+            variable_matches = None
+            if len(line) > LONG_LINE_CHARS:
+                rule_matches, variable_matches = window_matches(line, window_filter, self._finditer)
+                buffer_matches.update(rule_matches)
+                line_rules = [rule for rule in line_filter.rules if rule in buffer_matches]
+                line_variable_rules = [rule for rule in line_filter.variable_rules if rule in variable_matches]
+                self.prefilter_stats['lines_scanned'] += 1
+            else:
+                admitted, line_variable_rules = self._prefilter_line(window_filter, line)
+                line_rules = [rule for rule in line_filter.rules if rule in buffer_matches or rule in admitted]
+            if line_rules or line_variable_rules:
+                matches = list(self._iter_line_matches(
+                    line, line_rules, line_variable_rules, buffer_matches, variable_matches
+                ))
+                if matches:
+                    pending.append((line_num, line, matches))
+        return self._score_candidates(pending)
+    
+    def find_structured_candidates(self, text: str, file_format: StructuredFormat,
+                                   reason: Optional[str] = None) -> List[LineCandidates]:
+        """Find every qualifying match in a configuration file of a known format.
+        
+        The pattern rules run as on any file, in windows when the file was
+        downgraded for ``reason``. In place of the variable assignment
+        pattern, the walker of the format reads the file's key/value pairs in
+        one pass, and each value is checked like an assigned variable by its
+        key and its entropy. Values are reported at their own line and
+        column, including those on the single line of a minified file and
+        values spanning lines, which are reported at their first line.
+        """
+        rules, variable_rules = self.ruleset.prefilter.apply(text)
+        if reason is None:
+            line_candidates = self._find_buffer_candidates(text, rules, [], None)
+        else:
+            line_candidates = self.find_windowed_candidates(
+                text, reduced=reason != LONG_LINES, variables=False
+            )
+        # Without a suspicious name anywhere in the file no key can qualify
+        if not variable_rules:
+            return line_candidates
+        
+        index = LineIndex(text)
+        starts = index.starts
+        pending: Dict[int, List[PendingCandidate]] = {}
+        start = time.perf_counter()
+        for offset, key, value in file_format.walk(text):
+            threshold = self._structured_threshold(file_format, key, value)
+            if threshold is None:
                 continue
-            
-            # Second pass: Variable name scanning
-            var_patterns = [
-                r'(?i)(?:const|let|var|private|public|protected)?\s*(\w+)\s*[=:]\s*["\']([^"\']+)["\']',
-                r'(?i)(\w+)\s*[=:]\s*["\']([^"\']+)["\']',
-                r'(?i)(\w+)\s*=\s*"""([^"]*)"""',  # Python multi-line strings
-                r'(?i)(\w+)\s*=\s*`([^`]*)`',      # Template literals
-            ]
-            
-            for pattern in var_patterns:
-                matches = re.finditer(pattern, line)
-                for match in matches:
-                    var_name, value = match.groups()
-                    
-                    # Skip if we've seen this exact secret before
-                    if value in self._seen_secrets:
-                        continue
-                        
-                    # Skip common non-secrets
-                    if self.should_skip_value(value):
-                        continue
-                    
-                    # Check if variable name suggests a secret
-                    if not self.is_suspicious_env_var(var_name):
-                        continue
-                    
-                    # Calculate entropy
-                    entropy = self.calculate_entropy(value)
-                    
-                    # Use lower threshold for password-related variables
-                    threshold = ENTROPY_THRESHOLDS['password'] if 'password' in var_name.lower() else ENTROPY_THRESHOLDS['default']
-                    
-                    if entropy >= threshold:
-                        secret = {
-                            'file_path': file_path,
-                            'line_number': line_num,
-                            'line': line,
-                            'matched_content': value,
-                            'type': 'Variable Assignment',
-                            'variable_name': var_name,
-                            'entropy': entropy,
-                            'detection_method': 'variable_scan'
-                        }
-                        self.found_secrets.append(secret)
-                        self._seen_secrets.add(value)
-                        self._seen_file_lines.add(file_line_key)
-                        
-                        self.logger.info(f"Found potential secret in variable '{var_name}' in {file_path}:{line_num}")
-                        # Once we find a secret in this line from variable name, exit the loop
-                        break
-                
-                # If we found a secret in this pattern, break out of the pattern loop
-                if len(self.found_secrets) > 0 and self.found_secrets[-1]['line_number'] == line_num:
-                    break
+            line_num = index.line_number(offset)
+            pending.setdefault(line_num, []).append(
+                (value, 'Variable Assignment', threshold, STRUCTURED_METHOD, key, file_format,
+                 offset - starts[line_num - 1])
+            )
+        if self.profile is not None:
+            self.profile.add_time(file_format, time.perf_counter() - start)
+        if not pending:
+            return line_candidates
         
-        return self.found_secrets
+        # Pattern matches come first on each line, as in a line-by-line scan
+        merged = dict(line_candidates)
+        for line_num, candidates in self._score_candidates(
+                [(line_num, index.line(line_num), matches) for line_num, matches in sorted(pending.items())]):
+            merged.setdefault(line_num, []).extend(candidates)
+        return sorted(merged.items())
     
-    def scan_staged_changes(self) -> List[Dict[str, Any]]:
-        """Scan staged changes for secrets, focusing only on changed lines."""
-        try:
-            # Get list of staged files
-            cmd = ['git', 'diff', '--cached', '--name-only']
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            staged_files = result.stdout.strip().split('\n')
-            staged_files = [f for f in staged_files if f]  # Remove empty strings
-            
-            if not staged_files:
-                self.logger.info("No staged files found.")
-                return []
-                
-            # Get the diff with line numbers for each staged file
-            self.logger.info(f"Scanning {len(staged_files)} staged files for secrets")
-            
-            # Get the detailed diff information
-            diff_cmd = ['git', 'diff', '--cached', '-p', '--unified=0', '--no-color']
-            diff_output = subprocess.check_output(diff_cmd, text=True)
-            
-            # Parse the diff to extract changed lines with correct line numbers
-            changed_lines = {}  # Dict to store {file_path: {line_number: content}}
-            current_file = None
-            
-            for line in diff_output.splitlines():
-                # New file being processed
-                if line.startswith('diff --git'):
-                    file_path = line.split()[-1].lstrip('b/')
-                    current_file = file_path
-                    changed_lines[current_file] = {}
-                
-                # Hunk header with line numbers
-                elif line.startswith('@@ '):
-                    # Format: "@@ -old_start,old_count +new_start,new_count @@"
-                    hunk_info = line.split(' ')[2]  # gets "+new_start,new_count"
-                    
-                    try:
-                        # Extract the starting line number from "+line_num,count"
-                        new_start = int(hunk_info.split(',')[0].lstrip('+'))
-                        self.logger.debug(f"Hunk starts at line {new_start} in {current_file}")
-                    except (IndexError, ValueError) as e:
-                        self.logger.error(f"Error parsing hunk header '{line}': {e}")
-                        continue
-                    
-                    # Store current position in this hunk
-                    current_line_number = new_start - 1  # Prepare for increment
-                
-                # Added or modified line (not the file header line)
-                elif current_file and line.startswith('+') and not line.startswith('+++'):
-                    current_line_number += 1
-                    content = line[1:]  # Remove the '+' prefix
-                    
-                    # Store the changed line with its actual line number in the file
-                    changed_lines[current_file][current_line_number] = content
-                    self.logger.debug(f"Added line {current_line_number} from {current_file} for scanning")
-            
-            # Now scan all changed lines with their correct line numbers
-            for file_path, lines in changed_lines.items():
-                for line_number, content in lines.items():
-                    # Skip empty lines and comments
-                    if not content.strip() or content.strip().startswith(('#', '//', '/*', '*')):
+    def _structured_threshold(self, file_format: StructuredFormat, key: str, value: str) -> Optional[float]:
+        """Check a key/value pair like a variable assignment.
+        
+        Returns the entropy threshold of the value, or None if the pair is
+        dropped for a common or placeholder value or a key without a
+        suspicious name.
+        """
+        profile = self.profile
+        if profile is not None:
+            profile.count(file_format, 'matches')
+        if self.should_skip_value(value) or is_placeholder(value):
+            if profile is not None:
+                profile.count(file_format, 'dropped_common_value')
+            return None
+        name = key_name(key)
+        if not self.is_suspicious_env_var(name):
+            if profile is not None:
+                profile.count(file_format, 'dropped_name')
+            return None
+        return ENTROPY_THRESHOLDS['password'] if 'password' in name.lower() else ENTROPY_THRESHOLDS['default']
+    
+    def _iter_structured_candidates(self, file_format: StructuredFormat, line: str) -> Iterator[Candidate]:
+        """Yield the qualifying key/value pairs of a single line of a configuration file."""
+        profile = self.profile
+        for column, key, value in file_format.walk(line):
+            threshold = self._structured_threshold(file_format, key, value)
+            if threshold is None:
+                continue
+            entropy = self.calculate_entropy(value)
+            if entropy < threshold:
+                if profile is not None:
+                    profile.count(file_format, 'dropped_entropy')
+                continue
+            if profile is not None:
+                profile.count(file_format, 'qualified')
+            yield value, 'Variable Assignment', entropy, STRUCTURED_METHOD, key, column
+    
+    def _score_candidates(self, pending: List[Tuple[int, str, List[PendingCandidate]]]) -> List[LineCandidates]:
+        """Compute the entropy of all matches of a file in one batch and apply the thresholds.
+        
+        The candidates that qualify are located in their lines, and keep only
+        the excerpt of the line a finding keeps.
+        """
+        values = [
+            value
+            for _, _, matches in pending
+            for value, _, threshold, _, _, _, _ in matches
+            if threshold is not None
+        ]
+        entropies = dict(zip(values, batch_entropy(values)))
+        
+        profile = self.profile
+        found = []
+        for line_num, line, matches in pending:
+            candidates = []
+            for value, secret_type, threshold, method, var_name, rule, column in matches:
+                entropy = None
+                if threshold is not None:
+                    entropy = entropies[value]
+                    if entropy < threshold:
+                        if profile is not None:
+                            profile.count(rule, 'dropped_entropy')
                         continue
-                    
-                    # Scan this individual line with its correct line number
-                    self.logger.debug(f"Scanning line {line_number} in {file_path}")
-                    self.scan_line(file_path, line_number, content)
-            
-            self.logger.info(f"Found {len(self.found_secrets)} potential secrets in staged changes")
-            return self.found_secrets
-            
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Error running git command: {e}")
-            return []
+                if profile is not None:
+                    profile.count(rule, 'qualified')
+                candidates.append((value, secret_type, entropy, method, var_name,
+                                   excerpt_line(line, value, column)))
+            if candidates:
+                found.append((line_num, candidates))
+        return found
+    
+    def find_file_candidates(self, file_path: str) -> List[LineCandidates]:
+        """Read a file and find every qualifying match in it."""
+        line_candidates = self._read_file_candidates(file_path)
+        return line_candidates if line_candidates is not None else []
+    
+    def _read_file_candidates(self, file_path: str) -> Optional[List[LineCandidates]]:
+        """Like find_file_candidates, but return None if the file could not be scanned."""
+        start = read = time.perf_counter()
+        try:
+            with open_buffer(file_path) as data:
+                read = time.perf_counter()
+                return self._find_routed_candidates(file_path, data)
         except Exception as e:
-            self.logger.error(f"Unexpected error during staged changes scan: {e}", exc_info=True)
-            return []
-
-    def scan_line(self, file_path: str, line_number: int, line: str) -> None:
-        """Scan a single line for secrets."""
-        # Check if we've already found a secret at this file:line
-        file_line_key = (file_path, line_number)
-        if file_line_key in self._seen_file_lines:
-            return
+            logging.error(f"Error scanning file {file_path}: {e}")
+            return None
+        finally:
+            end = time.perf_counter()
+            self.scan_times[file_path] = end - start
+            if self.profile is not None:
+                self.profile.file_time(file_path, read - start, end - read)
+    
+    def _prefilter_line(self, line_filter: Prefilter, line: str) -> Tuple[List[Rule], List[VariableRule]]:
+        """Apply the literal prefilter to a line and update the prefilter counters."""
+        rules, variable_rules = line_filter.apply(line)
+        if self.profile is not None:
+            self.profile.rejected((*line_filter.rules, *line_filter.variable_rules), (*rules, *variable_rules))
+        stats = self.prefilter_stats
+        stats['rules_skipped'] += (
+            len(line_filter.rules) + len(line_filter.variable_rules)
+            - len(rules) - len(variable_rules)
+        )
+        if rules or variable_rules:
+            stats['lines_scanned'] += 1
+        else:
+            stats['lines_skipped'] += 1
+        return rules, variable_rules
+    
+    def _iter_line_candidates(self, line: str, rules: List[Rule],
+                              variable_rules: List[VariableRule],
+                              buffer_matches: Optional[Dict[Rule, Optional[List[Match[str]]]]] = None,
+                              variable_matches: Optional[Dict[VariableRule, List[Match[str]]]] = None) -> Iterator[Candidate]:
+        """Yield (value, type, entropy, detection method, variable name, column) for each qualifying match in rule order."""
+        profile = self.profile
+        for value, secret_type, threshold, method, var_name, rule, column in self._iter_line_matches(
+                line, rules, variable_rules, buffer_matches, variable_matches):
+            entropy = None
+            if threshold is not None:
+                entropy = self.calculate_entropy(value)
+                if entropy < threshold:
+                    if profile is not None:
+                        profile.count(rule, 'dropped_entropy')
+                    continue
+            if profile is not None:
+                profile.count(rule, 'qualified')
+            yield value, secret_type, entropy, method, var_name, column
+    
+    def _iter_line_matches(self, line: str, rules: List[Rule],
+                           variable_rules: List[VariableRule],
+                           buffer_matches: Optional[Dict[Rule, Optional[List[Match[str]]]]] = None,
+                           variable_matches: Optional[Dict[VariableRule, List[Match[str]]]] = None) -> Iterator[PendingCandidate]:
+        """Yield (value, type, entropy threshold, detection method, variable name, rule, column) for each match in rule order.
         
+        Every check except the entropy one has been applied; the threshold is
+        None when the entropy does not matter, and the column is None as the
+        value is located in the line when it is recorded. Rules with matches in
+        ``buffer_matches`` or ``variable_matches`` use those instead of
+        matching the line again.
+        """
+        profile = self.profile
         # First pass: Check against defined patterns
-        for pattern, secret_type, config in PATTERNS:
-            matches = re.finditer(pattern, line)
-            for match in matches:
+        for rule in rules:
+            matches = buffer_matches.get(rule) if buffer_matches else None
+            for match in matches if matches is not None else self._finditer(rule, line):
                 value = match.group(0)
+                if profile is not None:
+                    profile.count(rule, 'matches')
                 
-                # Skip if we've seen this exact secret before
-                if value in self._seen_secrets:
-                    continue
-                    
                 # Skip common non-secrets
                 if self.should_skip_value(value):
+                    if profile is not None:
+                        profile.count(rule, 'dropped_common_value')
                     continue
                 
                 # Check minimum length if specified
-                min_length = config.get('min_length', 0)
-                if len(value) < min_length:
+                if len(value) < rule.min_length:
+                    if profile is not None:
+                        profile.count(rule, 'dropped_min_length')
                     continue
                 
-                # Calculate entropy if required
-                entropy = None
-                if config.get('require_entropy', True):
-                    entropy = self.calculate_entropy(value)
-                    threshold = config.get('threshold', ENTROPY_THRESHOLDS['default'])
-                    if entropy < threshold:
-                        continue
-                
                 # For environment variables, check if the name suggests a secret
-                if config.get('check_name', False) and not self.is_suspicious_env_var(match.group(1)):
+                if rule.check_name and not self.is_suspicious_env_var(match.group(1)):
+                    if profile is not None:
+                        profile.count(rule, 'dropped_name')
                     continue
                 
-                # Record the found secret
-                secret = {
-                    'file_path': file_path,
-                    'line_number': line_number,
-                    'line': line,
-                    'matched_content': value,
-                    'type': secret_type,
-                    'entropy': entropy,
-                    'detection_method': 'pattern_match'
-                }
-                self.found_secrets.append(secret)
-                self._seen_secrets.add(value)
-                self._seen_file_lines.add(file_line_key)
-                
-                self.logger.info(f"Found potential {secret_type} in {file_path}:{line_number}")
-                return  # Once we find a secret in this line, no need to check other patterns
+                threshold = rule.threshold if rule.require_entropy else None
+                yield value, rule.secret_type, threshold, 'pattern_match', None, rule, None
         
         # Second pass: Variable name scanning
-        var_patterns = [
-            r'(?i)(?:const|let|var|private|public|protected)?\s*(\w+)\s*[=:]\s*["\']([^"\']+)["\']',
-            r'(?i)(\w+)\s*[=:]\s*["\']([^"\']+)["\']',
-            r'(?i)(\w+)\s*=\s*"""([^"]*)"""',  # Python multi-line strings
-            r'(?i)(\w+)\s*=\s*`([^`]*)`',      # Template literals
-        ]
-        
-        for pattern in var_patterns:
-            matches = re.finditer(pattern, line)
-            for match in matches:
-                var_name, value = match.groups()
+        for rule in variable_rules:
+            matches = variable_matches.get(rule) if variable_matches else None
+            for match in matches if matches is not None else self._finditer(rule, line):
+                var_name, value = rule.assignment(match)
+                if profile is not None:
+                    profile.count(rule, 'matches')
                 
-                # Skip if we've seen this exact secret before
-                if value in self._seen_secrets:
-                    continue
-                    
                 # Skip common non-secrets
                 if self.should_skip_value(value):
+                    if profile is not None:
+                        profile.count(rule, 'dropped_common_value')
                     continue
                 
                 # Check if variable name suggests a secret
                 if not self.is_suspicious_env_var(var_name):
+                    if profile is not None:
+                        profile.count(rule, 'dropped_name')
                     continue
                 
-                # Calculate entropy
-                entropy = self.calculate_entropy(value)
-                
                 # Use lower threshold for password-related variables
                 threshold = ENTROPY_THRESHOLDS['password'] if 'password' in var_name.lower() else ENTROPY_THRESHOLDS['default']
-                
-                if entropy >= threshold:
-                    secret = {
-                        'file_path': file_path,
-                        'line_number': line_number,
-                        'line': line,
-                        'matched_content': value,
-                        'type': 'Variable Assignment',
-                        'variable_name': var_name,
-                        'entropy': entropy,
-                        'detection_method': 'variable_scan'
-                    }
-                    self.found_secrets.append(secret)
-                    self._seen_secrets.add(value)
-                    self._seen_file_lines.add(file_line_key)
-                    
-                    self.logger.info(f"Found potential secret in variable '{var_name}' in {file_path}:{line_number}")
-                    return  # Once we find a secret, no need to check other patterns
-
-    def scan_file(self, file_path: str) -> List[Dict[str, Union[str, int]]]:
-        """Scan a single file for secrets."""
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            return self.scan_content(content, file_path=file_path)
-        except Exception as e:
-            logging.error(f"Error scanning file {file_path}: {e}")
-            return []
-
-    def scan_repository(self) -> List[Dict[str, Union[str, int]]]:
-        """Scan the entire Git repository for secrets."""
-        all_results = []
-        # Track file/line combinations we've already seen
-        seen_file_lines = set()
+                yield value, 'Variable Assignment', threshold, 'variable_scan', var_name, rule, None
+    
+    def _record_candidates(self, file_path: str, line_candidates: Iterable[LineCandidates]) -> None:
+        """Record the first new secret on each line of a file."""
+        for line_number, candidates in line_candidates:
+            self._record_line(file_path, line_number, candidates)
+    
+    def _record_line(self, file_path: str, line_number: int,
+                     candidates: Iterable[LocatedCandidate]) -> bool:
+        """Record the first candidate not seen before, and every value of a structured file.
         
-        try:
-            # Get list of all files in the repository
-            cmd = ['git', 'ls-files']
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            files = result.stdout.strip().split('\n')
+        Returns True if a candidate was recorded.
+        """
+        # Columns spanned by the secrets recorded on this line
+        spans: List[Tuple[int, int]] = []
+        for value, secret_type, entropy, method, var_name, excerpt in candidates:
+            column = excerpt[0]
+            # Skip if we've already found a secret at this location, which is
+            # the line except for values of structured files
+            location = location_key(file_path, line_number, method, column)
+            if location in self._seen_locations:
+                continue
+            # Skip if we've seen this exact secret before
+            if value in self._seen_secrets:
+                continue
+            # Skip a value inside a pattern match already recorded, such as
+            # the value of a matched password assignment
+            if method == STRUCTURED_METHOD and any(
+                    start < column + len(value) and column < end for start, end in spans):
+                continue
             
-            # Filter out excluded files and directories
-            files = [
-                f for f in files
-                if not any(f.endswith(ext) for ext in EXCLUDED_EXTENSIONS) and
-                not any(d in f.split('/') for d in EXCLUDED_DIRECTORIES)
-            ]
+            secret = Finding.from_excerpt(file_path, line_number, excerpt, value, secret_type,
+                                          var_name, entropy, method)
             
-            # Scan each file
-            for file in files:
-                if os.path.exists(file):  # Make sure file still exists
-                    results = self.scan_file(file)
-                    
-                    # Only add results that haven't been seen before based on file path and line number
-                    for result in results:
-                        file_line = (result.get('file_path', ''), result.get('line_number', ''))
-                        if file_line not in seen_file_lines:
-                            seen_file_lines.add(file_line)
-                            all_results.append(result)
+            self.found_secrets.append(secret)
+            self._seen_secrets.add(value)
+            self._seen_locations.add(location)
+            spans.append((secret.column, secret.column + secret.match_length))
+            
+            if var_name is not None:
+                self.logger.info(f"Found potential secret in variable '{var_name}' in {file_path}:{line_number}")
+            else:
+                self.logger.info(f"Found potential {secret_type} in {file_path}:{line_number}")
+        
+        return bool(spans)
+    
+    def scan_staged_changes(self, staged: Optional[StagedChanges] = None) -> List[Finding]:
+        """Scan staged changes for secrets, focusing only on changed lines.
         
+        ``staged`` are changes the caller already opened; otherwise the staged
+        file list and the diff are read from a single git invocation here.
+        """
+        try:
+            with self.memory.phase('staged scan'):
+                with staged or StagedChanges.open() as changes:
+                    if not changes.files:
+                        self.logger.info("No staged files found.")
+                        return []
+                    
+                    self.logger.info(f"Scanning {len(changes.files)} staged files for secrets")
+                    
+                    # Stream the diff and scan each added line as soon as git writes it
+                    for file_path, line_number, content in changes.iter_added_lines():
+                        # Skip empty lines and comments
+                        if not content.strip() or content.strip().startswith(('#', '//', '/*', '*')):
+                            continue
+                        
+                        # Scan this individual line with its line number in the new file
+                        start = time.perf_counter()
+                        self.scan_line(file_path, line_number, content)
+                        elapsed = time.perf_counter() - start
+                        self.scan_times[file_path] = self.scan_times.get(file_path, 0.0) + elapsed
+                        if self.profile is not None:
+                            self.profile.file_time(file_path, 0.0, elapsed)
+                
+                self.logger.info(f"Found {len(self.found_secrets)} potential secrets in staged changes")
+                self.log_prefilter_stats()
+                return self.found_secrets
+            
         except subprocess.CalledProcessError as e:
-            logging.error(f"Error listing repository files: {e}")
+            self.logger.error(f"Error running git command: {e}")
+            return []
         except Exception as e:
-            logging.error(f"Error scanning repository: {e}")
+            self.logger.error(f"Unexpected error during staged changes scan: {e}", exc_info=True)
+            return []
+
+    def scan_line(self, file_path: str, line_number: int, line: str) -> None:
+        """Scan a single line for secrets.
+        
+        Lines of generated files are only checked with the rules that need no
+        entropy check, and long lines are matched in windows. Lines of
+        configuration files of a known format are walked for key/value pairs
+        in place of matching variable assignments.
+        """
+        line_filter = self.ruleset.prefilter
+        file_format = None
+        if is_generated_name(file_path):
+            line_filter = self.ruleset.reduced_prefilter
+            self.downgrades.setdefault(file_path, GENERATED_NAME)
+        else:
+            file_format = structured_format(file_path)
+        if len(line) > LONG_LINE_CHARS:
+            self.downgrades.setdefault(file_path, LONG_LINES)
+            window_filter = line_filter if file_format is None else Prefilter(line_filter.rules, [])
+            rule_matches, variable_matches = window_matches(line, window_filter, self._finditer)
+            self.prefilter_stats['lines_scanned'] += 1
+            candidates = self._iter_line_candidates(
+                line, [rule for rule in line_filter.rules if rule in rule_matches],
+                [rule for rule in window_filter.variable_rules if rule in variable_matches],
+                rule_matches, variable_matches
+            )
+            names = True
+        else:
+            rules, variable_rules = self._prefilter_line(line_filter, line)
+            if not rules and not variable_rules:
+                return
+            # The variable rules are only admitted on lines with a suspicious name
+            names = bool(variable_rules)
+            candidates = self._iter_line_candidates(line, rules, variable_rules if file_format is None else [])
+        if file_format is not None and names:
+            candidates = itertools.chain(candidates, self._iter_structured_candidates(file_format, line))
+        self._record_line(file_path, line_number, (
+            (value, secret_type, entropy, method, var_name, excerpt_line(line, value, column))
+            for value, secret_type, entropy, method, var_name, column in candidates
+        ))
+
+    def scan_file(self, file_path: str) -> List[Finding]:
+        """Scan a single file for secrets."""
+        self.found_secrets = []
+        self._record_candidates(file_path, self.find_file_candidates(file_path))
+        return self.found_secrets
+
+    def scan_files(self, files: List[str], jobs: Optional[int] = None,
+                   blob_shas: Optional[Dict[str, str]] = None,
+                   cache: Optional[ScanCache] = None) -> List[Finding]:
+        """Scan files in order, sharding them across a process pool when worthwhile."""
+        if self._check_memory():
+            return self._stream_files(files, blob_shas, cache)
+        file_candidates = self._collect_candidates(files, jobs, blob_shas, cache)
+        return self._record_files(files, file_candidates)
+
+    def _stream_files(self, files: List[str], blob_shas: Optional[Dict[str, str]] = None,
+                      cache: Optional[ScanCache] = None) -> List[Finding]:
+        """Scan files in order in this process, recording each batch before the next.
         
+        Only the findings are kept, not the candidates of every file, so this
+        is how low-memory mode scans; the findings equal those of ``scan_files``.
+        """
+        all_results = []
+        for i in range(0, len(files), PARALLEL_SCAN_CHUNK_SIZE):
+            batch = files[i:i + PARALLEL_SCAN_CHUNK_SIZE]
+            all_results.extend(self._record_files(batch, self._collect_candidates(batch, 1, blob_shas, cache)))
         return all_results
+    
+    def _check_memory(self) -> bool:
+        """Switch to low-memory mode once memory use passed the soft limit; return whether in it."""
+        if not self.low_memory and self.memory.exceeded:
+            self.low_memory = True
+            self.logger.warning("Scanning the remaining files in low-memory mode, without worker processes")
+        return self.low_memory
 
-def generate_html_report(output_path: str, **kwargs) -> bool:
-    """Generate an HTML report with diff scan and repo scan results."""
-    try:
-        diff_secrets = kwargs.get('diff_secrets', [])
-        repo_secrets = kwargs.get('repo_secrets', [])
+    def _collect_candidates(self, files: List[str], jobs: Optional[int] = None,
+                            blob_shas: Optional[Dict[str, str]] = None,
+                            cache: Optional[ScanCache] = None) -> Dict[str, List[LineCandidates]]:
+        """Find the candidates of each file that has any.
         
-        # Deduplicate secrets for the diff scan display
-        already_seen = set()
-        unique_diff_secrets = []
+        Workers only return the candidates of each file; they are recorded later
+        in file order, so the results are identical to a serial scan. Files with
+        a known blob SHA are looked up in ``cache`` first and only read and
+        scanned on a miss, under the key of ``_cache_key``.
+        """
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        blob_shas = blob_shas or {}
+        keys = {file_path: self._cache_key(file_path, blob_shas[file_path])
+                for file_path in files if file_path in blob_shas}
         
-        for secret in diff_secrets:
-            key = (secret.get('file_path', ''), secret.get('line_number', ''))
-            if key not in already_seen:
-                already_seen.add(key)
-                unique_diff_secrets.append(secret)
+        cached: Dict[str, List[LineCandidates]] = {}
+        if cache is not None:
+            cached = cache.get_many({keys[f] for f in files if f in keys})
+        to_scan = [f for f in files if keys.get(f) not in cached]
         
-        # For repository scan, show all unique secrets (including diff secrets)
-        # This provides a complete view of all secrets in the codebase
-        all_secrets_for_repo_view = unique_diff_secrets.copy()
+        result = None
+        if jobs > 1 and len(to_scan) >= PARALLEL_SCAN_MIN_FILES and not self._check_memory():
+            result = self._find_candidates_parallel(to_scan, jobs)
+        if result is None:
+            result = self._find_candidates_serial(to_scan)
+        file_candidates, failed = result
         
-        # Add repo secrets that aren't already in the diff scan
-        for secret in repo_secrets:
-            key = (secret.get('file_path', ''), secret.get('line_number', ''))
-            if key not in already_seen:
-                already_seen.add(key)
-                all_secrets_for_repo_view.append(secret)
+        if cache is not None and not self._rules_quarantined():
+            cache.put_many({
+                keys[f]: file_candidates.get(f, [])
+                for f in to_scan if f in keys and f not in failed
+            })
+            for file_path in files:
+                line_candidates = cached.get(keys.get(file_path))
+                if line_candidates:
+                    file_candidates[file_path] = line_candidates
+        return file_candidates
+
+    @staticmethod
+    def _cache_key(file_path: str, sha: str) -> str:
+        """Return the cache key of a file's blob.
         
-        # Use the deduplicated lists for the rest of the function
-        diff_secrets = unique_diff_secrets
+        How a blob is scanned also depends on the file's name: generated
+        files are scanned with the reduced rules and configuration files by
+        their format (see ``_find_routed_candidates``). The same blob under
+        such a name is cached apart from the blob under a plain name.
+        """
+        if is_generated_name(file_path):
+            return f"{sha}:generated"
+        file_format = structured_format(file_path)
+        return sha if file_format is None else f"{sha}:{file_format.name}"
+
+    def _record_files(self, files: Iterable[str],
+                      file_candidates: Dict[str, List[LineCandidates]]) -> List[Finding]:
+        """Record the candidates of each file in the given order."""
+        all_results = []
+        for file_path in files:
+            line_candidates = file_candidates.get(file_path)
+            if not line_candidates:
+                continue
+            self.found_secrets = []
+            self._record_candidates(file_path, line_candidates)
+            all_results.extend(self.found_secrets)
+        return all_results
+
+    def _find_candidates_serial(self, files: List[str]) -> Tuple[Dict[str, List[LineCandidates]], Set[str]]:
+        """Find candidates in files one by one; return hits and unreadable files."""
+        hits = {}
+        failed = set()
+        for file_path in files:
+            line_candidates = self._read_file_candidates(file_path)
+            if line_candidates is None:
+                failed.add(file_path)
+            elif line_candidates:
+                hits[file_path] = line_candidates
+        return hits, failed
+
+    def _find_candidates_parallel(self, files: List[str], jobs: int) -> Optional[Tuple[Dict[str, List[LineCandidates]], Set[str]]]:
+        """Find candidates in contiguous shards of files using a process pool.
         
-        git_metadata = get_git_metadata()
+        If memory use passes the soft limit, the shards not yet scanned are
+        cancelled and scanned in this process instead.
+        """
+        chunk_size = max(1, min(PARALLEL_SCAN_CHUNK_SIZE, len(files) // (jobs * 4)))
+        chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+        self.logger.info(f"Scanning {len(files)} files with {jobs} worker processes")
         
-        # Generate table rows for diff scan results
-        diff_secrets_table_rows = "".join(
-            f"""<tr>
-                <td class="sno">{i}</td>
-                <td class="filename">{html.escape(data.get('file_path', ''))}</td>
-                <td class="line-number">{data.get('line_number', '')}</td>
-                <td class="secret"><div class="secret-content">{html.escape(mask_secret(data.get('line', '')))}</div></td>
-            </tr>"""
-            for i, data in enumerate(diff_secrets, 1)
-        ) or "<tr><td colspan='4'>No secrets found in staged changes</td></tr>"
-
-        # Generate table rows for repo scan results (including diff secrets)
-        repo_secrets_table_rows = "".join(
-            f"""<tr>
-                <td class="sno">{i}</td>
-                <td class="filename">{html.escape(data.get('file_path', ''))}</td>
-                <td class="line-number">{data.get('line_number', '')}</td>
-                <td class="secret"><div class="secret-content">{html.escape(mask_secret(data.get('line', '')))}</div></td>
-            </tr>"""
-            for i, data in enumerate(all_secrets_for_repo_view, 1)
-        ) or "<tr><td colspan='4'>No secrets found in repository scan</td></tr>"
-        
-        # Empty disallowed files section
-        disallowed_files_section = ""
-
-        # Get the hooks directory (parent of the script)
-        hooks_dir = Path(__file__).parent.parent
-        template_path = hooks_dir / "commit_scripts" / "templates" / "report.html"
-        
-        if not template_path.exists():
-            # If template doesn't exist, use a simple built-in template
-            logging.error(f"Template file not found at {template_path}, using built-in template")
-            html_content = generate_simple_html_report(diff_secrets, repo_secrets, git_metadata)
-        else:
+        hits = {}
+        failed = set()
+        done = 0
+        try:
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=_pool_context()) as executor:
+                profiling = [self.profile is not None] * len(chunks)
+                for chunk_hits, chunk_failed, stats, times, downgrades, quarantined, profile in executor.map(
+                        _scan_files_worker, chunks, profiling):
+                    hits.update(chunk_hits)
+                    failed.update(chunk_failed)
+                    for key, count in stats.items():
+                        self.prefilter_stats[key] += count
+                    self.scan_times.update(times)
+                    self.downgrades.update(downgrades)
+                    self.ruleset.apply_quarantine(quarantined)
+                    if profile is not None and self.profile is not None:
+                        self.profile.merge(profile)
+                    done += 1
+                    if done < len(chunks) and self._check_memory():
+                        executor.shutdown(cancel_futures=True)
+                        break
+        except (OSError, BrokenProcessPool) as e:
+            self.logger.warning(f"Parallel scan unavailable ({e}), scanning serially")
+            return None
+        if done < len(chunks):
+            rest_hits, rest_failed = self._find_candidates_serial([f for chunk in chunks[done:] for f in chunk])
+            hits.update(rest_hits)
+            failed.update(rest_failed)
+        return hits, failed
+
+    def _filter_scannable(self, files: List[str]) -> List[str]:
+        """Drop excluded files and directories and files that no longer exist."""
+        # Filter out excluded files and directories
+        files = [
+            f for f in files
+            if not any(f.endswith(ext) for ext in EXCLUDED_EXTENSIONS) and
+            not any(d in f.split('/') for d in EXCLUDED_DIRECTORIES)
+        ]
+        
+        # Make sure files still exist
+        return [f for f in files if os.path.exists(f)]
+
+    def scan_repository(self, jobs: Optional[int] = None, use_cache: bool = True,
+                        incremental: bool = False) -> List[Finding]:
+        """Scan the entire Git repository for secrets.
+        
+        Unless ``use_cache`` is False, results are cached per blob SHA so files
+        unchanged since an earlier scan are not read again. With ``incremental``,
+        only files changed since the last snapshot are scanned and the candidates
+        of all other files are carried forward from it; a full scan runs when
+        there is no usable snapshot or every FULL_SCAN_INTERVAL commits. In
+        low-memory mode a full scan records its findings a batch of files at a
+        time and takes no snapshot.
+        """
+        all_results = []
+        cache = None
+        # Track the locations we've already reported
+        seen_locations = set()
+        
+        with self.memory.phase('repository scan'):
             try:
-                # Read and fix the template
-                with open(template_path, 'r', encoding='utf-8') as f:
-                    template = f.read()
+                if use_cache:
+                    cache = ScanCache.for_repository(self.ruleset.version, self.logger)
                 
-                # Replace any problematic format markers in the template with their actual values
-                # This fixes issues like the 'margin-top' error
-                template = template.replace('{margin-top}', 'margin-top')
-                template = template.replace('\n            margin-top', 'margin-top')
+                snapshot = None
+                snapshot_path = ScanSnapshot.default_path() if incremental else None
+                if snapshot_path:
+                    snapshot = ScanSnapshot.load(snapshot_path, self.ruleset.version, self.logger)
                 
-                # Format the HTML content with values
-                format_args = {
-                    'title': HTML_CONFIG['title'],
-                    'primary_color': HTML_CONFIG['styles']['primary_color'],
-                    'error_color': HTML_CONFIG['styles']['error_color'],
-                    'background_color': HTML_CONFIG['styles']['background_color'],
-                    'container_background': HTML_CONFIG['styles']['container_background'],
-                    'header_background': HTML_CONFIG['styles']['header_background'],
-                    'git_metadata': git_metadata,
-                    'diff_secrets_table_rows': diff_secrets_table_rows,
-                    'repo_secrets_table_rows': repo_secrets_table_rows,
-                    'disallowed_files_section': disallowed_files_section
-                }
+                file_candidates = None
+                if snapshot is not None:
+                    file_candidates = self._scan_changes_since(snapshot, jobs, cache)
                 
-                # Add fallback for common missing keys
-                for key in ['margin-top', 'tab-content', 'tab-button']:
-                    if key not in format_args:
-                        format_args[key] = key
+                streamed: List[Finding] = []
+                if file_candidates is None:
+                    # Get list of all files in the repository
+                    self.logger.info("Scanning all repository files")
+                    files = self._filter_scannable(get_tracked_files())
+                    blob_shas = get_index_blobs() if cache is not None else {}
+                    if self._check_memory():
+                        # Record files as they are scanned instead of keeping the
+                        # candidates of every file for a snapshot
+                        if snapshot_path:
+                            self.logger.info("Not taking a scan snapshot in low-memory mode")
+                        snapshot = None
+                        file_candidates = {}
+                        streamed = self._stream_files(sorted(files, key=git_path_key), blob_shas, cache)
+                    else:
+                        file_candidates = self._collect_candidates(files, jobs, blob_shas, cache)
+                        head = get_head_commit()
+                        if snapshot_path and head:
+                            snapshot = ScanSnapshot(head, self.ruleset.version, file_candidates,
+                                                    sorted(get_dirty_paths()))
                 
-                html_content = template.format(**format_args)
-            except (KeyError, ValueError) as e:
-                # If template formatting fails, fall back to simple report
-                logging.error(f"Error formatting template: {e}, falling back to simple template")
-                html_content = generate_simple_html_report(diff_secrets, repo_secrets, git_metadata)
+                # Only add results that haven't been seen before at their location
+                ordered_files = sorted(file_candidates, key=git_path_key)
+                for result in streamed + self._record_files(ordered_files, file_candidates):
+                    location = result.location()
+                    if location not in seen_locations:
+                        seen_locations.add(location)
+                        all_results.append(result)
+                
+                if snapshot is not None and not self._rules_quarantined():
+                    snapshot.save(snapshot_path, self.logger)
+            
+            except subprocess.CalledProcessError as e:
+                logging.error(f"Error listing repository files: {e}")
+            except Exception as e:
+                logging.error(f"Error scanning repository: {e}")
+            finally:
+                if cache is not None:
+                    cache.log_stats()
+                    cache.close()
+        
+        self.log_prefilter_stats()
+        return all_results
 
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_path)
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+    def _scan_changes_since(self, snapshot: ScanSnapshot, jobs: Optional[int],
+                            cache: Optional[ScanCache]) -> Optional[Dict[str, List[LineCandidates]]]:
+        """Update a snapshot by scanning only the files changed since it was taken.
+        
+        Returns the candidates of every file in the repository, or None if a
+        full scan is due or the changes cannot be determined.
+        """
+        if snapshot.incremental_runs >= FULL_SCAN_INTERVAL:
+            self.logger.info(f"Full scan due after {snapshot.incremental_runs} incremental scans")
+            return None
+        head = get_head_commit()
+        changed = get_changed_paths(snapshot.commit, head) if head else None
+        if changed is None:
+            self.logger.info("Cannot compare with the last scanned commit")
+            return None
+        
+        dirty = get_dirty_paths()
+        touched = sorted(changed | dirty | set(snapshot.dirty), key=git_path_key)
+        if len(touched) > INCREMENTAL_SCAN_MAX_FILES:
+            self.logger.info(f"{len(touched)} files changed, running a full scan instead")
+            return None
+        self.logger.info(f"Scanning {len(touched)} files changed since {snapshot.commit[:8]}")
+        
+        tracked = set(get_tracked_files(touched))
+        files = self._filter_scannable([f for f in touched if f in tracked])
+        blob_shas = get_index_blobs(files) if cache is not None else {}
+        
+        file_candidates = dict(snapshot.files)
+        for file_path in touched:
+            file_candidates.pop(file_path, None)
+        file_candidates.update(self._collect_candidates(files, jobs, blob_shas, cache))
+        
+        snapshot.commit = head
+        snapshot.files = file_candidates
+        snapshot.dirty = sorted(dirty, key=git_path_key)
+        snapshot.incremental_runs += 1
+        return file_candidates
 
-        # Write HTML content to file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-            
+    def _rules_quarantined(self) -> bool:
+        """Check whether rules were quarantined, making results incomplete."""
+        if self.ruleset.quarantined():
+            self.logger.info("Rules are quarantined, not saving scan results for reuse")
+            return True
+        return False
+
+    def log_prefilter_stats(self) -> None:
+        """Log how much work the literal prefilter saved, and the slowest files."""
+        stats = self.prefilter_stats
+        self.logger.info(
+            f"Prefilter skipped {stats['files_skipped']} of "
+            f"{stats['files_scanned'] + stats['files_skipped']} files, "
+            f"{stats['lines_skipped']} of {stats['lines_scanned'] + stats['lines_skipped']} lines "
+            f"and {stats['rules_skipped']} rule evaluations"
+        )
+        if self.downgrades:
+            self.logger.info(f"Scanned {len(self.downgrades)} minified, generated or long-lined files "
+                             f"in long-line mode")
+        slowest = sorted(self.scan_times.items(), key=lambda item: item[1], reverse=True)[:SLOW_FILES_LOGGED]
+        if slowest:
+            self.logger.info("Slowest files: " + ", ".join(
+                f"{path} ({elapsed * 1000:.0f} ms{', ' + self.downgrades[path] if path in self.downgrades else ''})"
+                for path, elapsed in slowest
+            ))
+
+def _scan_files_worker(files: List[str], profile: bool = False) -> Tuple[
+        Dict[str, List[LineCandidates]], List[str], Dict[str, int], Dict[str, float],
+        Dict[str, str], Dict[str, str], Optional[Dict[str, Any]]]:
+    """Process pool worker: find candidates in a shard of files.
+    
+    Only files with candidates are returned, together with the files that
+    could not be read, the worker's prefilter counters, the time spent on
+    each file, the reasons files were downgraded, the rules quarantined and,
+    with ``profile``, the profile of the shard.
+    """
+    scanner = SecretScanner()
+    if profile:
+        scanner.enable_profiling()
+    hits, failed = scanner._find_candidates_serial(files)
+    return (hits, list(failed), scanner.prefilter_stats, scanner.scan_times, scanner.downgrades,
+            scanner.ruleset.quarantined(), scanner.profile.to_dict() if scanner.profile else None)
+
+def _pool_context() -> Optional[BaseContext]:
+    """Return the multiprocessing context of the worker pool, or None for the default.
+    
+    The memory monitor samples on a thread while the pool starts, so forking
+    this process could copy a lock held by that thread into a worker and
+    deadlock it. Where it is available a fork server, started before any
+    worker and with this module imported, forks the workers instead.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return None
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([_scan_files_worker.__module__])
+    return context
+
+def start_fork_server() -> None:
+    """Start the fork server of the worker pool now, where workers are forked from one.
+    
+    Otherwise it starts with the first parallel scan, and keeps the
+    environment of the process at that time for every later worker.
+    """
+    if _pool_context() is not None:
+        from multiprocessing import forkserver
+        forkserver.ensure_running()
+
+def generate_html_report(output_path: str, **kwargs) -> bool:
+    """Generate an HTML report with diff scan and repo scan results.
+    
+    ``diff_secrets`` and ``repo_secrets`` fill the two tabs; repository scans
+    may pass their findings as ``secrets_list`` and list ``disallowed_files``,
+    and ``skipped_rules`` lists the rules the scans quarantined.
+    Findings are streamed into the page as JSON, which renders them on demand;
+    the footer gives the peak memory of the scan phases run in this process.
+    """
+    try:
+        diff_secrets = kwargs.get('diff_secrets') or []
+        repo_secrets = kwargs.get('repo_secrets') or kwargs.get('secrets_list') or []
+        git_metadata = get_git_metadata()
+        
+        memory = get_monitor()
+        with memory.phase('report'):
+            if not os.path.exists(TEMPLATE_PATH):
+                # If template doesn't exist, use a simple built-in template
+                logging.error(f"Template file not found at {TEMPLATE_PATH}, using built-in template")
+                diff_secrets = list(unique_findings(diff_secrets))
+                repo_secrets = list(unique_findings(diff_secrets, repo_secrets))
+                html_content = generate_simple_html_report(diff_secrets, repo_secrets, git_metadata)
+                output_dir = os.path.dirname(output_path)
+                if output_dir and not os.path.exists(output_dir):
+                    os.makedirs(output_dir)
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    f.write(html_content)
+            else:
+                # The footer shows the phases before the report; the log has the report's own
+                counts = write_html_report(output_path, diff_secrets, repo_secrets, git_metadata,
+                                           disallowed_files=kwargs.get('disallowed_files'),
+                                           footer=memory.summary(),
+                                           skipped_rules=kwargs.get('skipped_rules'))
+                logging.info(f"Report lists {counts.get('diff_data', 0)} diff and "
+                             f"{counts.get('repo_data', 0)} repository findings")
+        
         logging.info(f"HTML report generated at {output_path}")
         return True
         
@@ -635,7 +1156,7 @@ def generate_simple_html_report(diff_secrets, repo_secrets, git_metadata):
                         <td>{i}</td>
                         <td>{html.escape(s.get('file_path', ''))}</td>
                         <td>{s.get('line_number', '')}</td>
-                        <td><div class="secret-content">{html.escape(mask_secret(s.get('line', '')))}</div></td>
+                        <td><div class="secret-content">{html.escape(mask_secret(s.excerpt()))}</div></td>
                     </tr>""" for i, s in enumerate(diff_secrets, 1)) or "<tr><td colspan='4'>No secrets found in staged changes</td></tr>"}
                 </table>
             </div>
@@ -653,7 +1174,7 @@ def generate_simple_html_report(diff_secrets, repo_secrets, git_metadata):
                         <td>{i}</td>
                         <td>{html.escape(s.get('file_path', ''))}</td>
                         <td>{s.get('line_number', '')}</td>
-                        <td><div class="secret-content">{html.escape(mask_secret(s.get('line', '')))}</div></td>
+                        <td><div class="secret-content">{html.escape(mask_secret(s.excerpt()))}</div></td>
                     </tr>""" for i, s in enumerate(repo_secrets, 1)) or "<tr><td colspan='4'>No secrets found in repository scan</td></tr>"}
                 </table>
             </div>
@@ -692,12 +1213,46 @@ def generate_simple_html_report(diff_secrets, repo_secrets, git_metadata):
 </body>
 </html>"""
 
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Build the command line parser shared by the scan entry points."""
+    parser = argparse.ArgumentParser(description="Scan a Git repository for secrets.")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="Worker processes for repository scans (default: CPU count)")
+    parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                        help="Rescan every file instead of reusing cached results")
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_PATH, metavar='PATH',
+                        help="Profile every rule and file and write the profile as JSON "
+                             f"(default: {DEFAULT_PROFILE_PATH}); cached files are not profiled")
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help="Rules and files listed in the profile summary")
+    parser.add_argument('--memory-limit', type=float, metavar='MB',
+                        help="Soft memory limit past which the scan switches to low-memory mode; 0 turns it off")
+    parser.add_argument('--trace-memory', type=int, metavar='N',
+                        help="Log the N call sites that allocated most in each scan phase (slow)")
+    return parser
+
+def write_profile(scanner: SecretScanner, path: str, top: int, elapsed: float, findings: int) -> None:
+    """Write a scanner's profile to ``path`` and print its summary to stderr."""
+    try:
+        scanner.profile.write(path, elapsed, findings)
+        print(f"Scan profile written to {path}", file=sys.stderr)
+    except OSError as e:
+        logging.error(f"Could not write the scan profile to {path}: {e}")
+    print(scanner.profile.summary(top), file=sys.stderr)
+
 def main() -> None:
     """Main entry point for the secret scanner."""
-    args = sys.argv[1:]
+    parser = build_arg_parser()
+    parser.add_argument('--diff', action='store_true', help="Scan only staged changes")
+    args, _ = parser.parse_known_args()
+    configure_memory(args.memory_limit, args.trace_memory)
     scanner = SecretScanner()
+    if args.profile:
+        scanner.enable_profiling()
+    start = time.perf_counter()
+    results = []
 
-    if "--diff" in args:
+    if args.diff:
         logging.info("Scanning only staged changes...")
         try:
             results = scanner.scan_staged_changes()
@@ -711,7 +1266,7 @@ def main() -> None:
     else:
         logging.info("Scanning entire repository...")
         try:
-            results = scanner.scan_repository()
+            results = scanner.scan_repository(jobs=args.jobs, use_cache=args.use_cache)
             if results:
                 print("Potential secrets found in repository:")
                 for result in results:
@@ -719,6 +1274,10 @@ def main() -> None:
         except Exception as e:
             logging.error(f"Error scanning repository: {e}")
             sys.exit(1)
+    warn_skipped_rules(scanner.ruleset.describe_quarantined())
+
+    if args.profile:
+        write_profile(scanner, args.profile, args.profile_top, time.perf_counter() - start, len(results))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
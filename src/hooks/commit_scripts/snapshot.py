@@ -0,0 +1,80 @@
+"""Snapshot of the last repository scan, carried forward between commits."""
+
+import os
+import json
+import logging
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from .utils import get_git_dir
+
+# Bump when the layout of stored candidates changes
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+class ScanSnapshot:
+    """Per-file candidates of the last repository scan at a given commit.
+
+    Only files with candidates are stored. ``dirty`` lists the files whose
+    working tree differed from the commit when the snapshot was taken, so the
+    next incremental scan reads them again.
+    """
+
+    def __init__(self, commit: str, version: str, files: Dict[str, List[Any]],
+                 dirty: Optional[List[str]] = None, incremental_runs: int = 0):
+        self.commit = commit
+        self.version = version
+        self.files = files
+        self.dirty = dirty or []
+        self.incremental_runs = incremental_runs
+
+    @staticmethod
+    def default_path() -> Optional[str]:
+        """Return the snapshot location of the current repository."""
+        try:
+            return os.path.join(get_git_dir(), 'genie', 'repo-scan-snapshot.json')
+        except (subprocess.CalledProcessError, OSError):
+            return None
+
+    @classmethod
+    def load(cls, path: Optional[str], version: str,
+             logger: Optional[logging.Logger] = None) -> Optional['ScanSnapshot']:
+        """Load a snapshot taken with the same rule-set version, if there is one."""
+        logger = logger or logging.getLogger(__name__)
+        if not path or not os.path.isfile(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') != SNAPSHOT_FORMAT_VERSION or data.get('version') != version:
+                logger.info("Scan snapshot was taken with different rules, ignoring it")
+                return None
+            return cls(data['commit'], data['version'], data['files'],
+                       data.get('dirty', []), data.get('incremental_runs', 0))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Error reading scan snapshot: {e}")
+            return None
+
+    def save(self, path: Optional[str], logger: Optional[logging.Logger] = None) -> bool:
+        """Write the snapshot atomically; return True on success."""
+        logger = logger or logging.getLogger(__name__)
+        if not path:
+            return False
+        data = {
+            'format': SNAPSHOT_FORMAT_VERSION,
+            'commit': self.commit,
+            'version': self.version,
+            'incremental_runs': self.incremental_runs,
+            'dirty': self.dirty,
+            'files': self.files,
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, path)
+            return True
+        except OSError as e:
+            logger.warning(f"Error writing scan snapshot: {e}")
+            return False
@@ -0,0 +1,131 @@
+"""Staged changes read from a single streaming git diff."""
+
+import subprocess
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from .utils import DIFF_PATCH_ARGS, parse_added_lines
+
+# Bytes read at a time while looking for the end of the file list
+_READ_SIZE = 64 * 1024
+
+
+def _parse_raw_records(raw: bytes) -> Dict[str, str]:
+    """Parse ``git diff --raw -z`` records into {path: status letter}.
+
+    Renames and copies list the source and destination path; only the
+    destination is kept.
+    """
+    files: Dict[str, str] = {}
+    fields = raw.split(b'\0')
+    i = 0
+    while i < len(fields):
+        meta = fields[i]
+        i += 1
+        if not meta.startswith(b':'):
+            continue
+        status = meta.split(b' ')[-1].decode('ascii', errors='replace')
+        paths = 2 if status[:1] in ('R', 'C') else 1
+        if i + paths > len(fields):
+            break
+        path = fields[i + paths - 1].decode('utf-8', errors='surrogateescape')
+        files[path] = status[:1]
+        i += paths
+    return files
+
+
+def _join_lines(head: bytes, stream: IO[bytes]) -> Iterator[bytes]:
+    """Yield the lines of ``head`` followed by the rest of ``stream``."""
+    parts = head.split(b'\n')
+    for part in parts[:-1]:
+        yield part + b'\n'
+    rest = parts[-1]
+    for line in stream:
+        if rest:
+            line = rest + line
+            rest = b''
+        yield line
+    if rest:
+        yield rest
+
+
+class StagedChanges:
+    """Staged files and added lines from one ``git diff --cached`` call.
+
+    Git writes the raw file list before the patch, so the staged files are
+    known as soon as the changes are opened, while the added lines are
+    streamed afterwards as git produces them.
+    """
+
+    def __init__(self, files: Dict[str, str], patch: Iterator[bytes],
+                 proc: Optional[subprocess.Popen] = None, cmd: Optional[List[str]] = None):
+        self.files = files
+        self._patch = patch
+        self._proc = proc
+        self._cmd = cmd
+        # Whether all of git's output has been read
+        self._exhausted = False
+
+    @classmethod
+    def open(cls) -> 'StagedChanges':
+        """Start git and read the list of staged files.
+
+        Raises CalledProcessError if git fails before listing the files.
+        """
+        cmd = ['git', '-c', 'core.quotePath=false', 'diff', '--cached',
+               '--raw', '-z', *DIFF_PATCH_ARGS]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        buffer = b''
+        end = -1
+        while end < 0:
+            chunk = proc.stdout.read1(_READ_SIZE)
+            if not chunk:
+                break
+            # Search from one byte back in case the separator spans chunks
+            start = max(len(buffer) - 1, 0)
+            buffer += chunk
+            end = buffer.find(b'\0\0', start)
+
+        if end < 0:
+            # No patch follows the file list
+            changes = cls(_parse_raw_records(buffer), iter(()), proc, cmd)
+            changes._exhausted = True
+        else:
+            changes = cls(_parse_raw_records(buffer[:end + 1]),
+                          _join_lines(buffer[end + 2:], proc.stdout), proc, cmd)
+        if not changes.files:
+            changes.close()
+        return changes
+
+    def iter_added_lines(self) -> Iterator[Tuple[str, int, str]]:
+        """Stream (file path, line number, content) for every added line.
+
+        Raises CalledProcessError if git fails while writing the patch.
+        """
+        yield from parse_added_lines(self._patch)
+        self._exhausted = True
+        self.close()
+
+    def close(self) -> None:
+        """Stop reading the patch and wait for git to exit.
+
+        Raises CalledProcessError if git failed after all of its output was
+        read; git exiting because the patch was abandoned is not an error.
+        """
+        proc, self._proc = self._proc, None
+        self._patch = iter(())
+        if proc is None:
+            return
+        proc.stdout.close()
+        if proc.wait() and self._exhausted:
+            raise subprocess.CalledProcessError(proc.returncode, self._cmd)
+
+    def __enter__(self) -> 'StagedChanges':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Do not mask the original error
+            self._exhausted = False
+            self.close()
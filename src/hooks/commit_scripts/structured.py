@@ -0,0 +1,377 @@
+"""Format-aware scanning of configuration files.
+
+JSON, YAML, ``.env``, properties/INI and XML files keep their secrets in
+key/value pairs. For these formats a walker reads the pairs of a file in one
+pass, without building a parse tree, and yields each value with its key and
+its offset in the text. The scanner checks every value the way it checks an
+assigned variable, by the name of its key and the value's entropy, and
+reports it at its exact line and column. That finds what line-based
+matching cannot see: the values of a minified JSON file on one huge line,
+YAML block scalars spanning lines, unquoted values and XML element text.
+
+Walkers are lenient: they skip what they do not understand rather than fail,
+so a malformed file is still scanned as far as it can be read. Values are
+returned as written, escapes included.
+"""
+
+import os
+import re
+import fnmatch
+import functools
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import STRUCTURED_FILE_PATTERNS
+
+# Bump when a walker yields different pairs, so that cached results and
+# snapshots of structured files are discarded
+WALKER_VERSION = 2
+
+# (offset of the value in the text, key, value)
+KeyValue = Tuple[int, str, str]
+
+# The key of a pair is checked by its last segment, so 'auth.url' is not
+# suspicious but 'Authentication:ClientSecret' is
+_KEY_SEPARATORS = re.compile(r'[.:/]')
+
+# Values that only refer to a secret kept elsewhere, such as ${DB_PASSWORD},
+# {{ api_token }}, %(secret)s or $SECRET
+_PLACEHOLDER = re.compile(r'\$\{[^}]*\}|\{\{[^}]*\}\}|%\([^)]*\)s|\$[A-Za-z_]\w*|%[A-Za-z_]\w*%')
+
+
+def key_name(key: str) -> str:
+    """Return the part of a key that names the value, its last dotted, colon or slash segment."""
+    segments = [segment for segment in _KEY_SEPARATORS.split(key) if segment]
+    return segments[-1] if segments else key
+
+
+def is_placeholder(value: str) -> bool:
+    """Check whether a value is only a reference to a variable or setting."""
+    return _PLACEHOLDER.fullmatch(value.strip()) is not None
+
+
+# JSON, including the comments of JSONC and appsettings.json files
+_JSON_TOKEN = re.compile(r'''
+    "((?:[^"\\\n]|\\.)*)"           # string, group 1 its contents
+  | ([{}\[\]:,])                    # punctuation, group 2
+  | //[^\n]* | /\*.*?\*/            # comments
+  | [^\s"{}\[\]:,/]+                # numbers, true, false and null
+''', re.VERBOSE | re.DOTALL)
+
+
+def walk_json(text: str) -> Iterator[KeyValue]:
+    """Yield the string values of a JSON document with the key they belong to.
+
+    A string followed by a colon is a key, any other string a value of the
+    innermost key; values in arrays belong to the key of the array.
+    Top-level strings have no key and are skipped.
+    """
+    # Key of the member being read, for each open object or array
+    keys: List[Optional[str]] = [None]
+    # The last string, until the next token tells whether it is a key
+    pending: Optional[Tuple[int, str]] = None
+    for match in _JSON_TOKEN.finditer(text):
+        string, punctuation = match.group(1), match.group(2)
+        if pending is not None:
+            offset, contents = pending
+            pending = None
+            if punctuation == ':':
+                keys[-1] = contents
+                continue
+            if keys[-1] is not None:
+                yield offset, keys[-1], contents
+        if string is not None:
+            pending = (match.start(1), string)
+        elif punctuation == '{':
+            keys.append(None)
+        elif punctuation == '[':
+            keys.append(keys[-1])
+        elif punctuation in ('}', ']') and len(keys) > 1:
+            keys.pop()
+    if pending is not None and keys[-1] is not None:
+        yield pending[0], keys[-1], pending[1]
+
+
+# A mapping key followed by its colon, after any list item markers
+_YAML_KEY = re.compile(r'''
+    (?P<key>"(?:[^"\\]|\\.)*"|'(?:[^']|'')*'|[^\s#'"\[\]{},&*!|>%@`-][^#]*?)
+    [ \t]*:(?:[ \t]+|$)
+''', re.VERBOSE)
+_YAML_ITEM = re.compile(r'(?:-(?:[ \t]+|$))+')
+_YAML_BLOCK = re.compile(r'([|>])[-+0-9]*[ \t]*(?:#.*)?$')
+# A scalar after its tags and anchors: quoted, or plain up to a comment
+_YAML_SCALAR = re.compile(r'''
+    (?:[!&][^\s]*[ \t]+)*
+    (?:"(?P<double>(?:[^"\\]|\\.)*)"|'(?P<single>(?:[^']|'')*)'|(?P<plain>[^\s*\[{"'#].*?))
+    [ \t]*(?:[ \t]\#.*)?$
+''', re.VERBOSE)
+
+
+def _yaml_scalar(line: str, pos: int) -> Optional[Tuple[int, str]]:
+    """Return the column and text of the scalar starting at ``pos``, or None for other nodes."""
+    match = _YAML_SCALAR.match(line, pos)
+    if match is None:
+        return None
+    # The three forms are alternatives, so the one that matched is the last group
+    return match.start(match.lastgroup), match.group(match.lastgroup)
+
+
+# A token of a flow collection: an indicator, or a scalar and the colon
+# that makes it a key. Plain scalars may contain colons not followed by a
+# space, as in URLs, and end before a comment.
+_YAML_FLOW_TOKEN = re.compile(r"""
+    [ \t]*(?:
+        (?P<indicator>[{}\[\],])
+        |(?:"(?P<double>(?:[^"\\]|\\.)*)"|'(?P<single>(?:[^']|'')*)'
+            |(?P<plain>(?:[^\s,{}\[\]:#"']|:(?![\s,{}\[\]]))
+                       (?:[^\s,{}\[\]:]|:(?![\s,{}\[\]])|[ \t]+(?=[^\s,{}\[\]:\#]|:(?![\s,{}\[\]])))*))
+         [ \t]*(?P<colon>:(?=[\s,{}\[\]]|$))?
+    )
+""", re.VERBOSE)
+_YAML_FLOW_SCALARS = ('double', 'single', 'plain')
+
+
+def _yaml_flow(line: str, pos: int, key: str) -> Iterator[Tuple[int, str, str]]:
+    """Yield the column, key and text of the scalars of the flow collection at ``pos``.
+
+    Values of a mapping belong to their own key, and items of a sequence to
+    the key of the sequence. Only the part of the collection on this line is
+    read.
+    """
+    # (indicator, key of the items) of the open collections
+    stack: List[Tuple[str, str]] = []
+    # The key of the next value in a mapping
+    pending: Optional[str] = None
+    while pos < len(line):
+        token = _YAML_FLOW_TOKEN.match(line, pos)
+        if token is None:
+            return
+        pos = token.end()
+        indicator = token.group('indicator')
+        if indicator in ('{', '['):
+            stack.append((indicator, pending if pending is not None else (stack[-1][1] if stack else key)))
+            pending = None
+            continue
+        if not stack:
+            return
+        if indicator in ('}', ']'):
+            stack.pop()
+            pending = None
+            if not stack:
+                return
+        elif indicator == ',':
+            pending = None
+        else:
+            name = next(name for name in _YAML_FLOW_SCALARS if token.group(name) is not None)
+            if token.group('colon'):
+                pending = token.group(name)
+                continue
+            owner = pending if stack[-1][0] == '{' else stack[-1][1]
+            if owner is not None:
+                yield token.start(name), owner, token.group(name)
+            pending = None
+
+
+def _yaml_block(key: str, style: str, lines: List[Tuple[int, str]]) -> Iterator[KeyValue]:
+    """Yield the value of a block scalar from its (offset, line) lines."""
+    while lines and not lines[-1][1].strip():
+        lines.pop()
+    content = [(offset, line) for offset, line in lines if line.strip()]
+    if not content:
+        return
+    first_offset, first = content[0]
+    dedent = len(first) - len(first.lstrip(' '))
+    texts = [line[dedent:] for _, line in lines[lines.index(content[0]):]]
+    yield first_offset + dedent, key, ('\n' if style == '|' else ' ').join(texts)
+
+
+def walk_yaml(text: str) -> Iterator[KeyValue]:
+    """Yield the scalar values of a YAML document with the key they belong to.
+
+    Reads block mappings and sequences line by line: ``key: value`` pairs,
+    list items, which belong to the key of their list, and ``|`` and ``>``
+    block scalars, whose lines are joined into one value. Flow collections,
+    ``{key: value, ...}`` and ``[item, ...]``, are read as far as they go on
+    the line they start on. Aliases and plain scalars continued on further
+    lines are skipped.
+    """
+    # (indentation, key) of the keys whose value is a nested block
+    parents: List[Tuple[int, str]] = []
+    # (indentation of the key, key, style, (offset, line) lines) of an open block scalar
+    block: Optional[Tuple[int, str, str, List[Tuple[int, str]]]] = None
+    offset = 0
+    for raw in text.splitlines(True):
+        start = offset
+        offset += len(raw)
+        line = raw.rstrip('\r\n')
+        stripped = line.lstrip(' ')
+        indent = len(line) - len(stripped)
+        if block is not None:
+            if not stripped.strip() or indent > block[0]:
+                block[3].append((start, line))
+                continue
+            yield from _yaml_block(*block[1:])
+            block = None
+        if not stripped or stripped.startswith('#'):
+            continue
+        if indent == 0 and stripped.startswith(('---', '...')):
+            parents.clear()
+            continue
+
+        item = _YAML_ITEM.match(line, indent) if stripped[0] == '-' else None
+        pos = item.end() if item else indent
+        while parents and (parents[-1][0] > indent or (parents[-1][0] == indent and not item)):
+            parents.pop()
+        entry = _YAML_KEY.match(line, pos)
+        if entry is None:
+            if line[pos] in '{[':
+                for column, key, value in _yaml_flow(line, pos, parents[-1][1] if parents else ''):
+                    yield start + column, key, value
+            elif item and parents:
+                scalar = _yaml_scalar(line, pos)
+                if scalar is not None:
+                    yield start + scalar[0], parents[-1][1], scalar[1]
+            continue
+
+        key = entry.group('key')
+        if key[:1] in ('"', "'"):
+            key = key[1:-1]
+        rest = line[entry.end():]
+        if not rest or rest.startswith('#'):
+            parents.append((pos, key))
+            continue
+        style = _YAML_BLOCK.match(rest)
+        if style is not None:
+            block = (pos, key, style.group(1), [])
+            continue
+        if rest[0] in '{[':
+            for column, flow_key, value in _yaml_flow(line, entry.end(), key):
+                yield start + column, flow_key, value
+            continue
+        scalar = _yaml_scalar(line, entry.end())
+        if scalar is not None:
+            yield start + scalar[0], key, scalar[1]
+    if block is not None:
+        yield from _yaml_block(*block[1:])
+
+
+# A .env assignment: a quoted value, or a plain one up to a comment
+_ENV_ENTRY = re.compile(r'''
+    ^[ \t]*(?:export[ \t]+)?(?P<key>[A-Za-z_][\w.\-]*)[ \t]*=[ \t]*
+    (?:"(?P<double>(?:[^"\\\n]|\\.)*)"|'(?P<single>[^'\n]*)'|(?P<plain>[^\s'"#][^\n]*?)(?=[ \t]+\#|[ \t\r]*$))
+''', re.VERBOSE | re.MULTILINE)
+
+# A properties or INI entry: key = value or key: value; the value is the
+# rest of the line
+_PROPERTIES_ENTRY = re.compile(r'''
+    ^[ \t]*(?P<key>[^\s#!;=:\[][^=:\n]*?)[ \t]*[=:][ \t]*(?P<plain>[^\s][^\n]*?)[ \t\r]*$
+''', re.VERBOSE | re.MULTILINE)
+
+
+def walk_env(text: str) -> Iterator[KeyValue]:
+    """Yield the values of a .env file with their variable names."""
+    for match in _ENV_ENTRY.finditer(text):
+        yield match.start(match.lastgroup), match.group('key'), match.group(match.lastgroup)
+
+
+def walk_properties(text: str) -> Iterator[KeyValue]:
+    """Yield the values of a properties or INI file with their keys.
+
+    Comment lines and section headers are skipped; values quoted as a whole
+    are unquoted.
+    """
+    for match in _PROPERTIES_ENTRY.finditer(text):
+        offset, value = match.start('plain'), match.group('plain')
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+            offset, value = offset + 1, value[1:-1]
+        yield offset, match.group('key'), value
+
+
+_XML_TOKEN = re.compile(r'''
+    <!--.*?-->
+  | <!\[CDATA\[(?P<cdata>.*?)\]\]>
+  | <[?!][^>]*>
+  | </(?P<close>[^\s>]+)\s*>
+  | <(?P<open>[^\s/>]+)(?P<attributes>(?:[^>"']|"[^"]*"|'[^']*')*?)(?P<empty>/?)>
+  | (?P<text>[^<]+)
+''', re.VERBOSE | re.DOTALL)
+_XML_ATTRIBUTE = re.compile(r'''([^\s=/]+)\s*=\s*(?:"([^"]*)"|'([^']*)')''')
+# Attributes that name an element's value, as in <add key="ApiKey" value="..."/>
+# or <entry key="db.password">...</entry>
+_XML_NAME_ATTRIBUTES = ('key', 'name')
+
+
+def walk_xml(text: str) -> Iterator[KeyValue]:
+    """Yield the attribute values and element text of an XML document.
+
+    Attributes are keyed by their name. The text of an element, and its
+    ``value`` attribute, are keyed by its ``key`` or ``name`` attribute when
+    it has one, and otherwise by the element name.
+    """
+    # (element name, key of its text) of the open elements
+    elements: List[Tuple[str, str]] = []
+    for match in _XML_TOKEN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'text' or kind == 'cdata':
+            if elements:
+                value = match.group(kind)
+                stripped = value.strip()
+                if stripped:
+                    yield match.start(kind) + value.index(stripped[0]), elements[-1][1], stripped
+        elif kind == 'close':
+            name = match.group('close')
+            for depth in range(len(elements) - 1, -1, -1):
+                if elements[depth][0] == name:
+                    del elements[depth:]
+                    break
+        elif match.group('open') is not None:
+            name = match.group('open')
+            base = match.start('attributes')
+            attributes = {}
+            for attribute in _XML_ATTRIBUTE.finditer(match.group('attributes')):
+                group = 2 if attribute.group(2) is not None else 3
+                attributes[attribute.group(1)] = (base + attribute.start(group), attribute.group(group))
+            named = next((attributes[attribute][1] for attribute in _XML_NAME_ATTRIBUTES
+                          if attribute in attributes), None)
+            for attribute, (offset, value) in attributes.items():
+                if named is not None and attribute in _XML_NAME_ATTRIBUTES:
+                    continue
+                yield offset, named if named is not None and attribute == 'value' else attribute, value
+            if not match.group('empty'):
+                elements.append((name, named if named is not None else name))
+
+
+class StructuredFormat:
+    """A configuration file format and the walker over its key/value pairs."""
+
+    def __init__(self, name: str, walk: Callable[[str], Iterator[KeyValue]]):
+        self.name = name
+        self.id = f'structured:{name}'
+        self.walk = walk
+        self.file_patterns: List[str] = STRUCTURED_FILE_PATTERNS[name]
+        # Shown in place of a regex in the scan profile
+        self.pattern = ' '.join(self.file_patterns)
+
+    def __repr__(self) -> str:
+        return f"StructuredFormat({self.name!r})"
+
+
+FORMATS: Dict[str, StructuredFormat] = {
+    file_format.name: file_format for file_format in (
+        StructuredFormat('json', walk_json),
+        StructuredFormat('yaml', walk_yaml),
+        StructuredFormat('env', walk_env),
+        StructuredFormat('properties', walk_properties),
+        StructuredFormat('xml', walk_xml),
+    )
+}
+
+
+# Line scans look the format up for every line, so it is remembered by path
+@functools.lru_cache(maxsize=4096)
+def structured_format(file_path: str) -> Optional[StructuredFormat]:
+    """Return the format of a configuration file by its name, or None for other files."""
+    name = os.path.basename(file_path).lower()
+    for file_format in FORMATS.values():
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in file_format.file_patterns):
+            return file_format
+    return None
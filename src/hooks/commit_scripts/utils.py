@@ -1,12 +1,22 @@
 """Utility functions for secret scanning."""
 
 import os
-import math
+import re
+import sys
+import json
+import codecs
+import shutil
 import logging
 import subprocess
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 
+from .config import SCAN_CACHE_DIR, GIT_HEALTH_CACHE_FILE
+from .entropy import shannon_entropy
+from .reader import decode_text
+
+_HUNK_HEADER = re.compile(rb'@@ -\d+(?:,\d+)? \+(\d+)')
+
 
 def setup_logging(log_file: str) -> None:
     """Set up logging configuration."""
@@ -21,11 +31,7 @@ def setup_logging(log_file: str) -> None:
 
 def calculate_entropy(text: str) -> float:
     """Calculate Shannon entropy for a given text."""
-    if not text:
-        return 0
-    frequency = {char: text.count(char) for char in set(text)}
-    length = len(text)
-    return -sum((count / length) * math.log2(count / length) for count in frequency.values())
+    return shannon_entropy(text)
 
 def get_git_metadata() -> Dict[str, str]:
     """Retrieve Git metadata like author, branch, commit hash, and timestamp."""
@@ -64,6 +70,67 @@ def is_git_repo() -> bool:
     except subprocess.CalledProcessError:
         return False
 
+def _git_health_key() -> Optional[List[List]]:
+    """Identify the git executable and global config files by path, mtime and size."""
+    git = shutil.which('git')
+    if git is None:
+        return None
+    config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    paths = [
+        git,
+        os.environ.get('GIT_CONFIG_GLOBAL') or os.path.expanduser('~/.gitconfig'),
+        os.path.join(config_home, 'git', 'config'),
+    ]
+    key = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            key.append([path, stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            key.append([path, None, None])
+    return key
+
+def get_global_identity() -> Tuple[str, str]:
+    """Return the global user.name and user.email settings.
+    
+    Both are read with one git call. A complete identity is cached and reused
+    until the git executable or the global config files change. Raises
+    FileNotFoundError if git is not installed and CalledProcessError if
+    git fails.
+    """
+    key = _git_health_key()
+    if key is None:
+        raise FileNotFoundError("git executable not found")
+    cache_path = os.path.join(os.path.expanduser(SCAN_CACHE_DIR), GIT_HEALTH_CACHE_FILE)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('key') == key:
+            return cached['name'], cached['email']
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    
+    cmd = ['git', 'config', '--global', '--get-regexp', r'^user\.(name|email)$']
+    result = subprocess.run(cmd, capture_output=True)
+    # Exit status 1 means neither setting exists
+    if result.returncode not in (0, 1):
+        raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+    values = {}
+    for line in result.stdout.decode('utf-8', errors='replace').splitlines():
+        name, _, value = line.partition(' ')
+        values[name] = value.strip()
+    username, email = values.get('user.name', ''), values.get('user.email', '')
+    
+    if username and email:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'name': username, 'email': email}, f)
+            os.replace(cache_path + '.tmp', cache_path)
+        except OSError as e:
+            logging.debug(f"Could not cache git health check: {e}")
+    return username, email
+
 def has_unstaged_changes() -> bool:
     """Check if there are unstaged changes in Git."""
     diff_output = subprocess.run(
@@ -103,6 +170,161 @@ def get_git_diff() -> Dict[str, List[Tuple[int, str]]]:
 
     return file_changes
 
+def _unquote_diff_path(path: bytes) -> str:
+    """Decode a path from a diff header, undoing git's C-style quoting."""
+    if path.startswith(b'"') and path.endswith(b'"'):
+        path = codecs.escape_decode(path[1:-1])[0]
+    return path.decode('utf-8', errors='surrogateescape')
+
+# Options that make patch output parseable regardless of the user's config
+DIFF_PATCH_ARGS = ['-p', '--unified=0', '--no-color', '--no-ext-diff',
+                   '--src-prefix=a/', '--dst-prefix=b/']
+
+def parse_added_lines(patch: Iterable[bytes]) -> Iterator[Tuple[str, int, str]]:
+    """Yield (file path, line number, content) for every added line of a patch.
+    
+    ``patch`` yields the lines of ``git diff -p --unified=0`` output as bytes,
+    so the patch can be parsed while git is still writing it.
+    """
+    current_file = None
+    in_header = False
+    line_number = 0
+    for raw in patch:
+        if raw.startswith(b'diff --git '):
+            current_file = None
+            in_header = True
+        elif in_header and raw.startswith(b'+++ '):
+            # Deleted files have no new path and add no lines; git ends
+            # unquoted paths with spaces with a tab
+            path = raw[4:].rstrip(b'\n')
+            if path.endswith(b'\t'):
+                path = path[:-1]
+            current_file = _unquote_diff_path(path)[2:] if path != b'/dev/null' else None
+        elif raw.startswith(b'@@ '):
+            # Format: "@@ -old_start,old_count +new_start,new_count @@"
+            in_header = False
+            match = _HUNK_HEADER.match(raw)
+            line_number = int(match.group(1)) - 1 if match else 0
+        elif not in_header and current_file and raw.startswith(b'+'):
+            line_number += 1
+            content = raw[1:].rstrip(b'\n')
+            if content.endswith(b'\r'):
+                content = content[:-1]
+            yield current_file, line_number, decode_text(content)
+
+def iter_added_lines(diff_args: List[str]) -> Iterator[Tuple[str, int, str]]:
+    """Stream (file path, line number, content) for every line a git diff adds.
+    
+    The diff is read from git's output as it is produced, so lines can be
+    scanned before git finishes and memory use does not grow with the size
+    of the diff. ``diff_args`` select what is compared, e.g. ``['--cached']``.
+    Raises CalledProcessError if git fails.
+    """
+    cmd = ['git', '-c', 'core.quotePath=false', 'diff', *diff_args, *DIFF_PATCH_ARGS]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+        yield from parse_added_lines(proc.stdout)
+        proc.stdout.close()
+        if proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+def _git_z(args: List[str]) -> List[str]:
+    """Run a git command with NUL-separated output and return its entries."""
+    output = subprocess.run(['git'] + args, capture_output=True, check=True).stdout
+    return [entry for entry in output.decode('utf-8', errors='surrogateescape').split('\0') if entry]
+
+def git_path_key(path: str) -> bytes:
+    """Sort key that orders paths the way git lists them."""
+    return path.encode('utf-8', errors='surrogateescape')
+
+def get_git_dir() -> str:
+    """Return the absolute path of the repository's .git directory."""
+    return subprocess.run(
+        ['git', 'rev-parse', '--absolute-git-dir'],
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+def get_head_commit() -> Optional[str]:
+    """Return the SHA of HEAD, or None if there are no commits yet."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--verify', '-q', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+def get_tracked_files(paths: Optional[List[str]] = None) -> List[str]:
+    """List tracked files, optionally restricted to the given paths."""
+    if paths is None:
+        return _git_z(['ls-files', '-z'])
+    if not paths:
+        return []
+    return _git_z(['--literal-pathspecs', 'ls-files', '-z', '--'] + paths)
+
+def get_changed_paths(base: str, head: str = 'HEAD') -> Optional[Set[str]]:
+    """Return every path added, modified, renamed or deleted between two commits.
+    
+    Both sides of a rename or copy are included. Returns None if the commits
+    cannot be compared, e.g. because ``base`` no longer exists.
+    """
+    try:
+        entries = _git_z(['diff', '--name-status', '-z', '-M', base, head])
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    changed: Set[str] = set()
+    entries_iter = iter(entries)
+    for status in entries_iter:
+        # Renames and copies ("R100", "C75") are followed by two paths
+        changed.add(next(entries_iter, ''))
+        if status[0] in 'RC':
+            changed.add(next(entries_iter, ''))
+    changed.discard('')
+    return changed
+
+def get_dirty_paths() -> Set[str]:
+    """Return tracked paths whose index or working tree copy differs from HEAD."""
+    try:
+        entries = _git_z(['status', '--porcelain', '-z', '--untracked-files=no'])
+    except (subprocess.CalledProcessError, OSError):
+        return set()
+    dirty: Set[str] = set()
+    original_follows = False
+    for entry in entries:
+        if original_follows:
+            # Original path of a rename or copy
+            dirty.add(entry)
+            original_follows = False
+            continue
+        # Format: "XY path", followed by the original path for renames
+        dirty.add(entry[3:])
+        original_follows = 'R' in entry[:2] or 'C' in entry[:2]
+    return dirty
+
+def get_index_blobs(paths: Optional[List[str]] = None) -> Dict[str, str]:
+    """Map tracked files to their index blob SHA, skipping files modified since.
+    
+    Only regular files whose working tree copy matches the index are included,
+    so the blob SHA identifies exactly the content that would be scanned.
+    """
+    if paths is not None and not paths:
+        return {}
+    pathspec = [] if paths is None else ['--'] + paths
+    prefix = [] if paths is None else ['--literal-pathspecs']
+    try:
+        staged = _git_z(prefix + ['ls-files', '-s', '-z'] + pathspec)
+        modified_files = set(_git_z(prefix + ['ls-files', '-m', '-z'] + pathspec))
+    except (subprocess.CalledProcessError, OSError):
+        return {}
+
+    blobs: Dict[str, str] = {}
+    for entry in staged:
+        # Format: "<mode> <sha> <stage>\t<path>"
+        info, _, path = entry.partition('\t')
+        mode, sha, stage = info.split(' ')
+        if stage == '0' and mode in ('100644', '100755') and path not in modified_files:
+            blobs[path] = sha
+    return blobs
+
 def mask_secret(secret: str, visible_chars: int = 3) -> str:
     """Mask a secret string, showing only the first and last few characters."""
     if not secret:
@@ -110,4 +332,14 @@ def mask_secret(secret: str, visible_chars: int = 3) -> str:
     secret = str(secret)
     if len(secret) <= visible_chars * 2:
         return secret
-    return f"{secret[:visible_chars]}{'*' * (len(secret) - visible_chars * 2)}{secret[-visible_chars:]}" 
\ No newline at end of file
+    return f"{secret[:visible_chars]}{'*' * (len(secret) - visible_chars * 2)}{secret[-visible_chars:]}" 
+
+def warn_skipped_rules(skipped_rules: List[str]) -> None:
+    """Tell the user which detection rules a scan skipped, on stderr and in the log."""
+    if not skipped_rules:
+        return
+    logging.warning(f"Secret scan skipped {len(skipped_rules)} detection rules")
+    print("Warning: the secret scan skipped these detection rules, which ran over their time "
+          "budget; secrets they detect may have been missed:", file=sys.stderr)
+    for rule in skipped_rules:
+        print(f"  - {rule}", file=sys.stderr)
@@ -9,7 +9,10 @@ from pathlib import Path
 import logging
 import time
 
+from commit_scripts import daemon_client
+from commit_scripts.finding import FINDING_FORMAT_VERSION, load_findings
 from commit_scripts.secretscan import SecretScanner, generate_html_report
+from commit_scripts.utils import warn_skipped_rules
 
 # Configure logging
 logging.basicConfig(
@@ -146,58 +149,52 @@ def main():
         # Create reports directory if it doesn't exist
         reports_dir.mkdir(exist_ok=True)
         
-        # Initialize scanner
-        logging.info("Initializing SecretScanner")
-        scanner = SecretScanner()
-        
         # Read diff scan metadata if it exists
         diff_secrets = []
         validation_results = {}
+        # Detection rules the diff and repository scans skipped
+        skipped_rules = []
         
         if metadata_file.exists():
             try:
                 logging.info("Reading metadata from pre-commit hook")
                 with open(metadata_file, 'r', encoding='utf-8') as f:
                     metadata = json.load(f)
-                    diff_secrets = metadata.get('secrets_found', [])
+                    if metadata.get('findings_format', FINDING_FORMAT_VERSION) == FINDING_FORMAT_VERSION:
+                        diff_secrets = load_findings(metadata.get('secrets_found', []))
+                    else:
+                        logging.warning("Metadata findings were written by another hook version, ignoring them")
                     validation_results = metadata.get('validation_results', {})
+                    skipped_rules = list(metadata.get('skipped_rules', []))
                     logging.info(f"Found {len(diff_secrets)} secrets from staged changes")
                     
                 # Ensure validation messages are in commit message
                 if validation_results:
                     logging.info("Checking if validation messages need to be added to commit")
                     amend_commit_with_messages(validation_results)
-            except json.JSONDecodeError as e:
+            except (ValueError, TypeError) as e:
                 logging.error(f"Error parsing metadata file: {e}")
         else:
             logging.info("No metadata file found from pre-commit hook")
         
-        # Perform repository scan
-        logging.info("Scanning entire repository for secrets")
-        repo_secrets = scanner.scan_repository()
+        # Perform repository scan, carrying forward results for files the
+        # commit did not touch ('git scan-repo' always rescans everything)
+        logging.info("Scanning repository for secrets")
+        result = daemon_client.request('repository', incremental=True)
+        if result is not None:
+            repo_secrets = load_findings(result['findings'])
+            repo_skipped = result.get('skipped_rules', [])
+        else:
+            logging.info("Initializing SecretScanner")
+            scanner = SecretScanner()
+            repo_secrets = scanner.scan_repository(incremental=True)
+            repo_skipped = scanner.ruleset.describe_quarantined()
         logging.info(f"Found {len(repo_secrets)} secrets in repository scan")
+        warn_skipped_rules(repo_skipped)
+        skipped_rules = list(dict.fromkeys(skipped_rules + repo_skipped))
         
-        # Deduplicate secrets between diff and repo scans
-        already_seen = set()
-        unique_diff_secrets = []
-        
-        for secret in diff_secrets:
-            key = (secret.get('file_path', ''), secret.get('line_number', ''))
-            if key not in already_seen:
-                already_seen.add(key)
-                unique_diff_secrets.append(secret)
-        
-        # For repository scan view, include all secrets (diff + repo)
-        all_secrets_for_repo_view = unique_diff_secrets.copy()
-        
-        # Add repo secrets that aren't already in the diff scan
-        for secret in repo_secrets:
-            key = (secret.get('file_path', ''), secret.get('line_number', ''))
-            if key not in already_seen:
-                already_seen.add(key)
-                all_secrets_for_repo_view.append(secret)
-        
-        diff_secrets = unique_diff_secrets
+        # The report drops findings repeated between the diff and repo scans
+        # while it streams them, so no merged copy is built here
         
         # Generate HTML report with both scan results
         output_path = reports_dir / "scan-report.html"
@@ -208,132 +205,14 @@ def main():
             success = generate_html_report(
                 str(output_path),
                 diff_secrets=diff_secrets,
-                repo_secrets=all_secrets_for_repo_view,
-                has_secrets=bool(diff_secrets) or bool(all_secrets_for_repo_view)
+                repo_secrets=repo_secrets,
+                has_secrets=bool(diff_secrets) or bool(repo_secrets),
+                skipped_rules=skipped_rules
             )
             
             if not success:
                 logging.error("HTML report generation failed")
                 
-                # If HTML generation failed, create a simple HTML report as backup
-                simple_html = f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>Secret Scan Report</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; }}
-        h1, h2 {{ color: #333366; }}
-        .header {{ display: flex; justify-content: space-between; align-items: center; }}
-        .btn {{ 
-            background-color: #333366; 
-            color: white; 
-            border: none; 
-            padding: 10px 20px; 
-            border-radius: 5px; 
-            cursor: pointer;
-            font-size: 16px;
-            display: inline-flex;
-            align-items: center;
-        }}
-        .btn:hover {{ background-color: #252550; }}
-        .icon {{ margin-right: 8px; }}
-        table {{ border-collapse: collapse; width: 100%; margin-bottom: 30px; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-        th {{ background-color: #f2f2f2; }}
-        tr:nth-child(even) {{ background-color: #f9f9f9; }}
-        .tab-container {{ margin-top: 20px; }}
-        .tab-buttons {{ display: flex; gap: 10px; margin-bottom: 20px; }}
-        .tab-button {{ 
-            padding: 10px 20px; 
-            background-color: #f0f0f0; 
-            border: none; 
-            border-radius: 5px; 
-            cursor: pointer;
-        }}
-        .tab-button.active {{ background-color: #333366; color: white; }}
-        .tab-content {{ display: none; }}
-        .tab-content.active {{ display: block; }}
-    </style>
-</head>
-<body>
-    <div id="reportContainer">
-        <div class="header">
-            <h1>Secret Scan Report</h1>
-            <button onclick="window.print()" class="btn">
-                <span class="icon">📥</span> Save as PDF
-            </button>
-        </div>
-        
-        <div class="tab-container">
-            <div class="tab-buttons">
-                <button class="tab-button active" id="diffBtn">Staged Changes</button>
-                <button class="tab-button" id="repoBtn">Repository Scan</button>
-            </div>
-            
-            <div id="diff-scan" class="tab-content active">
-                <h2>Staged Changes - Secrets Found: {len(diff_secrets)}</h2>
-                <table>
-                    <tr>
-                        <th>File</th>
-                        <th>Line</th>
-                        <th>Content</th>
-                    </tr>
-                    {''.join(f"<tr><td>{s.get('file_path', '')}</td><td>{s.get('line_number', '')}</td><td><pre>{s.get('line', '')}</pre></td></tr>" for s in diff_secrets) or "<tr><td colspan='3'>No secrets found in staged changes</td></tr>"}
-                </table>
-            </div>
-            
-            <div id="repo-scan" class="tab-content">
-                <h2>Repository Scan - Secrets Found: {len(all_secrets_for_repo_view)}</h2>
-                <table>
-                    <tr>
-                        <th>File</th>
-                        <th>Line</th>
-                        <th>Content</th>
-                    </tr>
-                    {''.join(f"<tr><td>{s.get('file_path', '')}</td><td>{s.get('line_number', '')}</td><td><pre>{s.get('line', '')}</pre></td></tr>" for s in all_secrets_for_repo_view) or "<tr><td colspan='3'>No secrets found in repository scan</td></tr>"}
-                </table>
-            </div>
-        </div>
-    </div>
-    
-    <script>
-    // Simple tab switching
-    document.getElementById('diffBtn').addEventListener('click', function() {{
-        document.getElementById('diff-scan').classList.add('active');
-        document.getElementById('repo-scan').classList.remove('active');
-        document.getElementById('diffBtn').classList.add('active');
-        document.getElementById('repoBtn').classList.remove('active');
-    }});
-    
-    document.getElementById('repoBtn').addEventListener('click', function() {{
-        document.getElementById('repo-scan').classList.add('active');
-        document.getElementById('diff-scan').classList.remove('active');
-        document.getElementById('repoBtn').classList.add('active');
-        document.getElementById('diffBtn').classList.remove('active');
-    }});
-    
-    // Print setup - show both tabs when printing
-    window.onbeforeprint = function() {{
-        // Show both tabs for printing
-        document.getElementById('diff-scan').style.display = 'block';
-        document.getElementById('repo-scan').style.display = 'block';
-    }};
-    
-    window.onafterprint = function() {{
-        // Restore tab visibility after printing
-        document.getElementById('diff-scan').style.display = document.getElementById('diffBtn').classList.contains('active') ? 'block' : 'none';
-        document.getElementById('repo-scan').style.display = document.getElementById('repoBtn').classList.contains('active') ? 'block' : 'none';
-    }};
-    </script>
-</body>
-</html>
-"""
-                # Write the simple HTML report
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(simple_html)
-                logging.info("Generated simple HTML report as fallback")
-                success = True
-                
         except Exception as e:
             logging.error(f"Error generating HTML report: {e}", exc_info=True)
             success = False
@@ -4,58 +4,33 @@
 import os
 import sys
 import json
+import time
 import webbrowser
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, messagebox
 import subprocess
-import platform
 
 # Add the hooks directory to Python path
 SCRIPT_DIR = Path(__file__).parent
 sys.path.append(str(SCRIPT_DIR))
 
-from commit_scripts.secretscan import SecretScanner, generate_html_report
+from commit_scripts.secretscan import SecretScanner, generate_html_report, build_arg_parser, write_profile
+from commit_scripts.profiling import DEFAULT_PROFILE_PATH
+from commit_scripts.memory import configure as configure_memory
+from commit_scripts.cache import ScanCache
+from commit_scripts.utils import get_index_blobs, get_tracked_files, warn_skipped_rules
+from commit_scripts.filetypes import classify_files, TEXT, BINARY
 
 def is_binary_file(file_path):
-    """Check if a file is binary using git check-attr."""
-    try:
-        # Use forward slashes for Git commands even on Windows
-        git_path = str(file_path).replace('\\', '/')
-        result = subprocess.run(
-            ['git', 'check-attr', '-z', 'text', git_path],
-            capture_output=True,
-            text=True
-        )
-        # If the file is marked as text, it's not binary
-        return 'text: unset' in result.stdout
-    except subprocess.CalledProcessError:
-        # If git check-attr fails, try using file command
-        try:
-            # On Windows, use 'file' command from Git Bash if available
-            if platform.system() == 'Windows':
-                file_cmd = ['file', '--mime-type', str(file_path)]
-            else:
-                file_cmd = ['file', '--mime-type', str(file_path)]
-                
-            result = subprocess.run(
-                file_cmd,
-                capture_output=True,
-                text=True
-            )
-            # Skip files that are not text/plain
-            return not result.stdout.strip().endswith('text/plain')
-        except subprocess.CalledProcessError:
-            # If both checks fail, assume it's binary to be safe
-            return True
+    """Check if a file is binary using its git attributes or content."""
+    return classify_files([str(file_path)]).get(str(file_path)) != TEXT
 
 def get_all_files():
     """Get all files in the repository."""
     try:
-        result = subprocess.run(['git', 'ls-files'],
-                              check=True, capture_output=True, text=True)
-        return result.stdout.strip().split('\n')
-    except subprocess.CalledProcessError:
+        return get_tracked_files()
+    except (subprocess.CalledProcessError, OSError):
         return []
 
 def check_disallowed_files(files):
@@ -70,23 +45,23 @@ def check_disallowed_files(files):
             disallowed_files.append(file)
     return disallowed_files
 
-def scan_repository():
+def scan_repository(jobs=None, use_cache=True, scanner=None):
     """Scan the entire repository for secrets."""
-    scanner = SecretScanner()
+    scanner = scanner or SecretScanner()
     all_files = get_all_files()
-    all_results = []
-    skipped_files = []
     
-    for file in all_files:
-        try:
-            if is_binary_file(file):
-                skipped_files.append(file)
-                continue
-                
-            results = scanner.scan_file(file)
-            all_results.extend(results)
-        except Exception as e:
-            print(f"Warning: Error scanning file {file}: {str(e)}", file=sys.stderr)
+    # Classify every file up front with a single git call
+    classes = classify_files(all_files)
+    text_files = [file for file in all_files if classes.get(file) == TEXT]
+    skipped_files = [file for file in all_files if classes.get(file) == BINARY]
+    
+    with scanner.memory.phase('repository scan'):
+        cache = ScanCache.for_repository(scanner.ruleset.version) if use_cache else None
+        blob_shas = get_index_blobs() if cache is not None else {}
+        all_results = scanner.scan_files(text_files, jobs=jobs, blob_shas=blob_shas, cache=cache)
+        if cache is not None:
+            cache.log_stats()
+            cache.close()
     
     if skipped_files:
         print(f"\nSkipped {len(skipped_files)} binary files:", file=sys.stderr)
@@ -96,6 +71,7 @@ def scan_repository():
     return all_results
 
 def main():
+    args, _ = build_arg_parser().parse_known_args()
     try:
         # Create reports directory if it doesn't exist
         reports_dir = SCRIPT_DIR / ".commit-reports"
@@ -106,7 +82,19 @@ def main():
         disallowed_files = check_disallowed_files(all_files)
         
         # Scan repository for secrets
-        secrets_data = scan_repository()
+        configure_memory(args.memory_limit, args.trace_memory)
+        scanner = SecretScanner()
+        if args.profile:
+            scanner.enable_profiling()
+        start = time.perf_counter()
+        secrets_data = scan_repository(jobs=args.jobs, use_cache=args.use_cache, scanner=scanner)
+        skipped_rules = scanner.ruleset.describe_quarantined()
+        warn_skipped_rules(skipped_rules)
+        if args.profile:
+            # The default profile goes next to the report rather than into the work tree
+            profile_path = reports_dir / DEFAULT_PROFILE_PATH if args.profile == DEFAULT_PROFILE_PATH else args.profile
+            write_profile(scanner, str(profile_path), args.profile_top,
+                          time.perf_counter() - start, len(secrets_data))
         
         # Generate HTML report
         output_path = reports_dir / "repository-scan-report.html"
@@ -116,7 +104,8 @@ def main():
             has_secrets=bool(secrets_data),
             secrets_list=secrets_data,
             has_disallowed_files=bool(disallowed_files),
-            disallowed_files=disallowed_files
+            disallowed_files=disallowed_files,
+            skipped_rules=skipped_rules
         )
         
         # Open HTML report in default browser if issues found
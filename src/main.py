@@ -698,26 +698,16 @@ Categories=Utility;Development;
             if not hooks_source.exists():
                 raise FileNotFoundError(f"Hooks source directory not found: {hooks_source}")
             
-            # Copy hook files
+            # Install the hook files and commit_scripts, copying only files whose
+            # content changed since the last install, and precompile them for
+            # the Python interpreter the hooks run with
+            from hooks.commit_scripts.bundle import sync_bundle
             hook_files = ['pre-commit', 'post-commit', 'scan-repo', 'pre_commit.py', 'post_commit.py', 'scan_repo.py']
-            for hook_file in hook_files:
-                source_file = hooks_source / hook_file
-                target_file = Path(hooks_dir) / hook_file
-                
-                if source_file.exists():
-                    shutil.copy2(str(source_file), str(target_file))
-                    # Make the file executable
-                    os.chmod(str(target_file), 0o755)
-                    logging.info(f"Copied hook file: {source_file} -> {target_file}")
-                else:
-                    raise FileNotFoundError(f"Hook file not found: {source_file}")
-            
-            # Copy commit_scripts directory if it exists
-            commit_scripts_dir = hooks_source / 'commit_scripts'
-            if commit_scripts_dir.exists():
-                target_scripts_dir = Path(hooks_dir) / 'commit_scripts'
-                shutil.copytree(str(commit_scripts_dir), str(target_scripts_dir), dirs_exist_ok=True)
-                logging.info(f"Copied commit_scripts directory: {commit_scripts_dir} -> {target_scripts_dir}")
+            stats = sync_bundle(hooks_source, hooks_dir, hook_files)
+            logging.info(f"Synced hook bundle: {stats['copied']} files copied, "
+                         f"{stats['unchanged']} unchanged, {stats['removed']} removed")
+            if not stats['compiled']:
+                logging.warning("Could not precompile the hooks; they will compile on first use")
             
             # Set up Git configuration
             try:
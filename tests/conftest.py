@@ -0,0 +1,46 @@
+"""Shared fixtures for the scanner tests.
+
+Run with ``python -m pytest tests`` from the repository root.
+"""
+
+import os
+import sys
+import subprocess
+from typing import Callable, Dict
+
+import pytest
+
+HOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'hooks')
+sys.path.insert(0, HOOKS_DIR)
+
+
+def git(*args: str) -> str:
+    """Run git in the current directory and return its output."""
+    return subprocess.run(['git', *args], check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def git_repo(tmp_path, monkeypatch) -> Callable[[Dict[str, str]], str]:
+    """Create a repository in a temporary directory and make it the working directory.
+
+    The fixture returns a function that writes files, given as {path: text},
+    and commits them, returning the new HEAD.
+    """
+    monkeypatch.chdir(tmp_path)
+    # Keep the user's git configuration and the cache fallback out of the tests
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setenv('GIT_CONFIG_NOSYSTEM', '1')
+    git('init', '-q')
+    git('config', 'user.name', 'Test')
+    git('config', 'user.email', 'test@example.com')
+
+    def commit(files: Dict[str, str]) -> str:
+        for path, text in files.items():
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        git('add', '--', *files)
+        git('commit', '-q', '-m', 'Update')
+        return git('rev-parse', 'HEAD').strip()
+
+    return commit
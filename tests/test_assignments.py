@@ -0,0 +1,80 @@
+"""Tests for the assignment tokenizer against the patterns it replaced."""
+
+import re
+
+import pytest
+
+from commit_scripts.assignments import find_assignments
+from commit_scripts.rules import RuleSet
+from commit_scripts.secretscan import SecretScanner
+
+# The variable patterns the tokenizer replaced
+OLD_VARIABLE_PATTERNS = [
+    r'(?i)(?:const|let|var|private|public|protected)?\s*(\w+)\s*[=:]\s*["\']([^"\']+)["\']',
+    r'(?i)(\w+)\s*[=:]\s*["\']([^"\']+)["\']',
+    r'(?i)(\w+)\s*=\s*"""([^"]*)"""',  # Python multi-line strings
+    r'(?i)(\w+)\s*=\s*`([^`]*)`',      # Template literals
+]
+
+# Lines the old patterns found secrets on
+OLD_FORMS = [
+    'api_key = "sk9Xq2LmN4vXp7TkW9bYc3HdF"',
+    "const apiToken = 'q8Zr2LmN4vXp7TkW9bYc3HdF';",
+    'let secretKey = "Hn3kPz8QwR5tYv2XcB7mLj4D"',
+    'private String password = "Xy7pQ2mK9vL4wQ8r";',
+    'db_password: "Zq4Lm8Nv2Xp7Tk9W"',
+    'AUTH_TOKEN="Pz8QwR5tYv2XcB7mLj4DHn3k"',
+    'client_secret = """Tk9Wq8Zr2LmN4vXp7bYc3HdF"""',
+    'private_key = `Mn4vXp7TkW9bYc3HdFq8Zr2L`',
+    'connect(password="Qv2Xp7Tk9WZq4Lm8")',
+]
+# Lines only the tokenizer finds secrets on
+NEW_FORMS = [
+    'token := "Wq8Zr2LmN4vXp7TkW9bYc3Hd"',
+    'password: str = "Lm8Nv2Xp7Tk9WZq4"',
+    '"apiKey": "Yc3HdFq8Zr2LmN4vXp7TkW9b",',
+    "{'auth_token': 'Rr5tYv2XcB7mLj4DHn3kPz8Q'}",
+]
+# Lines neither finds a secret on
+NO_SECRETS = [
+    'username = "alice"',
+    'api_key = "changeme"',
+    'password = ""',
+]
+
+
+def scan(tmp_path, ruleset, lines):
+    path = tmp_path / 'settings.py'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    scanner = SecretScanner(ruleset=ruleset)
+    scanner.scan_file(str(path))
+    return {(finding.line_number, finding.variable_name, finding.matched_content)
+            for finding in scanner.found_secrets}
+
+
+def test_findings_match_the_old_patterns(tmp_path):
+    lines = OLD_FORMS + NEW_FORMS + NO_SECRETS
+    old = scan(tmp_path, RuleSet(variable_patterns=OLD_VARIABLE_PATTERNS), lines)
+    new = scan(tmp_path, RuleSet(), lines)
+
+    assert sorted(line for line, _, _ in old) == list(range(1, len(OLD_FORMS) + 1))
+    assert old <= new
+    assert sorted(line for line, _, _ in new - old) == \
+        list(range(len(OLD_FORMS) + 1, len(OLD_FORMS) + len(NEW_FORMS) + 1))
+
+
+@pytest.mark.parametrize('line', OLD_FORMS)
+def test_tokenizer_finds_the_pairs_of_the_old_patterns(line):
+    old = {match.groups() for pattern in OLD_VARIABLE_PATTERNS for match in re.finditer(pattern, line)}
+    assert old <= set(find_assignments(line))
+
+
+@pytest.mark.parametrize('line, pairs', [
+    # Literals end at their own closing quote, not at any quote
+    ('''ssh_pass = "it's-Zq4Lm8Nv2Xp7Tk9W"''', [('ssh_pass', "it's-Zq4Lm8Nv2Xp7Tk9W")]),
+    (r'token = "a \"quoted\" word"', [('token', r'a \"quoted\" word')]),
+    ('a = "x", b = \'y\'', [('a', 'x'), ('b', 'y')]),
+    ("""secret = '''abc'''""", [('secret', 'abc')]),
+])
+def test_tokenizer_reads_literals_whole(line, pairs):
+    assert find_assignments(line) == pairs
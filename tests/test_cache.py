@@ -0,0 +1,74 @@
+"""Tests for the scan result cache and its keys."""
+
+import os
+import sqlite3
+
+from commit_scripts.cache import ScanCache
+from commit_scripts.secretscan import SecretScanner
+from commit_scripts.snapshot import ScanSnapshot
+
+SECRET_LINE = 'var password = "Sup3rS3cr3tV4lue!";\n'
+
+
+def found(findings):
+    return sorted((finding['file_path'], finding['line_number']) for finding in findings)
+
+
+def test_same_blob_under_generated_name_is_cached_apart(git_repo):
+    # a.min.js is only scanned with the rules that need no entropy check, so
+    # the blob's result there must not be served for a.js
+    git_repo({'a.js': SECRET_LINE, 'a.min.js': SECRET_LINE})
+
+    first = SecretScanner().scan_repository(jobs=1)
+    cached = SecretScanner().scan_repository(jobs=1)
+    uncached = SecretScanner().scan_repository(jobs=1, use_cache=False)
+
+    assert found(first) == [('a.js', 1)]
+    assert found(cached) == found(first)
+    assert found(uncached) == found(first)
+
+
+def test_cache_keys_follow_routing():
+    sha = '0' * 40
+    assert SecretScanner._cache_key('src/a.js', sha) == sha
+    assert SecretScanner._cache_key('dist/a.min.js', sha) == f'{sha}:generated'
+    assert SecretScanner._cache_key('config/app.json', sha) == f'{sha}:json'
+    # Generated configuration files are not walked
+    assert SecretScanner._cache_key('package-lock.json', sha) == f'{sha}:generated'
+
+
+def test_cache_round_trip_and_version(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    candidates = [[3, 'token = "x"', [['x', 'Generic Secret', 4.2, 'pattern_match', None, None]]]]
+
+    cache = ScanCache(path, 'v1')
+    cache.put_many({'abc': candidates})
+    assert cache.get_many({'abc', 'missing'}) == {'abc': candidates}
+    cache.close()
+
+    # Another rule set version discards every entry
+    cache = ScanCache(path, 'v2')
+    assert cache.get_many({'abc'}) == {}
+    cache.close()
+
+
+def test_long_line_hit_is_stored_as_an_excerpt(git_repo):
+    # A 1 MB minified file with one token in the middle of its only line
+    token = 'ghp_' + '1a2B3c4D5e6F7g8H9i0J' * 2
+    code = ''.join(f'var a{i}=function(b){{return b+{i}}};' for i in range(30000))
+    line = code[:500000] + f'var k="{token[:40]}";' + code[500000:1000000]
+    git_repo({'app.js': line + '\n'})
+
+    first = SecretScanner().scan_repository(jobs=1, incremental=True)
+    assert [(finding.column, finding.line_length) for finding in first] == [(500007, len(line))]
+    assert len(first[0].line) < 400
+
+    snapshot_path = ScanSnapshot.default_path()
+    assert os.path.getsize(snapshot_path) < 2000
+    conn = sqlite3.connect(os.path.join(os.path.dirname(snapshot_path), 'scan-cache.sqlite3'))
+    assert conn.execute("SELECT MAX(LENGTH(candidates)) FROM blobs").fetchone()[0] < 1000
+    conn.close()
+
+    # Findings rebuilt from the cache equal those of the first scan
+    cached = SecretScanner().scan_repository(jobs=1)
+    assert [finding.to_row() for finding in cached] == [finding.to_row() for finding in first]
@@ -0,0 +1,72 @@
+"""Tests for the compact finding records."""
+
+import json
+
+from commit_scripts.config import FINDING_CONTEXT_CHARS, FINDING_MATCH_CHARS, FINDING_MAX_LINE_CHARS
+from commit_scripts.finding import FINDING_FORMAT_VERSION, Finding, dump_findings, load_findings
+from commit_scripts.secretscan import SecretScanner
+
+FIRST = 'q8Zr2LmN4vXp7TkW9bYc3HdF'
+SECOND = 'Hn3kPz8QwR5tYv2XcB7mLj4D'
+FILLER = ''.join(f'"setting{i}":"value{i}",' for i in range(200))
+# A minified configuration file with its secrets far apart on one long line,
+# after a non-ASCII value, so byte offsets differ from columns
+SETTINGS = '{"name":"Café",' + FILLER + f'"ClientSecret":"{FIRST}",' + \
+    FILLER.replace('setting', 'option') + f'"ApiSecret":"{SECOND}"}}'
+
+
+def assert_excerpt(finding, line, value):
+    start = finding.context_start
+    assert line[start:start + len(finding.line)] == finding.line
+    assert finding.line[finding.column - start:].startswith(value)
+    assert len(finding.line) <= len(value) + 2 * FINDING_CONTEXT_CHARS
+    assert finding.line_length == len(line)
+    assert finding.byte_offset == len(line[:finding.column].encode('utf-8'))
+
+
+def test_findings_on_one_long_line_keep_their_own_excerpts(git_repo):
+    git_repo({'appsettings.json': SETTINGS + '\n'})
+    findings = SecretScanner().scan_repository(jobs=1, use_cache=False)
+
+    assert [(finding.column, finding.matched_content) for finding in findings] == [
+        (SETTINGS.index(FIRST), FIRST), (SETTINGS.index(SECOND), SECOND)
+    ]
+    for finding, value in zip(findings, (FIRST, SECOND)):
+        assert finding.truncated
+        assert_excerpt(finding, SETTINGS, value)
+    assert findings[0].excerpt().startswith('…') and findings[0].excerpt().endswith('…')
+
+
+def test_from_match_keeps_short_lines_whole():
+    line = f'api_key = "{FIRST}"'
+    finding = Finding.from_match('a.py', 3, line, FIRST, 'Variable Assignment', 'api_key', 4.2, 'variable_scan')
+    assert (finding.line, finding.column, finding.context_start) == (line, line.index(FIRST), 0)
+    assert not finding.truncated and finding.excerpt() == line
+
+
+def test_from_match_cuts_long_matches_and_lines():
+    value = 'x' * (FINDING_MATCH_CHARS * 2)
+    line = 'y' * FINDING_MAX_LINE_CHARS + value + 'z' * FINDING_MAX_LINE_CHARS
+    finding = Finding.from_match('a.js', 1, line, value, 'Generic Secret', None, None, 'pattern_match')
+    assert finding.matched_content == value[:FINDING_MATCH_CHARS]
+    assert finding.match_length == len(value)
+    assert_excerpt(finding, line, value[:FINDING_MATCH_CHARS])
+
+
+def test_findings_round_trip_through_commit_metadata():
+    findings = [
+        Finding.from_match('app.json', 1, SETTINGS, FIRST, 'Variable Assignment', 'ClientSecret', 4.6,
+                           'structured_scan', SETTINGS.index(FIRST)),
+        Finding.from_match('a.py', 2, f'token = "{SECOND}"', SECOND, 'Generic Secret', None, None,
+                           'pattern_match'),
+    ]
+    # As the pre-commit hook saves them and the post-commit hook reads them
+    metadata = json.loads(json.dumps({'findings_format': FINDING_FORMAT_VERSION,
+                                      'secrets_found': dump_findings(findings)}))
+    assert metadata['findings_format'] == FINDING_FORMAT_VERSION
+    loaded = load_findings(metadata['secrets_found'])
+    assert [finding.to_row() for finding in loaded] == [finding.to_row() for finding in findings]
+    assert [finding.location() for finding in loaded] == [('app.json', 1, SETTINGS.index(FIRST)), ('a.py', 2)]
+
+    # Findings written as dictionaries, before they were rows, still load
+    assert load_findings([dict(finding) for finding in findings])[1].to_row() == findings[1].to_row()
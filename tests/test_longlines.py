@@ -0,0 +1,90 @@
+"""Tests for long-line windows and the downgrade of minified and generated files."""
+
+import pytest
+
+from commit_scripts.config import LONG_LINE_CHARS, LONG_LINE_MAX_MATCH, LONG_LINE_WINDOW_CHARS
+from commit_scripts.longlines import (
+    GENERATED_MARKER, GENERATED_NAME, LONG_LINES, MINIFIED, downgrade_reason, window_matches, window_overlap
+)
+from commit_scripts.rules import Prefilter, RuleSet
+from commit_scripts.secretscan import SecretScanner
+
+TOKEN = 'ghp_' + 'aB3dE5fG7hJ9kL2mN4pQ6rS8tU0vW1xY3zA5'
+ASSIGNMENT = 'const api_key = "sk9Xq2LmN4vXp7TkW9bYc3HdF";'
+SHORT_LINES = ''.join(f'const value{i} = {i};\n' for i in range(40))
+
+
+def token_rule(ruleset):
+    return next(rule for rule in ruleset.rules if rule.secret_type == 'GitHub Personal Access Token')
+
+
+def long_line(*placed):
+    """A line of 5 windows with each value at its offset."""
+    line = list(' ' * (LONG_LINE_WINDOW_CHARS * 5))
+    for offset, value in placed:
+        line[offset:offset + len(value)] = value
+    return ''.join(line)
+
+
+def test_windows_find_the_matches_of_the_whole_line():
+    ruleset = RuleSet()
+    # Across window boundaries, at one and just before one
+    line = long_line((LONG_LINE_WINDOW_CHARS - 10, TOKEN), (2 * LONG_LINE_WINDOW_CHARS, TOKEN),
+                     (3 * LONG_LINE_WINDOW_CHARS - 1, TOKEN), (5 * LONG_LINE_WINDOW_CHARS - 100, TOKEN))
+    assert len(line) > LONG_LINE_CHARS
+    rule = token_rule(ruleset)
+    rule_matches, _ = window_matches(line, ruleset.prefilter)
+    assert [match.group(0) for match in rule_matches[rule]] == [TOKEN] * 4
+    assert len(rule_matches[rule]) == len(rule.regex.findall(line))
+
+
+def test_window_overlap_is_the_longest_match():
+    ruleset = RuleSet()
+    assert window_overlap(Prefilter([token_rule(ruleset)], [])) == len(TOKEN)
+    # Rules without a bound on their matches reach LONG_LINE_MAX_MATCH into the next window
+    assert window_overlap(ruleset.prefilter) == LONG_LINE_MAX_MATCH
+
+
+def test_unbounded_matches_end_at_the_overlap():
+    ruleset = RuleSet(patterns=[(r'token=[^\s]{8,}', 'Token', {})], variable_patterns=[])
+    line = 'token=' + 'a' * (LONG_LINE_CHARS * 2)
+    rule_matches, _ = window_matches(line, ruleset.prefilter)
+    matches = rule_matches[ruleset.rules[0]]
+    assert [len(match.group(0)) for match in matches] == [LONG_LINE_WINDOW_CHARS + LONG_LINE_MAX_MATCH]
+
+
+@pytest.mark.parametrize('path, text, reason', [
+    ('app.js', SHORT_LINES, None),
+    ('app.min.js', SHORT_LINES, GENERATED_NAME),
+    ('api.js', '// @generated by protoc\n' + SHORT_LINES, GENERATED_MARKER),
+    ('app.js', SHORT_LINES.replace('\n', ' ') * 8, MINIFIED),
+    ('app.js', SHORT_LINES + 'x' * LONG_LINE_CHARS + '\n' + SHORT_LINES, LONG_LINES),
+], ids=['plain', 'generated name', 'generated marker', 'minified', 'long lines'])
+def test_downgrade_reason(path, text, reason):
+    assert downgrade_reason(path, text) == reason
+    assert downgrade_reason(path, text.encode('utf-8')) == reason
+
+
+@pytest.mark.parametrize('path, text, reason, types', [
+    # Long lines keep every rule
+    ('app.js', SHORT_LINES + long_line((3000, ASSIGNMENT)) + '\n' + long_line((3000, TOKEN)) + '\n', LONG_LINES,
+     ['Variable Assignment', 'GitHub Personal Access Token']),
+    # Minified and generated files are only checked with the rules that need no entropy check
+    ('app.js', (SHORT_LINES.replace('\n', ' ') + ASSIGNMENT + ' ' + TOKEN + ' ') * 8, MINIFIED,
+     ['GitHub Personal Access Token']),
+    ('app.min.js', f'{ASSIGNMENT}\nconst t = "{TOKEN}";\n', GENERATED_NAME, ['GitHub Personal Access Token']),
+], ids=['long lines', 'minified', 'generated'])
+def test_downgraded_files_use_the_reduced_rules(git_repo, path, text, reason, types):
+    git_repo({path: text})
+    scanner = SecretScanner()
+    findings = scanner.scan_repository(jobs=1, use_cache=False)
+    assert scanner.downgrades == {path: reason}
+    assert sorted({finding.type for finding in findings}) == sorted(types)
+
+
+def test_line_scan_of_a_generated_file_uses_the_reduced_rules():
+    scanner = SecretScanner()
+    scanner.scan_line('dist/app.min.js', 1, ASSIGNMENT)
+    scanner.scan_line('dist/app.min.js', 2, f'const t = "{TOKEN}";')
+    assert [finding.type for finding in scanner.found_secrets] == ['GitHub Personal Access Token']
+    assert scanner.downgrades == {'dist/app.min.js': GENERATED_NAME}
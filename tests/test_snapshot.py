@@ -0,0 +1,51 @@
+"""Tests for incremental repository scans from a snapshot."""
+
+from conftest import git
+
+from commit_scripts.secretscan import SecretScanner
+from commit_scripts.snapshot import ScanSnapshot
+
+SECRETS = {
+    'app.py': 'api_key = "sk9Xq2LmN4vXp7TkW9bYc3HdF"\n',
+    'web/client.js': "const apiToken = 'q8Zr2LmN4vXp7TkW9bYc3HdF';\n",
+    'config/settings.json': '{"Auth": {"ClientSecret": "Hn3kPz8QwR5tYv2XcB7mLj4D"}}\n',
+    'notes.txt': 'nothing to see\n',
+}
+
+
+def found(findings):
+    return sorted((finding.file_path, finding.line_number, finding.column, finding.matched_content)
+                  for finding in findings)
+
+
+def assert_incremental_equals_full():
+    incremental = SecretScanner().scan_repository(jobs=1, incremental=True)
+    full = SecretScanner().scan_repository(jobs=1, use_cache=False)
+    assert found(incremental) == found(full)
+    return incremental
+
+
+def test_incremental_scan_equals_full_scan(git_repo):
+    git_repo(SECRETS)
+    assert len(assert_incremental_equals_full()) == 3
+    snapshot = ScanSnapshot.load(ScanSnapshot.default_path(), SecretScanner().ruleset.version)
+    assert snapshot is not None and snapshot.incremental_runs == 0
+
+    # Change, add, rename and delete files in one commit
+    git('rm', '-q', 'web/client.js')
+    git('mv', 'config/settings.json', 'config/appsettings.json')
+    git_repo({
+        'app.py': 'api_key = "changeme"\npassword = "Xy7pQ2mK9vL4wQ8r"\n',
+        'notes.txt': 'token = "Pz8QwR5tYv2XcB7mLj4DHn3k"\n',
+        'lib/new.py': 'secret_key = "Mn4vXp7TkW9bYc3HdFq8Zr2L"\n',
+    })
+    assert_incremental_equals_full()
+    snapshot = ScanSnapshot.load(ScanSnapshot.default_path(), SecretScanner().ruleset.version)
+    assert snapshot.incremental_runs == 1
+
+    # Uncommitted changes are scanned, and scanned again once reverted
+    with open('app.py', 'a', encoding='utf-8') as f:
+        f.write('auth_token = "Wq8Zr2LmN4vXp7TkW9bYc3Hd"\n')
+    assert_incremental_equals_full()
+    git('checkout', '--', 'app.py')
+    assert_incremental_equals_full()
@@ -0,0 +1,76 @@
+"""Tests for the scanning of structured configuration files."""
+
+import pytest
+
+from commit_scripts.report import unique_findings
+from commit_scripts.secretscan import SecretScanner
+from commit_scripts.structured import FORMATS
+
+# A minified appsettings.json: every value is on the first line
+MINIFIED_SETTINGS = (
+    '{"ConnectionStrings":{"Default":"Server=db;"},'
+    '"Auth":{"ClientSecret":"q8Zr2LmN4vXp7TkW9bYc3HdF"},'
+    '"Database":{"Password":"Xy7#pQ2!mK9$vL4@"},'
+    '"ApiKeys":{"StripeSecret":"Hn3kPz8QwR5tYv2XcB7mLj4D"}}\n'
+)
+SECRETS = [
+    ('ClientSecret', 'q8Zr2LmN4vXp7TkW9bYc3HdF'),
+    ('Password', 'Xy7#pQ2!mK9$vL4@'),
+    ('StripeSecret', 'Hn3kPz8QwR5tYv2XcB7mLj4D'),
+]
+
+
+def located(findings):
+    return sorted((finding.line_number, finding.column, finding.variable_name, finding.matched_content)
+                  for finding in findings)
+
+
+def expected():
+    return [(1, MINIFIED_SETTINGS.index(f'"{value}"') + 1, key, value) for key, value in SECRETS]
+
+
+def test_every_secret_on_a_minified_line_is_reported(git_repo):
+    git_repo({'appsettings.json': MINIFIED_SETTINGS})
+    findings = SecretScanner().scan_repository(jobs=1, use_cache=False)
+    assert located(findings) == expected()
+    # The report keeps them too
+    assert located(unique_findings(findings, findings)) == expected()
+
+
+def test_line_scan_reports_every_secret_on_a_line(git_repo):
+    git_repo({'appsettings.json': MINIFIED_SETTINGS})
+    scanner = SecretScanner()
+    scanner.scan_file('appsettings.json')
+    assert located(scanner.found_secrets) == expected()
+
+
+def test_every_secret_in_a_yaml_flow_mapping_is_reported(git_repo):
+    git_repo({'config.yml': 'auth: {client_secret: q8Zr2LmN4vXp7TkW9bYc3HdF, password: "Xy7#pQ2!mK9$vL4@"}\n'})
+    findings = SecretScanner().scan_repository(jobs=1, use_cache=False)
+    # The password is reported once, by the pattern that matched its assignment
+    assert located(findings) == [(1, 22, 'client_secret', 'q8Zr2LmN4vXp7TkW9bYc3HdF'),
+                                 (1, 48, None, 'password: "Xy7#pQ2!mK9$vL4@"}')]
+
+
+def test_one_finding_per_line_elsewhere(git_repo):
+    git_repo({'settings.py': 'password = "Xy7#pQ2!mK9$vL4@"; api_secret = "Hn3kPz8QwR5tYv2XcB7mLj4D"\n'})
+    findings = SecretScanner().scan_repository(jobs=1, use_cache=False)
+    assert [finding.line_number for finding in findings] == [1]
+
+
+@pytest.mark.parametrize('name, text, pairs', [
+    ('json', '{"a":{"ApiKey":"k1","Tokens":["t1","t2"]},"Secret":"s1"}',
+     [('ApiKey', 'k1'), ('Tokens', 't1'), ('Tokens', 't2'), ('Secret', 's1')]),
+    ('xml', '<add key="ApiKey" value="k1"/><add key="Secret" value="s1"/><db password="p1" user="u1"/>',
+     [('ApiKey', 'k1'), ('Secret', 's1'), ('password', 'p1'), ('user', 'u1')]),
+    ('env', 'API_KEY=k1\nexport SECRET="s1"\n', [('API_KEY', 'k1'), ('SECRET', 's1')]),
+    ('properties', 'api.key=k1\ndb.password: p1\n', [('api.key', 'k1'), ('db.password', 'p1')]),
+    ('yaml', 'api:\n  key: k1\n  tokens:\n    - t1\n    - t2\n', [('key', 'k1'), ('tokens', 't1'), ('tokens', 't2')]),
+    ('yaml', 'db: {password: p1, url: "http://h:1/x"}\nkeys: [k1, {secret: s1}] # a: b\n',
+     [('password', 'p1'), ('url', 'http://h:1/x'), ('keys', 'k1'), ('secret', 's1')]),
+])
+def test_walkers_yield_every_value_at_its_offset(name, text, pairs):
+    walked = list(FORMATS[name].walk(text))
+    assert [(key, value) for _, key, value in walked] == pairs
+    for offset, _, value in walked:
+        assert text.startswith(value, offset)